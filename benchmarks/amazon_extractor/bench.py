@@ -0,0 +1,162 @@
+# 文件路径: benchmarks/amazon_extractor/bench.py
+"""
+亚马逊页面提取函数的回归基准测试。
+
+对 corpus/ 中每个已匿名化的商品页面：
+1. 与 golden/ 中同名 JSON 比对提取结果，布局变化导致提取出错时立即暴露；
+2. 分别测量页面解析和各个 extract_* 函数的吞吐量（页/秒、MB/秒）与峰值内存。
+
+用法（在项目根目录运行）:
+    python benchmarks/amazon_extractor/bench.py                 # 校验 + 基准
+    python benchmarks/amazon_extractor/bench.py --check-only    # 只校验正确性
+    python benchmarks/amazon_extractor/bench.py --pad-kb 1500   # 追加无关标记，模拟真实页面体积
+    python benchmarks/amazon_extractor/bench.py --update-golden # 确认提取结果无误后更新 golden
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(os.path.dirname(BENCH_DIR)))
+
+from shared.amazon_extractor import (  # noqa: E402
+    extract_all_product_info, extract_features, extract_price, extract_product_details,
+    extract_rating, extract_reviews, extract_title, parse_product_page,
+)
+
+CORPUS_DIR = os.path.join(BENCH_DIR, 'corpus')
+GOLDEN_DIR = os.path.join(BENCH_DIR, 'golden')
+
+EXTRACTORS = {
+    'extract_features': extract_features,
+    'extract_title': extract_title,
+    'extract_price': extract_price,
+    'extract_rating': extract_rating,
+    'extract_reviews': extract_reviews,
+    'extract_product_details': extract_product_details,
+}
+
+# 填充用的无关标记：真实页面的大部分体积来自脚本、推荐位和页脚，解析器需要跳过它们
+PADDING_BLOCK = (
+    '<div class="a-carousel-card"><a href="/dp/B0PADDING"><img src="https://images.example.com/p.jpg">'
+    '<span class="a-size-base">Sponsored item</span></a></div>'
+    '<script>window.ue && ue.count("pad", 1); var x = {"k": [1, 2, 3]};</script>\n'
+)
+
+
+def load_corpus(pad_kb=0):
+    """读取语料库，返回 [(页面名, HTML 字节)]；pad_kb > 0 时在 </body> 前追加对应体积的无关标记。"""
+    pages = []
+    for filename in sorted(os.listdir(CORPUS_DIR)):
+        if not filename.endswith(('.html', '.htm')):
+            continue
+        with open(os.path.join(CORPUS_DIR, filename), 'rb') as f:
+            html = f.read()
+        if pad_kb:
+            padding = (PADDING_BLOCK * (pad_kb * 1024 // len(PADDING_BLOCK) + 1)).encode('utf-8')
+            html = html.replace(b'</body>', padding + b'</body>', 1)
+        pages.append((os.path.splitext(filename)[0], html))
+    return pages
+
+
+def golden_path(name):
+    return os.path.join(GOLDEN_DIR, f'{name}.json')
+
+
+def check_golden(pages, update=False):
+    """比对（或更新）golden 结果，返回不一致的页面名列表。"""
+    mismatches = []
+    for name, html in pages:
+        result = extract_all_product_info(html)
+        path = golden_path(name)
+        if update:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(result, f, ensure_ascii=False, indent=2, sort_keys=True)
+                f.write('\n')
+            print(f'  已更新 {os.path.relpath(path, BENCH_DIR)}')
+            continue
+        if not os.path.exists(path):
+            print(f'  [缺少 golden] {name}')
+            mismatches.append(name)
+            continue
+        with open(path, encoding='utf-8') as f:
+            expected = json.load(f)
+        if result == expected:
+            print(f'  [通过] {name}')
+            continue
+        mismatches.append(name)
+        for key in sorted(set(expected) | set(result)):
+            if expected.get(key) != result.get(key):
+                print(f'  [不一致] {name}.{key}\n    期望: {expected.get(key)!r}\n    实际: {result.get(key)!r}')
+    return mismatches
+
+
+def measure(func, args_list, total_bytes, repeat):
+    """对 args_list 中的每组参数重复调用 func，返回 (页/秒, MB/秒, 峰值内存 KB)。"""
+    func(*args_list[0])  # 预热，避免首次调用的导入和正则编译计入结果
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for args in args_list:
+            func(*args)
+    elapsed = time.perf_counter() - start
+
+    # 峰值内存单独测一轮：tracemalloc 本身会显著拖慢执行，不能与计时混在一起
+    tracemalloc.start()
+    for args in args_list:
+        func(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    calls = repeat * len(args_list)
+    return calls / elapsed, repeat * total_bytes / elapsed / (1024 * 1024), peak / 1024
+
+
+def run_benchmarks(pages, repeat, only=None):
+    """测量页面解析、完整提取以及每个 extract_* 函数的吞吐量和峰值内存。"""
+    total_bytes = sum(len(html) for _, html in pages)
+    html_args = [(html,) for _, html in pages]
+    soups = [(parse_product_page(html),) for _, html in pages]
+
+    cases = [
+        ('parse (restricted)', parse_product_page, html_args),
+        ('parse (full)', lambda html: parse_product_page(html, restrict=False), html_args),
+        ('extract_all_product_info', extract_all_product_info, html_args),
+    ]
+    # 各 extract_* 在已解析好的树上测量，只反映选择器和正则本身的开销
+    cases += [(name, func, soups) for name, func in EXTRACTORS.items()]
+    if only:
+        cases = [case for case in cases if case[0] in only]
+
+    print(f'\n{len(pages)} 个页面，共 {total_bytes / 1024:.1f} KB，每项重复 {repeat} 轮\n')
+    print(f'{"项目":<28}{"页/秒":>12}{"MB/秒":>12}{"峰值内存(KB)":>16}')
+    for name, func, args_list in cases:
+        pages_per_sec, mb_per_sec, peak_kb = measure(func, args_list, total_bytes, repeat)
+        print(f'{name:<28}{pages_per_sec:>12.1f}{mb_per_sec:>12.2f}{peak_kb:>16.1f}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='亚马逊页面提取函数的正确性校验与性能基准')
+    parser.add_argument('--repeat', type=int, default=20, help='每项测量的重复轮数（默认 20）')
+    parser.add_argument('--pad-kb', type=int, default=0, help='为每个页面追加的无关标记体积（KB）')
+    parser.add_argument('--only', nargs='+', help='只测量指定项目，例如 extract_reviews "parse (full)"')
+    parser.add_argument('--check-only', action='store_true', help='只校验 golden，不跑基准')
+    parser.add_argument('--update-golden', action='store_true', help='用当前提取结果覆盖 golden')
+    args = parser.parse_args(argv)
+
+    # golden 始终基于未填充的原始页面，填充只用于放大基准测试的页面体积
+    print('正确性校验:')
+    mismatches = check_golden(load_corpus(), update=args.update_golden)
+    if not args.check_only and not args.update_golden:
+        run_benchmarks(load_corpus(args.pad_kb), args.repeat, args.only)
+    if mismatches:
+        print(f'\n{len(mismatches)} 个页面与 golden 不一致: {", ".join(mismatches)}')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,103 @@
+# 文件路径: benchmarks/reading_notes/bench.py
+"""
+读书笔记解析与 Markdown 生成的性能基准。
+
+生成指定条数的微信读书导出文本（划线、带 C/Q/A/TODO/G 标签的想法混合），
+分别测量解析、概念提取和 Markdown 生成的耗时，并用不同规模的结果检查耗时是否随笔记数线性增长。
+
+用法（在项目根目录运行）:
+    python benchmarks/reading_notes/bench.py                 # 默认 5000 条笔记
+    python benchmarks/reading_notes/bench.py --notes 20000 --repeat 3
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from shared.reading_notes import extract_concepts, generate_markdown, parse_wechat_notes  # noqa: E402
+
+NOTES_PER_CHAPTER = 50
+
+
+def make_export(note_count, rng):
+    """生成一份模拟的微信读书导出文本。"""
+    lines = ["基准测试用书", "匿名作者", f"{note_count}个笔记", ""]
+    for i in range(note_count):
+        if i % NOTES_PER_CHAPTER == 0:
+            lines += ["", "", f"第{i // NOTES_PER_CHAPTER + 1}章 示例章节", ""]
+        roll = rng.random()
+        if roll < 0.6:
+            lines += [f"◆ 第{i}条划线：知识的价值在于使用，而不在于收藏。{'G 值得反复读' if i % 7 == 0 else ''}", ""]
+        else:
+            concept = f"概念{i % 300}"
+            lines += [
+                f"◆ 2024/{i % 12 + 1:02d}/{i % 28 + 1:02d}发表想法",
+                "",
+                f"C {concept}",
+                f"关于{concept}的解释",
+                f"Q 第{i}个问题是什么",
+                f"A 第{i}个问题的答案",
+                "TODO 整理成卡片" if i % 3 == 0 else "G 好想法",
+                "TODO-Q 还有什么没想清楚" if i % 5 == 0 else "补充说明",
+                f"原文：第{i}条想法对应的原文内容。",
+                "",
+            ]
+    lines += ["", "-- 来自微信读书"]
+    return "\n".join(lines)
+
+
+def run_once(text):
+    timings = {}
+    start = time.perf_counter()
+    parsed = parse_wechat_notes(text)
+    timings["解析"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    concepts = extract_concepts(parsed["notes"])
+    timings["概念提取"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    markdown = generate_markdown(parsed["book_title"], parsed["author_name"], parsed["notes"], concepts)
+    timings["Markdown 生成"] = time.perf_counter() - start
+    return parsed, markdown, timings
+
+
+def best_of(text, repeat):
+    best = None
+    for _ in range(repeat):
+        parsed, markdown, timings = run_once(text)
+        best = timings if best is None else {k: min(v, best[k]) for k, v in timings.items()}
+    return parsed, markdown, best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='读书笔记解析与 Markdown 生成的性能基准')
+    parser.add_argument('--notes', type=int, default=5000, help='笔记条数，默认 5000')
+    parser.add_argument('--repeat', type=int, default=5, help='重复次数，取最好成绩')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    text = make_export(args.notes, rng)
+    parsed, markdown, timings = best_of(text, args.repeat)
+    assert len(parsed["notes"]) == args.notes, f"解析出 {len(parsed['notes'])} 条笔记，期望 {args.notes}"
+
+    print(f"{args.notes} 条笔记，导出文本 {len(text) / 1024:.0f} KB，生成 Markdown {len(markdown) / 1024:.0f} KB")
+    for name, seconds in timings.items():
+        print(f"  {name:<14}{seconds * 1000:9.1f} ms")
+    total = sum(timings.values())
+    print(f"  {'合计':<14}{total * 1000:9.1f} ms")
+
+    # 线性检查：规模缩小为 1/5 时，耗时也应接近 1/5
+    small_count = max(args.notes // 5, 1)
+    _, _, small_timings = best_of(make_export(small_count, random.Random(args.seed)), args.repeat)
+    ratio = total / sum(small_timings.values())
+    print(f"{args.notes} 条 / {small_count} 条 的耗时比: {ratio:.1f}（线性增长时约为 {args.notes / small_count:.0f}）")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,110 @@
+# 文件路径: benchmarks/text_diff/bench.py
+"""
+文本对比差异算法的性能基准。
+
+生成合同长度的中英文混排文档，随机修改、插入、删除少量条款后，
+测量 shared.text_diff.get_diff_ops 的耗时，并校验操作码能把原文还原为修改后的文本。
+可选地在截断后的文档上对比旧的逐字符 difflib 实现。
+
+用法（在项目根目录运行）:
+    python benchmarks/text_diff/bench.py
+    python benchmarks/text_diff/bench.py --clauses 5000 --edit-ratio 0.05
+    python benchmarks/text_diff/bench.py --legacy-chars 20000   # 同时测量旧实现（仅取前 N 个字符）
+"""
+import argparse
+import difflib
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from shared.text_diff import get_diff_ops  # noqa: E402
+
+CLAUSE_TEMPLATES = [
+    "第{n}条 甲方应于本合同签订后{d}个工作日内向乙方支付货款人民币{m}元整。",
+    "Article {n}. The Supplier shall deliver the goods within {d} days of receiving the purchase order.",
+    "第{n}条 任何一方违反本合同约定的，应向守约方支付合同总金额{d}%的违约金。",
+    "Article {n}. This Agreement shall be governed by the laws of the jurisdiction stated in Schedule {d}.",
+    "第{n}条 本合同未尽事宜，由双方另行协商并签订补充协议，补充协议与本合同具有同等法律效力。",
+]
+
+
+def make_contract(clauses, rng):
+    return "\n".join(
+        rng.choice(CLAUSE_TEMPLATES).format(n=i + 1, d=rng.randint(1, 90), m=rng.randint(1000, 999999))
+        for i in range(clauses)
+    )
+
+
+def revise(text, edit_ratio, rng):
+    """随机修改、删除和插入一部分行，模拟一次合同修订。"""
+    lines = text.split("\n")
+    revised = []
+    for line in lines:
+        roll = rng.random()
+        if roll < edit_ratio / 3:
+            pos = rng.randrange(len(line))
+            revised.append(line[:pos] + "（修订）" + line[pos + 3:])
+        elif roll < edit_ratio * 2 / 3:
+            continue
+        elif roll < edit_ratio:
+            revised.append(line)
+            revised.append("新增条款：双方确认上述内容已充分协商。")
+        else:
+            revised.append(line)
+    return "\n".join(revised)
+
+
+def apply_ops(text1, text2, ops):
+    """按操作码从原文重建修改后的文本，用于校验结果正确。"""
+    parts = []
+    for tag, i1, i2, j1, j2 in ops:
+        if tag == 'equal':
+            assert text1[i1:i2] == text2[j1:j2], f"equal 段内容不一致: {(i1, i2, j1, j2)}"
+        parts.append(text2[j1:j2])
+    return "".join(parts)
+
+
+def legacy_diff_ops(text1, text2):
+    """旧实现：对整个文本逐字符运行 SequenceMatcher。"""
+    return difflib.SequenceMatcher(None, list(text1), list(text2), autojunk=False).get_opcodes()
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='文本对比差异算法的性能基准')
+    parser.add_argument('--clauses', type=int, default=3000, help='生成的条款（行）数，默认 3000')
+    parser.add_argument('--edit-ratio', type=float, default=0.02, help='被修订的行所占比例，默认 0.02')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--legacy-chars', type=int, default=0,
+                        help='大于 0 时，在两份文档的前 N 个字符上测量旧的逐字符实现')
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    original = make_contract(args.clauses, rng)
+    modified = revise(original, args.edit_ratio, rng)
+    print(f"原文 {len(original):,} 字符 / 修改后 {len(modified):,} 字符，修订比例 {args.edit_ratio:.0%}")
+
+    ops, elapsed = timed(get_diff_ops, original, modified)
+    assert apply_ops(original, modified, ops) == modified, "操作码无法还原修改后的文本"
+    changed = sum(1 for op in ops if op[0] != 'equal')
+    print(f"两级差异: {elapsed * 1000:8.1f} ms，{changed} 处变化（校验通过）")
+
+    if args.legacy_chars:
+        text1, text2 = original[:args.legacy_chars], modified[:args.legacy_chars]
+        _, new_elapsed = timed(get_diff_ops, text1, text2)
+        _, legacy_elapsed = timed(legacy_diff_ops, text1, text2)
+        print(f"前 {args.legacy_chars:,} 字符: 两级差异 {new_elapsed * 1000:.1f} ms，"
+              f"逐字符 difflib {legacy_elapsed * 1000:.1f} ms")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
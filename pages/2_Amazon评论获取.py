@@ -1,12 +1,15 @@
 import streamlit as st
-import json
+import hashlib
 import re
-import requests
 import io
-import zipfile
+import ijson
+from ijson.common import ObjectBuilder
+import pandas as pd
 from urllib.parse import urlparse
 import os
 from shared.sidebar import create_common_sidebar
+from shared.image_downloader import build_image_zip
+from shared.utils import read_archive
 create_common_sidebar()
 
 # --- Helper Function ---
@@ -31,6 +34,107 @@ def convert_to_hd_url(thumbnail_url):
     return hd_url
 
 
+REVIEWS_PAGE_SIZE_OPTIONS = [10, 20, 50]
+THUMBNAIL_WIDTH = 120
+RATING_FILTER_OPTIONS = ["全部", "5星", "4星", "3星", "2星", "1星"]
+
+
+def parse_rating(rating):
+    """把 '5.0 out of 5 stars' 或数字形式的评分统一解析为整数星级，无法解析时返回 None。"""
+    match = re.search(r'\d+(?:\.\d+)?', str(rating))
+    return int(float(match.group())) if match else None
+
+
+def build_download_filename(review_id, index, hd_url):
+    """为高清图片生成 ZIP 内的文件名。"""
+    try:
+        original_filename = os.path.basename(urlparse(hd_url).path)
+        return f"{review_id}_{index}_{original_filename}"
+    except Exception:
+        return f"{review_id}_{index}.jpg"
+
+
+def parse_review_export(fileobj):
+    """
+    使用 ijson 增量解析插件导出的 JSON：只为单条评论构建对象，处理完即转换为列数据，
+    不会把整个导出文件物化为嵌套字典。
+
+    Returns:
+        (header, reviews_df, images_df)
+        - header: 产品信息和已提取评论数
+        - reviews_df: 每行一条评论（评论者、评分、星级、内容、ID、图片数）
+        - images_df: 每行一张图片（所属评论位置、缩略图、高清图、ZIP内文件名）
+    """
+    header = {"product": {}, "totalReviewsExtracted": None}
+    review_columns = {"reviewer": [], "rating": [], "stars": [], "text": [], "review_id": [], "image_count": []}
+    image_columns = {"review_pos": [], "thumbnail_url": [], "hd_url": [], "filename": []}
+
+    def add_review(review):
+        position = len(review_columns["review_id"])
+        review_id = review.get('reviewId', 'no_id')
+        image_urls = review.get('imageUrls') or []
+        review_columns["reviewer"].append(review.get('reviewerName', '匿名用户'))
+        review_columns["rating"].append(str(review.get('rating', '无评分')))
+        review_columns["stars"].append(parse_rating(review.get('rating')))
+        review_columns["text"].append(review.get('text', '无评论内容'))
+        review_columns["review_id"].append(str(review_id))
+        review_columns["image_count"].append(len(image_urls))
+        for i, thumbnail_url in enumerate(image_urls):
+            hd_url = convert_to_hd_url(thumbnail_url)
+            image_columns["review_pos"].append(position)
+            image_columns["thumbnail_url"].append(thumbnail_url)
+            image_columns["hd_url"].append(hd_url)
+            image_columns["filename"].append(build_download_filename(review_id, i, hd_url))
+
+    builder, target = None, None
+    for prefix, event, value in ijson.parse(fileobj, use_float=True):
+        if builder is None:
+            if prefix == 'totalReviewsExtracted':
+                header["totalReviewsExtracted"] = value
+                continue
+            if prefix in ('product', 'reviews.item') and event == 'start_map':
+                builder, target = ObjectBuilder(), prefix
+            else:
+                continue
+        builder.event(event, value)
+        if prefix == target and event == 'end_map':
+            if target == 'product':
+                header["product"] = builder.value
+            else:
+                add_review(builder.value)
+            builder, target = None, None
+
+    reviews_df = pd.DataFrame(review_columns).astype({
+        "reviewer": "string", "rating": "string", "stars": "Int8",
+        "text": "string", "review_id": "string", "image_count": "int32",
+    })
+    images_df = pd.DataFrame(image_columns).astype({
+        "review_pos": "int32", "thumbnail_url": "string", "hd_url": "string", "filename": "string",
+    })
+    return header, reviews_df, images_df
+
+
+@st.cache_data(max_entries=4, show_spinner="正在解析评论文件...")
+def load_review_table(file_hash, _file_bytes):
+    """按文件内容哈希缓存解析结果（_file_bytes 不参与哈希），同一文件重复上传无需再次解析。"""
+    return parse_review_export(io.BytesIO(_file_bytes))
+
+
+def render_review(review, image_urls, position):
+    """渲染单条评论：默认显示原始缩略图，高清大图仅在用户展开时加载。"""
+    st.markdown("---")
+    st.markdown(f"#### 评论者: **{review.reviewer}** | 评分: **{review.rating}**")
+    st.markdown(f"> {review.text}")
+
+    if image_urls:
+        st.image(image_urls, width=THUMBNAIL_WIDTH)
+        if st.toggle("查看高清图片", key=f"show_hd_{position}"):
+            cols = st.columns(len(image_urls))
+            for col, thumbnail_url in zip(cols, image_urls):
+                with col:
+                    st.image(convert_to_hd_url(thumbnail_url), caption="高清图片", use_column_width=True)
+
+
 # --- Streamlit App UI ---
 
 st.set_page_config(page_title="亚马逊评论分析器", layout="wide")
@@ -38,8 +142,9 @@ st.title("📦 亚马逊评论图片查看与下载工具")
 st.write("一个帮你从JSON文件中提取、展示并批量下载亚马逊评论图片的Streamlit小工具。")
 
 # 初始化 Session State
-if 'data' not in st.session_state:
-    st.session_state.data = None
+# review_table: (header, reviews_df, images_df)，由 load_review_table 按文件哈希缓存
+if 'review_table' not in st.session_state:
+    st.session_state.review_table = None
 if 'uploaded_file_name' not in st.session_state:
     st.session_state.uploaded_file_name = None
 
@@ -60,98 +165,96 @@ with tab1:
         # 检查是否是同一个文件，避免重复加载
         if uploaded_file.name != st.session_state.uploaded_file_name:
             try:
-                data = json.load(uploaded_file)
-                st.session_state.data = data
+                file_bytes = uploaded_file.getvalue()
+                file_hash = hashlib.md5(file_bytes).hexdigest()
+                st.session_state.review_table = load_review_table(file_hash, file_bytes)
                 st.session_state.uploaded_file_name = uploaded_file.name
                 st.success(f"文件 '{uploaded_file.name}' 上传并解析成功！")
-            except json.JSONDecodeError:
+            except ijson.JSONError:
                 st.error("上传的文件不是有效的JSON格式，请检查文件内容。")
-                st.session_state.data = None
+                st.session_state.review_table = None
             except Exception as e:
                 st.error(f"处理文件时发生错误: {e}")
-                st.session_state.data = None
+                st.session_state.review_table = None
 
     # 如果 session state 中有数据，则显示内容
-    if st.session_state.data is not None:
+    if st.session_state.review_table is not None:
 
         # 提供一个清除按钮
         if st.button("清除当前数据并上传新文件"):
-            st.session_state.data = None
+            st.session_state.review_table = None
             st.session_state.uploaded_file_name = None
             # 使用 st.experimental_rerun() or st.rerun() 来刷新页面状态
             st.rerun()
 
+        header, reviews_df, images_df = st.session_state.review_table
+
         st.header("2. 产品总览")
-        product_info = st.session_state.data.get("product", {})
+        product_info = header.get("product") or {}
         title = product_info.get("title", "N/A")
         price = product_info.get("price", "N/A")
         url = product_info.get("url", "#")
-        total_reviews = st.session_state.data.get("totalReviewsExtracted", "N/A")
+        total_reviews = header.get("totalReviewsExtracted") or "N/A"
 
         st.markdown(f"**产品标题:** [{title}]({url})")
         st.markdown(f"**产品价格:** `{price}`")
         st.markdown(f"**已提取评论数:** `{total_reviews}`")
 
         st.header("3. 评论详情与图片")
-        all_images_to_download = []
-
-        reviews = st.session_state.data.get("reviews", [])
-        if not reviews:
+        if reviews_df.empty:
             st.warning("JSON文件中没有找到'reviews'列表。")
         else:
-            for review in reviews:
-                st.markdown("---")
-                reviewer_name = review.get('reviewerName', '匿名用户')
-                rating = review.get('rating', '无评分')
-                review_text = review.get('text', '无评论内容')
-                review_id = review.get('reviewId', 'no_id')
-
-                st.markdown(f"#### 评论者: **{reviewer_name}** | 评分: **{rating}**")
-                st.markdown(f"> {review_text}")
-
-                image_urls = review.get('imageUrls', [])
-                if image_urls:
-                    cols = st.columns(len(image_urls))
-                    for i, thumbnail_url in enumerate(image_urls):
-                        hd_url = convert_to_hd_url(thumbnail_url)
-                        try:
-                            path = urlparse(hd_url).path
-                            original_filename = os.path.basename(path)
-                            filename = f"{review_id}_{i}_{original_filename}"
-                            all_images_to_download.append({"url": hd_url, "filename": filename})
-                        except Exception:
-                            filename = f"{review_id}_{i}.jpg"
-                            all_images_to_download.append({"url": hd_url, "filename": filename})
-
-                        with cols[i]:
-                            st.image(hd_url, caption=f"高清图片", use_column_width=True)
+            # 筛选直接作用于列式数据
+            col1, col2, col3 = st.columns(3)
+            rating_filter = col1.selectbox("按评分筛选:", RATING_FILTER_OPTIONS)
+            only_with_images = col2.checkbox("只看带图评论")
+            page_size = col3.selectbox("每页评论数:", REVIEWS_PAGE_SIZE_OPTIONS)
+
+            mask = pd.Series(True, index=reviews_df.index)
+            if rating_filter != "全部":
+                mask &= reviews_df["stars"].eq(int(rating_filter[0])).fillna(False)
+            if only_with_images:
+                mask &= reviews_df["image_count"] > 0
+            matched_positions = reviews_df.index[mask]
+
+            if len(matched_positions) == 0:
+                st.info("没有符合筛选条件的评论。")
+            else:
+                total_pages = (len(matched_positions) + page_size - 1) // page_size
+                page = st.number_input(f"页码 (共 {total_pages} 页，{len(matched_positions)} 条评论)",
+                                       min_value=1, max_value=total_pages, value=1, step=1)
+                start = (page - 1) * page_size
+                page_positions = matched_positions[start:start + page_size]
+                page_images = (images_df[images_df["review_pos"].isin(page_positions)]
+                               .groupby("review_pos")["thumbnail_url"].apply(list))
+                for position, review in zip(page_positions, reviews_df.loc[page_positions].itertuples()):
+                    render_review(review, page_images.get(position, []), position)
 
         st.header("4. 下载所有图片")
-        if all_images_to_download:
-            st.info(f"在所有评论中总共找到了 **{len(all_images_to_download)}** 张图片。")
+        if not images_df.empty:
+            st.info(f"在所有评论中总共找到了 **{len(images_df)}** 张图片。")
 
             if st.button("打包下载所有高清图片 (ZIP)"):
-                zip_buffer = io.BytesIO()
-                with zipfile.ZipFile(zip_buffer, "a", zipfile.ZIP_DEFLATED, False) as zip_file:
-                    progress_bar = st.progress(0)
-                    status_text = st.empty()
-                    total_images = len(all_images_to_download)
-
-                    for i, img_data in enumerate(all_images_to_download):
-                        try:
-                            response = requests.get(img_data["url"], timeout=10)
-                            response.raise_for_status()
-                            zip_file.writestr(img_data["filename"], response.content)
-                            progress_percentage = (i + 1) / total_images
-                            progress_bar.progress(progress_percentage)
-                            status_text.text(f"正在下载并压缩图片: {i + 1}/{total_images}...")
-                        except requests.exceptions.RequestException as e:
-                            st.warning(f"下载图片 {img_data['url']} 失败: {e}")
-
-                zip_buffer.seek(0)
+                progress_bar = st.progress(0)
+                status_text = st.empty()
+
+                def show_progress(done, total):
+                    progress_bar.progress(done / total)
+                    status_text.text(f"正在并发下载并打包图片: {done}/{total}...")
+
+                # 并发下载（连接复用、失败重试、重复URL只下载一次），边下载边写入ZIP
+                zip_archive, failures = build_image_zip(
+                    images_df[["hd_url", "filename"]].itertuples(index=False, name=None),
+                    on_progress=show_progress
+                )
+                for failed_url, error in failures:
+                    st.warning(f"下载图片 {failed_url} 失败: {error}")
+                zip_bytes = read_archive(zip_archive)
+                zip_archive.close()  # 内容已读出交给下载按钮，临时文件可以立即释放
+
                 st.download_button(
                     label="✅ 图片打包完成！点击这里下载",
-                    data=zip_buffer,
+                    data=zip_bytes,
                     file_name=f"{title[:30]}_review_images.zip",
                     mime="application/zip"
                 )
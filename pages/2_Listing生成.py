@@ -2,10 +2,18 @@ import streamlit as st
 import pandas as pd
 import google.generativeai as genai
 import textwrap
+import queue
+import random
+import time
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from google.api_core import exceptions as google_exceptions
 
 # --- 导入共享模块 ---
 # 1. 从共享配置文件中导入 GlobalConfig 基类
 from shared.config import GlobalConfig
+from shared.llm_client import GeminiClient, get_llm_client, render_llm_cache_controls
 # 假设这些模块存在于您的项目结构中 (如果不存在，可以暂时注释掉)
 # from shared.usage_tracker import track_script_usage
 from shared.sidebar import create_common_sidebar
@@ -48,18 +56,25 @@ class ListingConfig(GlobalConfig):
         self.KEYWORD_COLUMNS = ['流量词', '关键词翻译', '流量占比', '月搜索量', '购买率', 'ASIN']
         self.TOP_N_KEYWORDS = 20
 
+        # 提示词压缩配置
+        # 写入提示词的关键词列（关键词翻译对撰写英文文案没有帮助，且大量重复原词，故不发送）
+        self.PROMPT_KEYWORD_COLUMNS = ['流量词', '流量占比', '月搜索量', '购买率']
+        self.PROMPT_INTEGER_COLUMNS = ['月搜索量']  # 计数类的列按整数写入，避免出现 1.235e+05 这样的科学计数法
+        self.PROMPT_FLOAT_FORMAT = '%.4g'  # 其余比例类数值列保留4位有效数字，减少 token
+        self.KEYWORD_TOKEN_BUDGET = 1200  # 两个关键词表合计的 token 预算
+
         # 提示词模板 (保持不变)
         self.TITLE_PROMPT_TEMPLATE = """
             你是一名专业的亚马逊美国站的电商运营专家，尤其擅长撰写吸引人的产品标题。
             请根据以下关键词数据，为一款"{product_name}" ({product_english_name}) 撰写 {title_count} 个符合亚马逊平台规则且具有高吸引力的产品标题。
 
             **关键词数据参考:**
-            - **流量占比最高的 TOP {top_n} 关键词:**
+            - **流量占比最高的 {traffic_keyword_count} 个关键词:**
             ```csv
             {traffic_keywords_csv}
             ```
 
-            - **月搜索量最高的 TOP {top_n} 关键词:**
+            - **月搜索量最高的 {search_keyword_count} 个关键词（已去除上表中出现过的关键词）:**
             ```csv
             {search_volume_keywords_csv}
             ```
@@ -79,12 +94,12 @@ class ListingConfig(GlobalConfig):
             请根据以下关键词数据，为一款"{product_name}" ({product_english_name}) 撰写 {bullet_points_count} 点描述。
 
             **关键词数据参考:**
-            - **流量占比最高的 TOP {top_n} 关键词:**
+            - **流量占比最高的 {traffic_keyword_count} 个关键词:**
             ```csv
             {traffic_keywords_csv}
             ```
 
-            - **月搜索量最高的 TOP {top_n} 关键词:**
+            - **月搜索量最高的 {search_keyword_count} 个关键词（已去除上表中出现过的关键词）:**
             ```csv
             {search_volume_keywords_csv}
             ```
@@ -112,6 +127,28 @@ class ListingConfig(GlobalConfig):
         self.TITLE_COUNT = 4
         self.BULLET_POINTS_COUNT = 5
 
+        # 并发生成配置：标题与五点描述、以及多个模型的变体同时请求
+        self.MAX_CONCURRENT_REQUESTS = 6
+        self.GENERATION_TASKS = {"title": "建议标题", "bullet_points": "建议五点描述"}
+
+        # 批量生成配置
+        # 产品信息表的列名 -> 提示词模板中的字段名；ASIN 与 产品名称 为必填列
+        self.PRODUCT_SHEET_COLUMNS = {
+            "ASIN": "asin",
+            "产品名称": "product_name",
+            "英文名称": "product_english_name",
+            "核心关键词": "core_keywords",
+            "产品卖点": "key_features",
+            "五点示例": "bullet_point_example",
+            "用户痛点": "user_pain_points",
+            "使用场景": "usage_scenarios",
+        }
+        self.PRODUCT_SHEET_REQUIRED_COLUMNS = ["ASIN", "产品名称"]
+        self.BATCH_MAX_CONCURRENCY = 4  # 同时进行的 API 请求数，按配额调整
+        self.BATCH_MAX_RETRIES = 5  # 遇到限流/临时错误时的最大重试次数
+        self.BATCH_RETRY_BASE_DELAY = 2.0  # 指数退避的基础等待秒数
+        self.BATCH_OUTPUT_FILENAME = "Listing_批量生成结果.xlsx"
+
 
 # --- 页面配置 ---
 cfg = ListingConfig()
@@ -124,6 +161,7 @@ st.set_page_config(
 # 加载共享侧边栏
 # track_script_usage("📝 Listing生成")
 create_common_sidebar()
+use_llm_cache = render_llm_cache_controls()
 
 
 # --- 主要功能函数 (部分已修改) ---
@@ -140,15 +178,17 @@ def load_data(uploaded_file):
         return None
 
 
-def preprocess_keyword_data(df: pd.DataFrame, config: ListingConfig):
-    """预处理关键词数据，处理多ASIN的情况。"""
+def preprocess_keyword_data(df: pd.DataFrame, config: ListingConfig, verbose: bool = True):
+    """预处理关键词数据，处理多ASIN的情况。verbose=False 时不输出界面提示（批量模式使用）。"""
     if 'ASIN' not in df.columns:
-        st.warning("数据中未找到'ASIN'列，将使用原始数据进行处理。")
+        if verbose:
+            st.warning("数据中未找到'ASIN'列，将使用原始数据进行处理。")
         return df
 
-    unique_asins = df['ASIN'].nunique()
-    unique_keywords = df['流量词'].nunique()
-    st.info(f"📊 数据概览: 共 {len(df)} 行数据，涉及 {unique_asins} 个ASIN，{unique_keywords} 个唯一关键词")
+    if verbose:
+        unique_asins = df['ASIN'].nunique()
+        unique_keywords = df['流量词'].nunique()
+        st.info(f"📊 数据概览: 共 {len(df)} 行数据，涉及 {unique_asins} 个ASIN，{unique_keywords} 个唯一关键词")
 
     aggregation_rules = {}
     if '流量占比' in df.columns:
@@ -168,11 +208,12 @@ def preprocess_keyword_data(df: pd.DataFrame, config: ListingConfig):
 
     if aggregation_rules:
         processed_df = df.groupby('流量词', as_index=False).agg(aggregation_rules)
-        col1, col2 = st.columns(2)
-        with col1:
-            st.metric("处理前数据行数", len(df))
-        with col2:
-            st.metric("处理后唯一关键词数", len(processed_df))
+        if verbose:
+            col1, col2 = st.columns(2)
+            with col1:
+                st.metric("处理前数据行数", len(df))
+            with col2:
+                st.metric("处理后唯一关键词数", len(processed_df))
         return processed_df
     else:
         return df
@@ -204,52 +245,361 @@ def get_top_keywords_by_search_volume(df: pd.DataFrame, config: ListingConfig):
         return get_top_keywords_by_traffic(df, config)
 
 
-def create_prompts(df: pd.DataFrame, config: ListingConfig):
-    """根据 DataFrame 中的关键词数据，创建用于生成标题和五点描述的提示词。"""
-    processed_df = preprocess_keyword_data(df, config)
+def default_product_info(config: ListingConfig) -> Dict[str, str]:
+    """从配置中读取默认（单个产品模式）的产品信息。"""
+    return {
+        "product_name": config.PRODUCT_NAME,
+        "product_english_name": config.PRODUCT_ENGLISH_NAME,
+        "core_keywords": config.CORE_KEYWORDS,
+        "key_features": config.KEY_FEATURES,
+        "bullet_point_example": config.BULLET_POINT_EXAMPLE,
+        "user_pain_points": config.USER_PAIN_POINTS,
+        "usage_scenarios": config.USAGE_SCENARIOS,
+    }
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    粗略估算文本的 token 数：中日韩字符约 1 字 1 token，其余字符约 4 字符 1 token。
+    仅用于发送前的预算控制和展示，不追求与服务端计数完全一致。
+    """
+    cjk_count = sum(1 for ch in text if '\u2e80' <= ch <= '\u9fff' or '\uff00' <= ch <= '\uffef')
+    return cjk_count + (len(text) - cjk_count + 3) // 4
+
+
+def compact_keyword_tables(top_traffic_df: pd.DataFrame, top_search_df: pd.DataFrame,
+                           config: ListingConfig) -> Tuple[str, str, int]:
+    """
+    压缩写入提示词的关键词数据：
+    1. 只保留 PROMPT_KEYWORD_COLUMNS 中的列，PROMPT_INTEGER_COLUMNS 中的列按整数写入；
+    2. 搜索量列表中去除已在流量列表中出现的关键词；
+    3. 两个列表按排名交替取行，直到达到 KEYWORD_TOKEN_BUDGET。
+
+    Returns:
+        (流量关键词CSV, 搜索量关键词CSV, 各自实际保留的行数 (流量, 搜索量), 关键词部分的预计 token 数)
+    """
+    columns = [col for col in config.PROMPT_KEYWORD_COLUMNS if col in top_traffic_df.columns]
+    traffic_df = top_traffic_df[columns]
+    search_df = top_search_df[columns]
+    if '流量词' in columns:
+        search_df = search_df[~search_df['流量词'].isin(traffic_df['流量词'])]
+
+    def row_lines(df: pd.DataFrame) -> List[str]:
+        # 含缺失值的计数列会被 pandas 存成浮点数，转为可空整数后 float_format 就只作用于比例列
+        integer_columns = {col: pd.to_numeric(df[col], errors='coerce').round().astype('Int64')
+                           for col in config.PROMPT_INTEGER_COLUMNS if col in df.columns}
+        df = df.assign(**integer_columns)
+        return df.to_csv(index=False, header=False, float_format=config.PROMPT_FLOAT_FORMAT).splitlines()
+
+    header = ",".join(columns)
+    traffic_lines, search_lines = row_lines(traffic_df), row_lines(search_df)
+
+    # 按排名交替选取两个列表的行，优先保证每个列表的头部关键词被保留
+    used_tokens = 2 * estimate_tokens(header)
+    kept_traffic, kept_search = [], []
+    for rank in range(max(len(traffic_lines), len(search_lines))):
+        for lines, kept in ((traffic_lines, kept_traffic), (search_lines, kept_search)):
+            if rank < len(lines):
+                cost = estimate_tokens(lines[rank]) + 1
+                if used_tokens + cost > config.KEYWORD_TOKEN_BUDGET:
+                    continue
+                kept.append(lines[rank])
+                used_tokens += cost
+
+    traffic_csv = "\n".join([header] + kept_traffic)
+    search_csv = "\n".join([header] + kept_search)
+    return traffic_csv, search_csv, (len(kept_traffic), len(kept_search)), used_tokens
+
+
+def build_prompts(processed_df: pd.DataFrame, config: ListingConfig, product: Dict[str, str]):
+    """根据已预处理的关键词数据和产品信息，创建标题和五点描述的提示词。"""
     top_traffic_df = get_top_keywords_by_traffic(processed_df, config)
     top_search_df = get_top_keywords_by_search_volume(processed_df, config)
 
-    existing_columns = [col for col in config.KEYWORD_COLUMNS if col in processed_df.columns and col != 'ASIN']
-    traffic_keywords_csv = top_traffic_df[existing_columns].to_csv(index=False)
-    search_volume_keywords_csv = top_search_df[existing_columns].to_csv(index=False)
+    # 提示词中的关键词数量以压缩后实际写入的行数为准，而不是 TOP_N_KEYWORDS
+    traffic_keywords_csv, search_volume_keywords_csv, (traffic_count, search_count), keyword_tokens = \
+        compact_keyword_tables(top_traffic_df, top_search_df, config)
 
     title_prompt = textwrap.dedent(config.TITLE_PROMPT_TEMPLATE.format(
-        top_n=config.TOP_N_KEYWORDS, product_name=config.PRODUCT_NAME,
-        product_english_name=config.PRODUCT_ENGLISH_NAME, title_count=config.TITLE_COUNT,
-        core_keywords=config.CORE_KEYWORDS, key_features=config.KEY_FEATURES,
+        traffic_keyword_count=traffic_count, search_keyword_count=search_count,
+        product_name=product["product_name"],
+        product_english_name=product["product_english_name"], title_count=config.TITLE_COUNT,
+        core_keywords=product["core_keywords"], key_features=product["key_features"],
         traffic_keywords_csv=traffic_keywords_csv, search_volume_keywords_csv=search_volume_keywords_csv
     )).strip()
 
     bullet_points_prompt = textwrap.dedent(config.BULLET_POINTS_PROMPT_TEMPLATE.format(
-        top_n=config.TOP_N_KEYWORDS, product_name=config.PRODUCT_NAME,
-        product_english_name=config.PRODUCT_ENGLISH_NAME, bullet_points_count=config.BULLET_POINTS_COUNT,
-        bullet_point_example=config.BULLET_POINT_EXAMPLE, user_pain_points=config.USER_PAIN_POINTS,
-        usage_scenarios=config.USAGE_SCENARIOS, traffic_keywords_csv=traffic_keywords_csv,
+        traffic_keyword_count=traffic_count, search_keyword_count=search_count,
+        product_name=product["product_name"],
+        product_english_name=product["product_english_name"], bullet_points_count=config.BULLET_POINTS_COUNT,
+        bullet_point_example=product["bullet_point_example"], user_pain_points=product["user_pain_points"],
+        usage_scenarios=product["usage_scenarios"], traffic_keywords_csv=traffic_keywords_csv,
         search_volume_keywords_csv=search_volume_keywords_csv
     )).strip()
 
     return {
         "title": title_prompt, "bullet_points": bullet_points_prompt, "top_traffic_df": top_traffic_df,
-        "top_search_df": top_search_df, "processed_df": processed_df
+        "top_search_df": top_search_df, "processed_df": processed_df,
+        "estimated_tokens": {
+            "keywords": keyword_tokens,
+            "title": estimate_tokens(title_prompt),
+            "bullet_points": estimate_tokens(bullet_points_prompt),
+        }
     }
 
 
-# --- 修改：generate_listing_info 函数现在接收 model_name 参数 ---
-def generate_listing_info(api_key: str, prompt: str, model_name: str):
-    """使用 Google Gemini API 根据提示词生成内容。"""
-    if not api_key or not api_key.startswith("AI"):
-        st.error("❌ Google Gemini API 密钥无效或未提供，请检查。")
-        return None
-    try:
-        genai.configure(api_key=api_key)
-        # 使用传入的 model_name 初始化模型
-        model = genai.GenerativeModel(model_name)
-        response = model.generate_content(prompt)
-        return response.text
-    except Exception as e:
-        st.error(f"调用 API 时发生错误: {e}")
-        return f"调用API时发生错误: {e}"
+def create_prompts(df: pd.DataFrame, config: ListingConfig, product: Optional[Dict[str, str]] = None):
+    """根据 DataFrame 中的关键词数据，创建用于生成标题和五点描述的提示词。"""
+    processed_df = preprocess_keyword_data(df, config)
+    return build_prompts(processed_df, config, product or default_product_info(config))
+
+
+def stream_listing_info(client: GeminiClient, prompt: str, model_name: str,
+                        use_cache: bool = True) -> Iterator[str]:
+    """
+    以流式方式调用 Gemini，逐块产出生成的文本（相同提示词直接命中共享缓存）。
+    该函数会在工作线程中运行，因此不调用任何 st.* 接口（包括 st.cache_resource 包装的 get_llm_client），
+    客户端由主线程传入，错误以异常形式抛出。
+    """
+    yield from client.stream(model_name, prompt, use_cache=use_cache)
+
+
+def generate_listings_concurrently(api_key: str, prompts: Dict[str, str], model_names: List[str],
+                                   on_update: Callable[[str, str, str], None],
+                                   max_workers: int, use_cache: bool = True) -> Dict[str, Dict[str, str]]:
+    """
+    并发生成所有 (模型, 提示词) 组合，总耗时取决于最慢的一次调用而不是所有调用之和。
+
+    共享客户端在主线程中获取后传给工作线程；工作线程把流式片段放入队列，
+    主线程（持有 Streamlit 上下文）取出后调用 on_update 刷新界面。
+
+    Returns:
+        {model_name: {task_name: 生成的文本}}
+    """
+    genai.configure(api_key=api_key)
+    client = get_llm_client()
+    updates: "queue.Queue[Tuple[str, str, str, bool]]" = queue.Queue()
+    jobs = [(model_name, task) for model_name in model_names for task in prompts]
+
+    def worker(model_name: str, task: str):
+        text = ""
+        try:
+            for piece in stream_listing_info(client, prompts[task], model_name, use_cache):
+                text += piece
+                updates.put((model_name, task, text, False))
+        except Exception as e:
+            text = f"调用API时发生错误: {e}"
+        updates.put((model_name, task, text, True))
+
+    results: Dict[str, Dict[str, str]] = {model_name: {} for model_name in model_names}
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(jobs))) as executor:
+        for model_name, task in jobs:
+            executor.submit(worker, model_name, task)
+
+        remaining = len(jobs)
+        while remaining:
+            model_name, task, text, done = updates.get()
+            on_update(model_name, task, text)
+            if done:
+                results[model_name][task] = text
+                remaining -= 1
+    return results
+
+
+# --- 批量生成 ---
+
+def is_retryable_error(error: Exception) -> bool:
+    """判断错误是否值得重试：限流 (429) 以及服务端临时错误。"""
+    retryable_types = (
+        google_exceptions.ResourceExhausted,
+        google_exceptions.TooManyRequests,
+        google_exceptions.ServiceUnavailable,
+        google_exceptions.DeadlineExceeded,
+        google_exceptions.InternalServerError,
+    )
+    return isinstance(error, retryable_types) or "429" in str(error)
+
+
+def generate_with_retry(client: GeminiClient, prompt: str, model_name: str, max_retries: int, base_delay: float,
+                        use_cache: bool = True) -> str:
+    """
+    调用 Gemini 生成内容，遇到限流等临时错误时按指数退避（带随机抖动）重试。
+    在工作线程中运行，客户端由主线程传入。
+    """
+    attempt = 0
+    while True:
+        try:
+            return client.generate(model_name, prompt, use_cache=use_cache)
+        except Exception as e:
+            if attempt >= max_retries or not is_retryable_error(e):
+                raise
+            time.sleep(base_delay * (2 ** attempt) + random.uniform(0, base_delay))
+            attempt += 1
+
+
+def read_product_sheet(uploaded_file, config: ListingConfig) -> pd.DataFrame:
+    """读取产品信息表，校验必填列，并用配置中的默认值补齐缺失的可选列。"""
+    df = pd.read_excel(uploaded_file, sheet_name=0, dtype=str)
+    missing = [col for col in config.PRODUCT_SHEET_REQUIRED_COLUMNS if col not in df.columns]
+    if missing:
+        raise ValueError(f"产品信息表缺少必填列: {', '.join(missing)}")
+    df = df.dropna(subset=config.PRODUCT_SHEET_REQUIRED_COLUMNS)
+
+    defaults = default_product_info(config)
+    for column, field in config.PRODUCT_SHEET_COLUMNS.items():
+        if column not in df.columns:
+            df[column] = defaults.get(field, "")
+        else:
+            df[column] = df[column].fillna(defaults.get(field, ""))
+    df["ASIN"] = df["ASIN"].str.strip().str.upper()
+    return df[list(config.PRODUCT_SHEET_COLUMNS)]
+
+
+def create_product_sheet_template(config: ListingConfig) -> bytes:
+    """生成产品信息表模板（以配置中的默认产品作为示例行）。"""
+    defaults = default_product_info(config)
+    example = {column: defaults.get(field, "B0XXXXXXXX") for column, field in config.PRODUCT_SHEET_COLUMNS.items()}
+    output = BytesIO()
+    pd.DataFrame([example]).to_excel(output, index=False, engine='openpyxl')
+    return output.getvalue()
+
+
+def match_keyword_file(asin: str, keyword_files) -> Optional[Any]:
+    """按文件名中包含的 ASIN 为产品匹配关键词反查文件。"""
+    for file in keyword_files:
+        if asin and asin in file.name.upper():
+            return file
+    return None
+
+
+def build_batch_jobs(product_df: pd.DataFrame, keyword_files, config: ListingConfig):
+    """
+    为每个产品准备提示词。每个关键词文件只读取和预处理一次，多个产品共用同一文件时直接复用。
+
+    同一 ASIN 出现在多行时（例如同一商品的不同文案方向），每行都作为独立的任务处理。
+
+    Returns:
+        (jobs, errors)：jobs 为 [(asin, 产品名称, prompts)]，errors 为 [(asin, 产品名称, 错误信息)]
+    """
+    processed_cache: Dict[str, pd.DataFrame] = {}
+    jobs, errors = [], []
+    for _, row in product_df.iterrows():
+        asin = row["ASIN"]
+        keyword_file = match_keyword_file(asin, keyword_files)
+        if keyword_file is None:
+            errors.append((asin, row["产品名称"], "未找到文件名中包含该 ASIN 的关键词文件"))
+            continue
+        try:
+            if keyword_file.name not in processed_cache:
+                raw_df = pd.read_excel(keyword_file, sheet_name=0)
+                processed_cache[keyword_file.name] = preprocess_keyword_data(raw_df, config, verbose=False)
+            product = {field: row[column] for column, field in config.PRODUCT_SHEET_COLUMNS.items()}
+            prompts = build_prompts(processed_cache[keyword_file.name], config, product)
+            jobs.append((asin, row["产品名称"], prompts))
+        except Exception as e:
+            errors.append((asin, row["产品名称"], f"关键词文件处理失败: {e}"))
+    return jobs, errors
+
+
+def run_batch_generation(jobs, model_name: str, config: ListingConfig,
+                         on_progress: Callable[[int, int], None], use_cache: bool = True) -> pd.DataFrame:
+    """
+    通过有界并发的线程池批量生成所有产品的标题和五点描述。
+    并发数由 BATCH_MAX_CONCURRENCY 控制，单个请求遇到限流时自动退避重试，失败不会中断整个批次。
+    结果按任务在 jobs 中的位置保存，同一 ASIN 的多行互不覆盖。
+    """
+    client = get_llm_client()
+    tasks = [(index, task) for index in range(len(jobs)) for task in config.GENERATION_TASKS]
+    results: List[Dict[str, str]] = [{} for _ in jobs]
+
+    with ThreadPoolExecutor(max_workers=config.BATCH_MAX_CONCURRENCY) as executor:
+        futures = {
+            executor.submit(generate_with_retry, client, jobs[index][2][task], model_name,
+                            config.BATCH_MAX_RETRIES, config.BATCH_RETRY_BASE_DELAY, use_cache): (index, task)
+            for index, task in tasks
+        }
+        for done_count, future in enumerate(as_completed(futures), start=1):
+            index, task = futures[future]
+            try:
+                results[index][task] = future.result()
+            except Exception as e:
+                results[index].setdefault("error", f"{config.GENERATION_TASKS[task]}生成失败: {e}")
+            on_progress(done_count, len(tasks))
+
+    rows = []
+    for (asin, product_name, _), result in zip(jobs, results):
+        rows.append({
+            "ASIN": asin,
+            "产品名称": product_name,
+            "建议标题": result.get("title", ""),
+            "建议五点描述": result.get("bullet_points", ""),
+            "状态": result.get("error", "成功"),
+        })
+    return pd.DataFrame(rows)
+
+
+def render_batch_mode(api_key: str, use_cache: bool):
+    """渲染批量生成模式：上传产品信息表和多个关键词文件，一次生成所有产品的 Listing。"""
+    if 'batch_results' not in st.session_state:
+        st.session_state.batch_results = None
+
+    with st.container(border=True):
+        st.header("📦 批量生成: 上传产品信息表与关键词文件")
+        st.download_button("📄 下载产品信息表模板", data=create_product_sheet_template(cfg),
+                           file_name="产品信息表模板.xlsx",
+                           mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+        model_name = st.selectbox("选择批量生成使用的 AI 模型:", cfg.GEMINI_MODEL_OPTIONS,
+                                  index=cfg.GEMINI_MODEL_OPTIONS.index(cfg.DEFAULT_MODEL), key='batch_model')
+        product_file = st.file_uploader("上传产品信息表 (每行一个产品)", type=['xlsx'], key='batch_product_file')
+        keyword_files = st.file_uploader("上传各 ASIN 的关键词反查文件 (文件名需包含 ASIN)", type=['xlsx'],
+                                         accept_multiple_files=True, key='batch_keyword_files')
+
+        if product_file and keyword_files and st.button("🚀 开始批量生成", type="primary", use_container_width=True):
+            if not api_key.startswith("AI"):
+                st.error("❌ Google Gemini API 密钥无效或未提供，请检查。")
+                st.stop()
+            try:
+                product_df = read_product_sheet(product_file, cfg)
+            except Exception as e:
+                st.error(f"❌ 产品信息表读取失败: {e}")
+                st.stop()
+
+            with st.spinner("正在预处理关键词文件..."):
+                jobs, errors = build_batch_jobs(product_df, keyword_files, cfg)
+            total_tokens = sum(sum(prompts["estimated_tokens"][task] for task in cfg.GENERATION_TASKS)
+                               for _, _, prompts in jobs)
+            st.info(f"共 {len(product_df)} 个产品，{len(jobs)} 个已准备就绪，{len(errors)} 个无法处理。"
+                    f"预计发送约 {total_tokens:,} 个输入 token。")
+
+            results_df = pd.DataFrame(columns=["ASIN", "产品名称", "建议标题", "建议五点描述", "状态"])
+            if jobs:
+                genai.configure(api_key=api_key)
+                progress_bar = st.progress(0.0, text="正在生成...")
+
+                def show_progress(done: int, total: int):
+                    progress_bar.progress(done / total, text=f"正在生成... {done}/{total}")
+
+                results_df = run_batch_generation(jobs, model_name, cfg, show_progress, use_cache)
+
+            error_rows = [{"ASIN": asin, "产品名称": product_name, "状态": message}
+                          for asin, product_name, message in errors]
+            if error_rows:
+                results_df = pd.concat([results_df, pd.DataFrame(error_rows)], ignore_index=True).fillna("")
+            st.session_state.batch_results = results_df
+
+    if st.session_state.batch_results is not None:
+        with st.container(border=True):
+            st.header("✅ 批量生成结果")
+            results_df = st.session_state.batch_results
+            success_count = int((results_df["状态"] == "成功").sum())
+            st.success(f"成功生成 {success_count} / {len(results_df)} 个产品的 Listing。")
+            st.dataframe(results_df, use_container_width=True)
+
+            output = BytesIO()
+            results_df.to_excel(output, index=False, sheet_name="Listing", engine='openpyxl')
+            st.download_button("📥 下载批量生成结果 (Excel)", data=output.getvalue(),
+                               file_name=cfg.BATCH_OUTPUT_FILENAME,
+                               mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
 
 
 # --- 主函数与页面渲染 (已重构以支持页面持久化和模型选择) ---
@@ -270,13 +620,12 @@ def main():
         st.session_state.uploaded_data = None
     if 'generated_prompts' not in st.session_state:
         st.session_state.generated_prompts = None
-    if 'generated_title' not in st.session_state:
-        st.session_state.generated_title = None
-    if 'generated_bullets' not in st.session_state:
-        st.session_state.generated_bullets = None
-    # --- 新增：为选择的模型初始化 session_state ---
-    if 'selected_model' not in st.session_state:
-        st.session_state.selected_model = cfg.DEFAULT_MODEL
+    # 生成结果：{model_name: {"title": ..., "bullet_points": ...}}
+    if 'generated_results' not in st.session_state:
+        st.session_state.generated_results = None
+    # --- 为选择的模型初始化 session_state（支持多选，同时生成多个模型的变体） ---
+    if 'selected_models' not in st.session_state:
+        st.session_state.selected_models = [cfg.DEFAULT_MODEL]
 
     # 根据运行模式处理 API Key
     api_key = None
@@ -296,19 +645,23 @@ def main():
         st.warning("请输入或配置您的 API 密钥以开始使用。")
         st.stop()
 
+    mode = st.radio("生成模式:", ["单个产品", "批量生成"], horizontal=True,
+                    help="批量生成：上传产品信息表和多个关键词文件，一次生成所有产品的标题和五点描述。")
+    if mode == "批量生成":
+        render_batch_mode(api_key, use_llm_cache)
+        return
+
     # --- 步骤 1: 上传文件与数据处理 ---
     with st.container(border=True):
         st.header("⚙️ 第 1 步: 上传文件与配置")
 
-        # --- 新增：模型选择器 ---
+        # --- 模型选择器（可多选） ---
         # 使用 key 直接将选择器的值绑定到 session_state
-        st.selectbox(
-            label="选择您想使用的 AI 模型:",
+        st.multiselect(
+            label="选择您想使用的 AI 模型（可多选，多个模型将同时生成以便对比）:",
             options=cfg.GEMINI_MODEL_OPTIONS,
-            # 确保默认选项是配置文件中指定的模型
-            index=cfg.GEMINI_MODEL_OPTIONS.index(st.session_state.selected_model),
-            key='selected_model',
-            help="模型越强大，生成速度可能越慢，成本也可能更高。"
+            key='selected_models',
+            help="所有模型并发请求，总耗时约等于最慢的那个模型。模型越强大，生成速度可能越慢，成本也可能更高。"
         )
 
         uploaded_file = st.file_uploader(
@@ -326,8 +679,7 @@ def main():
                 st.session_state.uploaded_filename = uploaded_file.name
                 # 2. 重置所有下游状态，因为源数据已更改
                 st.session_state.generated_prompts = None
-                st.session_state.generated_title = None
-                st.session_state.generated_bullets = None
+                st.session_state.generated_results = None
                 # 使用 st.rerun() 可以立即刷新页面，提供更流畅的体验
                 st.rerun()
 
@@ -392,6 +744,7 @@ def main():
                     height=500,
                     key='title_prompt_editor'
                 )
+                st.caption(f"预计 Token 数: ~{estimate_tokens(title_prompt_text):,}")
             with col2:
                 bullet_points_prompt_text = st.text_area(
                     label="**五点描述生成提示词 (Bullet Points Prompt)**",
@@ -399,36 +752,64 @@ def main():
                     height=500,
                     key='bullets_prompt_editor'
                 )
+                st.caption(f"预计 Token 数: ~{estimate_tokens(bullet_points_prompt_text):,}")
+
+            keyword_tokens = st.session_state.generated_prompts.get('estimated_tokens', {}).get('keywords')
+            if keyword_tokens is not None:
+                st.info(f"🧮 关键词数据已去重压缩，约 {keyword_tokens:,} tokens "
+                        f"(预算 {cfg.KEYWORD_TOKEN_BUDGET:,})，同时写入标题和五点描述两个提示词。")
 
             st.header("✨ 第 3 步: 生成 Listing")
-            if st.button("🚀 点击生成 Listing", type="primary", use_container_width=True):
-                # --- 修改：更新 spinner 提示信息 ---
-                spinner_message = f"AI 正在使用 `{st.session_state.selected_model}` 模型努力创作中，请稍候..."
+            selected_models = st.session_state.selected_models
+            if not selected_models:
+                st.warning("请至少选择一个 AI 模型。")
+            elif st.button("🚀 点击生成 Listing", type="primary", use_container_width=True):
+                if not api_key.startswith("AI"):
+                    st.error("❌ Google Gemini API 密钥无效或未提供，请检查。")
+                    st.stop()
+
+                # 从编辑框获取最新文本
+                final_prompts = {
+                    "title": st.session_state.title_prompt_editor,
+                    "bullet_points": st.session_state.bullets_prompt_editor,
+                }
+
+                # 为每个 (模型, 任务) 预留一个占位符，用于实时展示流式输出
+                placeholders = {}
+                for model_name in selected_models:
+                    st.markdown(f"**🤖 {model_name}**")
+                    columns = st.columns(len(cfg.GENERATION_TASKS))
+                    for column, (task, label) in zip(columns, cfg.GENERATION_TASKS.items()):
+                        column.caption(label)
+                        placeholders[(model_name, task)] = column.empty()
+
+                def show_partial(model_name: str, task: str, text: str):
+                    placeholders[(model_name, task)].code(text, language=None)
+
+                spinner_message = f"AI 正在使用 {len(selected_models)} 个模型并发创作中，请稍候..."
                 with st.spinner(spinner_message):
-                    # 从编辑框获取最新文本
-                    final_title_prompt = st.session_state.title_prompt_editor
-                    final_bullets_prompt = st.session_state.bullets_prompt_editor
-
-                    # --- 修改：将选择的模型名称传入生成函数 ---
-                    selected_model = st.session_state.selected_model
-                    generated_title = generate_listing_info(api_key, final_title_prompt, selected_model)
-                    generated_bullets = generate_listing_info(api_key, final_bullets_prompt, selected_model)
-
-                    st.session_state.generated_title = generated_title
-                    st.session_state.generated_bullets = generated_bullets
+                    st.session_state.generated_results = generate_listings_concurrently(
+                        api_key, final_prompts, selected_models, show_partial, cfg.MAX_CONCURRENT_REQUESTS,
+                        use_cache=use_llm_cache
+                    )
                 st.rerun()
 
     # --- 结果展示 ---
-    if 'generated_title' in st.session_state and st.session_state.generated_title:
+    if st.session_state.generated_results:
         with st.container(border=True):
             st.header("✅ 第 4 步: 查看并复制结果")
-            col1, col2 = st.columns(2)
-            with col1:
-                st.markdown("**建议标题:**")
-                st.code(st.session_state.generated_title, language=None)
-            with col2:
-                st.markdown("**建议五点描述:**")
-                st.code(st.session_state.generated_bullets, language=None)
+            model_names = list(st.session_state.generated_results)
+            tabs = st.tabs(model_names)
+            for tab, model_name in zip(tabs, model_names):
+                result = st.session_state.generated_results[model_name]
+                with tab:
+                    col1, col2 = st.columns(2)
+                    with col1:
+                        st.markdown("**建议标题:**")
+                        st.code(result.get("title", ""), language=None)
+                    with col2:
+                        st.markdown("**建议五点描述:**")
+                        st.code(result.get("bullet_points", ""), language=None)
 
 
 if __name__ == "__main__":
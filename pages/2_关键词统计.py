@@ -1,10 +1,12 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.express as px
 from wordcloud import WordCloud
-import matplotlib.pyplot as plt
 import re
-from collections import Counter
+import hashlib
+import importlib.util
+import xlsxwriter
 from typing import Optional, Dict, Tuple, List, Any
 from io import BytesIO
 # from shared.usage_tracker import track_script_usage
@@ -36,7 +38,13 @@ class AppConfig:
     # 图表高度
     CHART_HEIGHT = 800
 
-    # 词云图配置
+    # 大数据量渲染配置
+    SCATTER_WEBGL_THRESHOLD = 1000  # 超过该点数时散点图切换为 WebGL (scattergl)
+    SCATTER_MAX_POINTS = 3000  # 散点图最多发送到浏览器的点数，超出时对密集区域降采样
+    SCATTER_GRID_BINS = 50  # 降采样时每个坐标轴划分的网格数
+    TABLE_PAGE_SIZE = 200  # 数据表格每页行数（服务端分页）
+
+    # 词云图配置（width/height 为高清下载版的基准尺寸）
     WORDCLOUD_CONFIG = {
         "width": 1600,
         "height": 900,
@@ -47,6 +55,20 @@ class AppConfig:
         "prefer_horizontal": 0.9,
         "collocations": False
     }
+    # 页面展示用的词云尺寸，按显示分辨率渲染，避免每次重绘超大PNG
+    WORDCLOUD_DISPLAY_SIZE = (800, 450)
+    # 高清下载版的放大倍数（仅在用户点击生成时渲染）
+    WORDCLOUD_DOWNLOAD_SCALE = 2
+    WORD_FREQ_TOP_N = 20
+
+    # 导出配置
+    CONSOLIDATED_SHEET_NAME = '总表-所有ASIN整合'
+    EXPORT_FILE_STEM = "Consolidated_ASIN_Keywords"
+    EXPORT_FORMATS = {
+        "Excel (.xlsx)": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+        "CSV (仅总表, .csv)": ("csv", "text/csv"),
+        "Parquet (仅总表, .parquet)": ("parquet", "application/octet-stream"),
+    }
 
     # 策略建议文案
     STRATEGY_ADVICE = {
@@ -92,17 +114,137 @@ def process_uploaded_file(uploaded_file) -> Optional[Tuple[str, pd.DataFrame, pd
         return None
 
 
+def compute_dataset_fingerprint(uploaded_files) -> str:
+    """根据上传文件的名称和内容计算数据集指纹，用作导出缓存的键。"""
+    digest = hashlib.md5()
+    for file in sorted(uploaded_files, key=lambda f: f.name):
+        digest.update(file.name.encode('utf-8'))
+        digest.update(file.getvalue())
+    return digest.hexdigest()
+
+
+def _write_sheet_streaming(workbook: xlsxwriter.Workbook, sheet_name: str, df: pd.DataFrame):
+    """按行顺序把 DataFrame 写入工作表（constant_memory 模式要求逐行写入）。"""
+    worksheet = workbook.add_worksheet(sheet_name)
+    worksheet.write_row(0, 0, [str(col) for col in df.columns])
+    for row_idx, row in enumerate(df.itertuples(index=False, name=None), start=1):
+        worksheet.write_row(row_idx, 0, [None if pd.isna(value) else value for value in row])
+
+
 def create_excel_file(individual_sheets: Dict[str, pd.DataFrame], consolidated_df: pd.DataFrame) -> BytesIO:
-    """创建包含总表和分表的Excel文件（内存中）。"""
+    """
+    创建包含总表和分表的Excel文件（内存中）。
+    使用 xlsxwriter 的 constant_memory 模式逐行流式写入，内存占用与行数无关。
+    """
     output = BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        consolidated_df.to_excel(writer, sheet_name='总表-所有ASIN整合', index=False)
-        for sheet_name, df in individual_sheets.items():
-            df.to_excel(writer, sheet_name=sheet_name, index=False)
+    workbook = xlsxwriter.Workbook(output, {'constant_memory': True})
+    _write_sheet_streaming(workbook, AppConfig.CONSOLIDATED_SHEET_NAME, consolidated_df)
+    for sheet_name, df in individual_sheets.items():
+        _write_sheet_streaming(workbook, sheet_name, df)
+    workbook.close()
     output.seek(0)
     return output
 
 
+def is_parquet_available() -> bool:
+    """Parquet 导出依赖 pyarrow，未安装时不提供该选项。"""
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def build_export_bytes(fingerprint: str, export_format: str,
+                       _individual_sheets: Dict[str, pd.DataFrame], _consolidated_df: pd.DataFrame) -> bytes:
+    """
+    按需生成导出文件的字节内容。
+    以数据集指纹和格式作为缓存键（带下划线的参数不参与哈希），同一份数据只生成一次。
+    """
+    if export_format == "xlsx":
+        return create_excel_file(_individual_sheets, _consolidated_df).getvalue()
+    if export_format == "csv":
+        # utf-8-sig 保证 Excel 直接打开时中文不乱码
+        return _consolidated_df.to_csv(index=False).encode('utf-8-sig')
+    if export_format == "parquet":
+        output = BytesIO()
+        _consolidated_df.to_parquet(output, index=False)
+        return output.getvalue()
+    raise ValueError(f"不支持的导出格式: {export_format}")
+
+
+def downsample_scatter_points(df: pd.DataFrame, x: str, y: str, max_points: int, bins: int) -> pd.DataFrame:
+    """
+    对散点数据降采样：离群点全部保留，其余点按二维网格分箱，
+    每个网格只保留 y 值最高的若干个点，使密集区域的点数受控而整体分布不变。
+    """
+    if len(df) <= max_points:
+        return df
+
+    def outlier_mask(series: pd.Series) -> pd.Series:
+        q1, q3 = series.quantile([0.25, 0.75])
+        return series > q3 + 1.5 * (q3 - q1)
+
+    is_outlier = outlier_mask(df[x]) | outlier_mask(df[y])
+    outliers = df[is_outlier]
+    inliers = df[~is_outlier]
+
+    budget = max_points - len(outliers)
+    if budget <= 0 or inliers.empty:
+        return outliers.nlargest(max_points, y)
+
+    # 搜索量通常呈长尾分布，x 轴在对数空间分箱
+    x_bins = pd.cut(np.log10(inliers[x].clip(lower=1)), bins=bins, labels=False)
+    y_bins = pd.cut(inliers[y], bins=bins, labels=False)
+    occupied_cells = pd.Series(list(zip(x_bins, y_bins))).nunique()
+    per_cell = max(budget // max(occupied_cells, 1), 1)
+
+    sampled = (
+        inliers.assign(_x_bin=x_bins, _y_bin=y_bins)
+        .sort_values(y, ascending=False)
+        .groupby(['_x_bin', '_y_bin'], sort=False)
+        .head(per_cell)
+        .drop(columns=['_x_bin', '_y_bin'])
+    )
+    return pd.concat([outliers, sampled.head(budget)])
+
+
+def count_keyword_words(keywords: pd.Series) -> pd.Series:
+    """向量化统计关键词中各单词的出现次数，返回按次数降序排列的 Series（index 为单词）。"""
+    return (
+        keywords.dropna().astype(str).str.lower()
+        .str.findall(r'\b\w+\b')
+        .explode()
+        .dropna()
+        .value_counts()
+    )
+
+
+def frequency_fingerprint(word_counts: pd.Series) -> str:
+    """根据词频内容计算指纹，用作词云图片缓存的键。"""
+    hashed = pd.util.hash_pandas_object(word_counts, index=True).values
+    return hashlib.md5(hashed.tobytes()).hexdigest()
+
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def render_wordcloud_png(fingerprint: str, _frequencies: Dict[str, int], width: int, height: int,
+                         scale: float = 1) -> bytes:
+    """
+    渲染词云并返回PNG字节。
+    以 fingerprint 作为缓存键（_frequencies 不参与哈希），同一份词频只渲染一次。
+    """
+    wc_config = dict(AppConfig.WORDCLOUD_CONFIG)
+    ratio = width / wc_config["width"]
+    wc_config.update(
+        width=width,
+        height=height,
+        scale=scale,
+        max_font_size=max(int(wc_config["max_font_size"] * ratio), 10),
+        min_font_size=max(int(wc_config["min_font_size"] * ratio), 4),
+    )
+    image = WordCloud(**wc_config).generate_from_frequencies(_frequencies).to_image()
+    buffer = BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
 # ==============================================================================
 # 2. UI界面类 (AppUI)
 # ==============================================================================
@@ -313,16 +455,26 @@ class AppUI:
             hover_template += "<b>涉及ASIN:</b> %{customdata[5]}"
         hover_template += "<extra></extra>"
 
-        fig = px.scatter(df_filtered, x='月搜索量', y='总流量贡献', color='关键词类型', title=chart_title,
+        # 数据量较大时：密集区域降采样（保留离群点），并切换到 WebGL 渲染
+        total_points = len(df_filtered)
+        plot_df = downsample_scatter_points(df_filtered, '月搜索量', '总流量贡献',
+                                            self.config.SCATTER_MAX_POINTS, self.config.SCATTER_GRID_BINS)
+        render_mode = 'webgl' if len(plot_df) > self.config.SCATTER_WEBGL_THRESHOLD else 'svg'
+
+        fig = px.scatter(plot_df, x='月搜索量', y='总流量贡献', color='关键词类型', title=chart_title,
                          labels={'月搜索量': '月搜索量', '总流量贡献': '流量占比 (%)', '关键词类型': '关键词类型'},
-                         color_discrete_map=self.config.COLOR_MAP_KEYWORD_TYPES)
-        fig.update_traces(marker=dict(size=8), hovertemplate=hover_template, customdata=df_filtered[hover_data])
+                         color_discrete_map=self.config.COLOR_MAP_KEYWORD_TYPES,
+                         custom_data=hover_data, render_mode=render_mode)
+        fig.update_traces(marker=dict(size=8), hovertemplate=hover_template)
         fig.add_hline(y=traffic_median, line_dash="dash", line_color="red",
                       annotation_text=f"流量中位数: {traffic_median:.2f}%")
         fig.add_vline(x=search_median, line_dash="dash", line_color="red",
                       annotation_text=f"搜索量中位数: {search_median:,.0f}")
         fig.update_layout(height=600)
         st.plotly_chart(fig, use_container_width=True)
+        if len(plot_df) < total_points:
+            st.caption(f"数据点较多，图中展示了 {len(plot_df):,} / {total_points:,} 个关键词"
+                       f"（已保留全部离群点，密集区域已降采样）。完整数据见下方表格。")
 
     def _display_keyword_analysis_details(self, df_filtered, has_asin, search_median, traffic_median):
         """内部方法：显示关键词分析的统计数据、表格和建议"""
@@ -346,7 +498,7 @@ class AppUI:
                                         default=df_filtered['关键词类型'].unique())
         display_df = df_filtered[df_filtered['关键词类型'].isin(selected_types)]
         # ... (此处省略了表格的创建和格式化逻辑，与原代码相同)
-        st.dataframe(display_df, use_container_width=True)  # 简化显示，可按原代码格式化
+        self.display_paged_dataframe(display_df, key="keyword_analysis_table")
 
         st.write("### 💡 策略建议")
         for keyword_type in selected_types:
@@ -356,29 +508,37 @@ class AppUI:
     def display_word_frequency_section(self, df: pd.DataFrame, title: str):
         """显示单词频率分析模块（词云+表格）"""
         st.subheader(title)
-        text = ' '.join(df['流量词'].dropna())
-        words = re.findall(r'\b\w+\b', text.lower())
-        word_counts = Counter(words)
+        word_counts = count_keyword_words(df['流量词'])
 
-        if not word_counts:
+        if word_counts.empty:
             st.warning("没有可用于词频分析的关键词。")
             return
 
-        # 词云图
-        wordcloud = WordCloud(**self.config.WORDCLOUD_CONFIG).generate_from_frequencies(word_counts)
-        fig, ax = plt.subplots(figsize=(12, 9), dpi=300)
-        ax.imshow(wordcloud, interpolation='bilinear')
-        ax.axis('off')
-        fig.patch.set_alpha(0)
-        ax.patch.set_alpha(0)
-        st.pyplot(fig, bbox_inches='tight', pad_inches=0)
+        # 词云图：按显示分辨率渲染，并以词频指纹缓存
+        fingerprint = frequency_fingerprint(word_counts)
+        frequencies = word_counts.to_dict()
+        display_width, display_height = self.config.WORDCLOUD_DISPLAY_SIZE
+        st.image(render_wordcloud_png(fingerprint, frequencies, display_width, display_height),
+                 use_container_width=True)
+
+        # 高清版本只在用户明确请求时才生成
+        hd_key = f"wordcloud_hd_{fingerprint}"
+        if st.button("🖼️ 生成高清词云", key=f"{hd_key}_btn"):
+            st.session_state[hd_key] = True
+        if st.session_state.get(hd_key):
+            hd_png = render_wordcloud_png(fingerprint, frequencies,
+                                          self.config.WORDCLOUD_CONFIG["width"],
+                                          self.config.WORDCLOUD_CONFIG["height"],
+                                          scale=self.config.WORDCLOUD_DOWNLOAD_SCALE)
+            st.download_button("📥 下载高清词云 (PNG)", data=hd_png, file_name="wordcloud.png",
+                               mime="image/png", key=f"{hd_key}_download")
 
         # 频率表格
-        total_words = sum(word_counts.values())
-        freq_df = pd.DataFrame(word_counts.items(), columns=["单词", "出现次数"])
+        total_words = int(word_counts.sum())
+        freq_df = word_counts.rename_axis("单词").reset_index(name="出现次数")
         freq_df["频率"] = freq_df["出现次数"] / total_words
-        freq_df = freq_df.sort_values(by="出现次数", ascending=False)
-        st.dataframe(freq_df.head(20).style.format({"频率": "{:.2%}"}), height=600, use_container_width=True)
+        st.dataframe(freq_df.head(self.config.WORD_FREQ_TOP_N).style.format({"频率": "{:.2%}"}),
+                     height=600, use_container_width=True)
 
     def display_asin_traffic_contribution_chart(self, df: pd.DataFrame):
         """展示各ASIN流量贡献对比的柱状图"""
@@ -393,15 +553,57 @@ class AppUI:
         fig.update_layout(xaxis_tickangle=-45)
         st.plotly_chart(fig, use_container_width=True)
 
+    def display_paged_dataframe(self, df: pd.DataFrame, key: str):
+        """服务端分页展示表格，每次只把当前页的数据发送到浏览器"""
+        page_size = self.config.TABLE_PAGE_SIZE
+        total_rows = len(df)
+        if total_rows <= page_size:
+            st.dataframe(df, use_container_width=True)
+            return
+
+        total_pages = (total_rows + page_size - 1) // page_size
+        page = st.number_input(f"页码 (共 {total_pages} 页)", min_value=1, max_value=total_pages,
+                               value=1, step=1, key=f"{key}_page")
+        start = (page - 1) * page_size
+        end = min(start + page_size, total_rows)
+        st.dataframe(df.iloc[start:end], use_container_width=True)
+        st.caption(f"显示第 {start + 1:,} - {end:,} 行，共 {total_rows:,} 行")
+
     def display_raw_data(self, df: pd.DataFrame, title: str):
         """展示原始数据表格"""
         st.subheader(title)
-        st.dataframe(df)
+        self.display_paged_dataframe(df, key="raw_data_table")
 
     def display_download_button(self, data: BytesIO, label: str, file_name: str, mime: str):
         """显示下载按钮"""
         st.download_button(label=label, data=data, file_name=file_name, mime=mime)
 
+    def display_export_section(self, processed_data: Dict[str, Any]):
+        """显示导出模块：用户点击后才生成文件，结果按数据集缓存"""
+        format_options = [
+            name for name, (ext, _) in self.config.EXPORT_FORMATS.items()
+            if ext != "parquet" or is_parquet_available()
+        ]
+        col1, col2 = st.columns([3, 1])
+        format_label = col1.selectbox("导出格式:", format_options, label_visibility="collapsed")
+        export_format, mime = self.config.EXPORT_FORMATS[format_label]
+
+        fingerprint = processed_data["fingerprint"]
+        export_key = f"export_ready_{fingerprint}_{export_format}"
+        if col2.button("⚙️ 生成导出文件", use_container_width=True):
+            st.session_state[export_key] = True
+
+        if st.session_state.get(export_key):
+            with st.spinner("正在生成导出文件..."):
+                data = build_export_bytes(fingerprint, export_format,
+                                          processed_data["individual"], processed_data["consolidated"])
+            self.display_download_button(
+                data=data,
+                label=f"📥 下载合并后的文件 ({export_format})",
+                file_name=f"{self.config.EXPORT_FILE_STEM}.{export_format}",
+                mime=mime
+            )
+
 
 # ==============================================================================
 # 3. 主应用逻辑 (main)
@@ -437,7 +639,8 @@ def main():
                     consolidated_df = pd.concat(dfs_for_consolidation, ignore_index=True)
                     st.session_state.processed_data = {
                         "individual": individual_sheets,
-                        "consolidated": consolidated_df
+                        "consolidated": consolidated_df,
+                        "fingerprint": compute_dataset_fingerprint(uploaded_files)
                     }
                     st.session_state.file_names = current_file_names
                     st.success(f"成功处理并缓存了 {len(dfs_for_consolidation)} 个文件！")
@@ -474,14 +677,8 @@ def main():
 
     elif num_files > 1:
         # 多文件视图
-        # 提供下载按钮
-        excel_bytes = create_excel_file(individual_sheets, consolidated_df)
-        ui.display_download_button(
-            data=excel_bytes,
-            label="📥 下载合并后的Excel文件",
-            file_name="Consolidated_ASIN_Keywords.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        )
+        # 提供导出（按需生成，不在每次重跑时重建）
+        ui.display_export_section(processed_data)
 
         # 创建视图选择器
         asin_options = ["合并后文件统计信息"] + sorted(list(consolidated_df['ASIN'].unique()))
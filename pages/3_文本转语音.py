@@ -1,14 +1,22 @@
 import streamlit as st
 import edge_tts
 import asyncio
-from io import BytesIO
-from langdetect import detect, LangDetectException
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import as_completed
 from typing import List, Dict, Any, Optional
 
 
 # 假设您的侧边栏文件位于项目的 "shared" 文件夹中
 # from shared.usage_tracker import track_script_usage
 from shared.sidebar import create_common_sidebar
+from shared.config import GlobalConfig
+from shared.language_id import detect_language
 # track_script_usage("🔊 文字转语音")
 create_common_sidebar()
 
@@ -48,72 +56,283 @@ class AppConfig:
     # 查找默认声音时，优先选择的关键词
     PREFERRED_VOICES = ["Xiaoxiao", "Yunxi", "Microsoft Server Speech Text to Speech Voice"]
 
+    # 文本短于该长度时不做语言检测
+    LANG_DETECT_MIN_CHARS = 11
+
+    # 长文本分段合成配置
+    CHUNK_MAX_CHARS = 600  # 每段的最大字符数；分段越短，第一段音频越早可以播放
+    MAX_CONCURRENT_SYNTHESIS = 4  # 同时向 edge-tts 发起的合成请求上限
+    SENTENCE_END_PATTERN = re.compile(r'(?<=[。！？!?；;…])|(?<=[.!?])(?=\s)')
+
+    # 语速选项（edge-tts 的 rate 参数）
+    RATE_OPTIONS = ["-50%", "-25%", "+0%", "+25%", "+50%", "+75%", "+100%"]
+    DEFAULT_RATE = "+0%"
+
 
 # --- 2. 服务类 (Service) ---
 # 负责处理核心业务逻辑，如API调用、数据处理等，与UI分离
 
+@st.cache_resource
+def get_tts_event_loop() -> asyncio.AbstractEventLoop:
+    """
+    获取在后台线程中常驻运行的事件循环。
+    所有合成协程都提交到这个循环里，避免每次点击都用 asyncio.run 新建并销毁一个循环。
+    """
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True, name="edge-tts-loop").start()
+    return loop
+
+
+class VoiceCatalog:
+    """
+    预先建立索引的声音目录。
+    按语言代码分组、按 short_name 定位，并提前算好每种语言的默认声音，
+    页面上的筛选、默认选项和选中结果映射都只需要字典查找。
+    """
+
+    def __init__(self, raw_voices: List[Dict[str, Any]]):
+        voice_list = []
+        for v in raw_voices:
+            lang_code_short = v['Locale'].split('-')[0]
+            lang_name = AppConfig.LOCALE_MAP.get(lang_code_short, lang_code_short)
+            gender = AppConfig.GENDER_MAP.get(v['Gender'], v['Gender'])
+            voice_list.append({
+                "display_name": f"{lang_name} | {gender} - {v['ShortName'].split('-')[-1]}",
+                "short_name": v['ShortName'],
+                "lang_code": lang_code_short
+            })
+        # 按显示名称排序
+        self.voices = sorted(voice_list, key=lambda x: x['display_name'])
+        self.by_short_name = {v["short_name"]: v for v in self.voices}
+        self.by_lang: Dict[str, List[Dict[str, str]]] = {}
+        for v in self.voices:
+            self.by_lang.setdefault(v["lang_code"], []).append(v)
+        # 每个列表中 short_name -> 下标，供 selectbox 的 index 参数直接查找
+        self._positions = {None: {v["short_name"]: i for i, v in enumerate(self.voices)}}
+        for lang_code, voices in self.by_lang.items():
+            self._positions[lang_code] = {v["short_name"]: i for i, v in enumerate(voices)}
+        self.default_by_lang = {lang_code: self._pick_default(voices) for lang_code, voices in self.by_lang.items()}
+
+    @staticmethod
+    def _pick_default(voices: List[Dict[str, str]]) -> str:
+        """优先选择 PREFERRED_VOICES 中的高质量声音，否则取该语言的第一个声音"""
+        for p_voice in AppConfig.PREFERRED_VOICES:
+            for voice in voices:
+                if p_voice in voice["short_name"]:
+                    return voice["short_name"]
+        return voices[0]["short_name"]
+
+    def __bool__(self):
+        return bool(self.voices)
+
+    def voices_for(self, lang_code: Optional[str]) -> List[Dict[str, str]]:
+        """返回某种语言的声音列表；lang_code 为 None 时返回全部声音"""
+        return self.voices if lang_code is None else self.by_lang.get(lang_code, [])
+
+    def default_index(self, lang_code: str, filtered_by: Optional[str] = None) -> int:
+        """
+        默认声音在 voices_for(filtered_by) 列表中的下标。
+
+        Args:
+            lang_code: 用来挑选默认声音的语言。
+            filtered_by: 当前展示的列表对应的语言，None 表示展示的是全部声音。
+        """
+        default_voice = self.default_by_lang.get(lang_code)
+        return self._positions.get(filtered_by, {}).get(default_voice, 0)
+
+
+def _read_voice_cache(path: str) -> Optional[List[Dict[str, Any]]]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_voice_cache(path: str, voices: List[Dict[str, Any]]):
+    """把声音列表原子地写回磁盘。写入失败（只读文件系统、权限不足等）只记录日志，不影响本次已获取的列表。"""
+    tmp_path = f"{path}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(voices, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logging.warning(f"写入声音列表缓存失败: {e}")
+
+
+@st.cache_resource(ttl=3600)
+def load_voice_catalog(cache_path: str, refresh_seconds: int) -> VoiceCatalog:
+    """
+    加载声音目录并建立索引。
+    磁盘缓存未过期时直接使用，不联网；过期或缺失时调用 edge_tts.list_voices() 刷新并写回磁盘。
+    联网失败时回退到过期的磁盘缓存，页面仍可离线渲染；两者都没有时抛出异常（失败结果不会被缓存）。
+    """
+    cached = _read_voice_cache(cache_path)
+    is_fresh = cached and time.time() - os.path.getmtime(cache_path) < refresh_seconds
+    if is_fresh:
+        return VoiceCatalog(cached)
+    try:
+        voices = asyncio.run_coroutine_threadsafe(edge_tts.list_voices(), get_tts_event_loop()).result()
+    except Exception as e:
+        if not cached:
+            raise
+        logging.warning(f"刷新声音列表失败，使用本地缓存: {e}")
+        return VoiceCatalog(cached)
+    _write_voice_cache(cache_path, voices)
+    return VoiceCatalog(voices)
+
+
 class TTSService:
     """文本转语音核心服务类"""
 
+    def __init__(self):
+        cfg = GlobalConfig()
+        self.cache_dir = cfg.TTS_CACHE_DIR
+        self.cache_max_bytes = cfg.TTS_CACHE_MAX_BYTES
+        os.makedirs(self.cache_dir, exist_ok=True)
+
     @staticmethod
-    async def text_to_speech_async(text: str, voice: str) -> BytesIO:
-        """异步将文本转换为语音"""
-        voice_data = BytesIO()
-        communicate = edge_tts.Communicate(text, voice)
-        async for chunk in communicate.stream():
-            if chunk["type"] == "audio":
-                voice_data.write(chunk["data"])
-        voice_data.seek(0)
-        return voice_data
+    def split_text_into_chunks(text: str, max_chars: int = AppConfig.CHUNK_MAX_CHARS) -> List[str]:
+        """
+        按句子边界把长文本切成不超过 max_chars 的分段。
+        分段不会跨越段落（换行），因此修改某一段落只会改变该段落对应的分段，其他分段仍能命中缓存。
+        """
+        chunks = []
+        for paragraph in text.splitlines():
+            paragraph = paragraph.strip()
+            if not paragraph:
+                continue
+            current = ""
+            for sentence in AppConfig.SENTENCE_END_PATTERN.split(paragraph):
+                if current and len(current) + len(sentence) > max_chars:
+                    chunks.append(current.strip())
+                    current = ""
+                # 单个句子本身超长时按长度硬切
+                while len(sentence) > max_chars:
+                    chunks.append(sentence[:max_chars].strip())
+                    sentence = sentence[max_chars:]
+                current += sentence
+            if current.strip():
+                chunks.append(current.strip())
+        return chunks
+
+    def _cache_path(self, text: str, voice: str, rate: str) -> str:
+        key = hashlib.sha256(f"{voice}\n{rate}\n{text}".encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.mp3")
+
+    def get_cached_chunk(self, text: str, voice: str, rate: str) -> Optional[bytes]:
+        """读取分段音频缓存，未命中时返回 None。命中时刷新修改时间，供按最近使用淘汰。"""
+        path = self._cache_path(text, voice, rate)
+        try:
+            with open(path, "rb") as f:
+                audio = f.read()
+            os.utime(path)
+            return audio
+        except OSError:
+            return None
+
+    def save_chunk(self, text: str, voice: str, rate: str, audio: bytes):
+        """写入分段音频缓存（先写临时文件再原子替换，避免并发读取到半个文件）。"""
+        path = self._cache_path(text, voice, rate)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(audio)
+        os.replace(tmp_path, path)
+
+    def prune_cache(self):
+        """缓存总大小超过上限时，删除最久未使用的分段音频。"""
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and entry.name.endswith(".mp3"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_size <= self.cache_max_bytes:
+                break
+            try:
+                os.remove(path)
+                total_size -= size
+            except OSError:
+                pass
 
     @staticmethod
-    @st.cache_data
-    def get_voice_list() -> List[Dict[str, str]]:
-        """获取并缓存所有可用的声音列表"""
+    async def text_to_speech_async(text: str, voice: str, rate: str = AppConfig.DEFAULT_RATE,
+                                   semaphore: Optional[asyncio.Semaphore] = None) -> bytes:
+        """异步将一段文本转换为语音；传入 semaphore 时用它限制并发请求数。"""
+        async def synthesize():
+            audio = bytearray()
+            communicate = edge_tts.Communicate(text, voice, rate=rate)
+            async for chunk in communicate.stream():
+                if chunk["type"] == "audio":
+                    audio.extend(chunk["data"])
+            return bytes(audio)
+
+        if semaphore is None:
+            return await synthesize()
+        async with semaphore:
+            return await synthesize()
+
+    def synthesize_chunks(self, chunks: List[str], voice: str, rate: str, on_chunk_ready=None):
+        """
+        合成所有分段：已缓存的分段直接读取，其余分段提交到后台事件循环并发合成（并发数有上限）。
+        每个分段完成时在调用线程中回调 on_chunk_ready(index, audio, error)。
+
+        Returns:
+            (audios, errors)：audios 与 chunks 顺序一致（失败的分段为 None），errors 为 {index: 错误信息}。
+        """
+        audios: List[Optional[bytes]] = [None] * len(chunks)
+        errors: Dict[int, str] = {}
+        pending = []
+        for i, chunk in enumerate(chunks):
+            audios[i] = self.get_cached_chunk(chunk, voice, rate)
+            if audios[i] is not None:
+                if on_chunk_ready:
+                    on_chunk_ready(i, audios[i], None)
+            else:
+                pending.append(i)
+
+        if pending:
+            loop = get_tts_event_loop()
+            # Semaphore 必须在事件循环所在的线程中创建
+            semaphore = asyncio.run_coroutine_threadsafe(
+                self._make_semaphore(AppConfig.MAX_CONCURRENT_SYNTHESIS), loop).result()
+            futures = {
+                asyncio.run_coroutine_threadsafe(
+                    self.text_to_speech_async(chunks[i], voice, rate, semaphore), loop): i
+                for i in pending
+            }
+            for future in as_completed(futures):
+                i = futures[future]
+                try:
+                    audios[i] = future.result()
+                    self.save_chunk(chunks[i], voice, rate, audios[i])
+                except Exception as e:
+                    errors[i] = str(e)
+                if on_chunk_ready:
+                    on_chunk_ready(i, audios[i], errors.get(i))
+            self.prune_cache()
+        return audios, errors
+
+    @staticmethod
+    async def _make_semaphore(limit: int) -> asyncio.Semaphore:
+        return asyncio.Semaphore(limit)
+
+    @staticmethod
+    def get_voice_catalog() -> "VoiceCatalog":
+        """获取声音目录（优先读取磁盘缓存，过期后才联网刷新）"""
+        cfg = GlobalConfig()
         try:
-            # 使用同步方式运行异步函数以适配 st.cache_data
-            voices = asyncio.run(edge_tts.list_voices())
-            voice_list = []
-            for v in voices:
-                lang_code_short = v['Locale'].split('-')[0]
-                lang_name = AppConfig.LOCALE_MAP.get(lang_code_short, lang_code_short)
-                gender = AppConfig.GENDER_MAP.get(v['Gender'], v['Gender'])
-                display_name = f"{lang_name} | {gender} - {v['ShortName'].split('-')[-1]}"
-
-                voice_list.append({
-                    "display_name": display_name,
-                    "short_name": v['ShortName'],
-                    "lang_code": lang_code_short
-                })
-            # 按显示名称排序
-            return sorted(voice_list, key=lambda x: x['display_name'])
+            return load_voice_catalog(cfg.TTS_VOICE_CATALOG_PATH, cfg.TTS_VOICE_CATALOG_REFRESH_SECONDS)
         except Exception as e:
             st.error(f"获取声音列表时出错: {e}")
-            return []
-
-    @staticmethod
-    def find_default_voice_index(voices: List[Dict[str, str]], lang_code: str = "zh") -> int:
-        """在声音列表中查找合适的默认声音索引"""
-        # 优先尝试寻找特定的、高质量的声音
-        for p_voice in AppConfig.PREFERRED_VOICES:
-            for i, voice in enumerate(voices):
-                if lang_code in voice["short_name"] and p_voice in voice["short_name"]:
-                    return i
-        # 如果没找到，就返回该语言的第一个声音
-        for i, voice in enumerate(voices):
-            if voice["lang_code"] == lang_code:
-                return i
-        return 0  # 最终回退
+            return VoiceCatalog([])
 
     @staticmethod
     def detect_language(text: str) -> Optional[str]:
-        """检测文本的语言"""
-        if len(text) > 10:
-            try:
-                return detect(text).split('-')[0]
-            except LangDetectException:
-                return None
-        return None
+        """检测文本的语言（结果按文本缓存，长文本只取开头一段检测，重跑时不会重复计算）"""
+        return detect_language(text, min_chars=AppConfig.LANG_DETECT_MIN_CHARS)
 
 
 # --- 3. UI类 (UI) ---
@@ -124,7 +343,7 @@ class AppUI:
 
     def __init__(self, service: TTSService):
         self.service = service
-        self.all_voices = self.service.get_voice_list()
+        self.catalog = self.service.get_voice_catalog()
 
     def _initialize_session_state(self):
         """初始化 session_state，用于跨页面或重跑时保存用户输入"""
@@ -132,6 +351,8 @@ class AppUI:
             st.session_state.text_to_convert = "你好，欢迎使用这个文本转语音工具！"
         if "generated_audio" not in st.session_state:
             st.session_state.generated_audio = None
+        if "tts_rate" not in st.session_state:
+            st.session_state.tts_rate = AppConfig.DEFAULT_RATE
 
     def render_header(self):
         """渲染页面标题和介绍"""
@@ -160,46 +381,71 @@ class AppUI:
             )
 
             # 根据条件筛选声音列表
-            display_voices = self.all_voices
+            filter_lang = None
             if auto_filter and detected_lang:
-                filtered_voices = [v for v in self.all_voices if v["lang_code"] == detected_lang]
-                if filtered_voices:
-                    display_voices = filtered_voices
+                if detected_lang in self.catalog.by_lang:
+                    filter_lang = detected_lang
                 else:
                     st.warning(
                         f"未找到与检测到的语言 **({AppConfig.LOCALE_MAP.get(detected_lang, detected_lang)})** 匹配的声音。显示所有声音。")
+            display_voices = self.catalog.voices_for(filter_lang)
 
             # 确定默认选项
-            default_index = self.service.find_default_voice_index(display_voices, detected_lang or "zh")
+            default_index = self.catalog.default_index(detected_lang or "zh", filtered_by=filter_lang)
 
-            # 声音选择框
-            selected_voice_display = st.selectbox(
+            # 声音选择框：选项直接使用 short_name，显示名称通过字典查找
+            selected_voice = st.selectbox(
                 "请选择一个声音",
-                options=[v["display_name"] for v in display_voices],
-                index=default_index
+                options=[v["short_name"] for v in display_voices],
+                index=default_index,
+                format_func=lambda short_name: self.catalog.by_short_name[short_name]["display_name"]
             )
 
+            st.select_slider("语速", options=AppConfig.RATE_OPTIONS, key="tts_rate")
+
             # 返回选择的声音 short_name
-            return next(v["short_name"] for v in display_voices if v["display_name"] == selected_voice_display)
+            return selected_voice
 
     def render_generate_button(self, selected_voice_short_name: str):
         """渲染生成按钮并处理点击事件"""
         if st.button("🚀 生成语音", type="primary", use_container_width=True):
             text = st.session_state.text_to_convert
-            if text:
-                with st.spinner("🧠 正在生成语音，请稍候..."):
-                    try:
-                        audio_buffer = asyncio.run(
-                            self.service.text_to_speech_async(text, selected_voice_short_name)
-                        )
-                        st.session_state.generated_audio = audio_buffer  # 保存到session
-                        st.success("🎉 生成成功！")
-                    except Exception as e:
-                        st.error(f"生成语音时出错: {e}")
-                        st.session_state.generated_audio = None
+            chunks = self.service.split_text_into_chunks(text)
+            if chunks:
+                st.session_state.generated_audio = None
+                audios, errors = self._synthesize_with_progress(chunks, selected_voice_short_name)
+                if errors:
+                    st.error(f"有 {len(errors)} 个分段生成失败（已成功的分段已缓存，重新点击只会补齐失败的分段）：")
+                    for i, error in sorted(errors.items()):
+                        st.caption(f"第 {i + 1} 段：{error}")
+                else:
+                    # edge-tts 各分段的 MP3 参数一致，按顺序直接拼接即可得到完整音频
+                    st.session_state.generated_audio = b"".join(audios)  # 保存到session
+                    st.success("🎉 生成成功！")
             else:
                 st.warning("请输入一些文本才能生成语音。")
 
+    def _synthesize_with_progress(self, chunks: List[str], voice: str):
+        """分段合成并实时展示进度；每个分段完成后即可单独试听。"""
+        progress_bar = st.progress(0, text=f"共 {len(chunks)} 段，开始生成...")
+        done = {"count": 0}
+        with st.expander("🎧 分段试听（生成完成的分段可先播放）", expanded=len(chunks) > 1):
+            placeholders = [st.empty() for _ in chunks]
+
+        def on_chunk_ready(index, audio, error):
+            done["count"] += 1
+            with placeholders[index].container():
+                st.caption(f"第 {index + 1} 段：{chunks[index][:40]}{'…' if len(chunks[index]) > 40 else ''}")
+                if error:
+                    st.error(f"生成失败：{error}")
+                else:
+                    st.audio(audio, format="audio/mp3")
+            progress_bar.progress(done["count"] / len(chunks), text=f"已完成 {done['count']}/{len(chunks)} 段")
+
+        audios, errors = self.service.synthesize_chunks(chunks, voice, st.session_state.tts_rate, on_chunk_ready)
+        progress_bar.empty()
+        return audios, errors
+
     def render_audio_player(self):
         """如果生成了音频，则渲染播放器和下载按钮"""
         if st.session_state.generated_audio:
@@ -218,8 +464,9 @@ class AppUI:
         with st.expander("ℹ️ 关于与说明", expanded=True):
             st.markdown("""
             - **技术支持**: 本工具使用 `edge-tts` 库，调用微软 Edge 浏览器的免费文本转语音服务。
-            - **数据隐私**: 您的文本仅用于生成语音，不会被存储。
+            - **数据隐私**: 您的文本仅用于生成语音，不会被存储；生成的音频分段会缓存在本地，相同文本和声音再次生成时直接复用。
             - **智能推荐**: 工具会自动检测您输入的文本语言，并为您筛选出最匹配的声音列表。
+            - **长文本**: 长文本会按句子切分后并发生成，每一段完成后即可试听；修改某一段落后重新生成，只会重新合成改动的部分。
             - **状态保持**: 您的输入文本和生成的音频会在当前会话中被记住，即使切换到其他页面再返回。
             """)
 
@@ -228,7 +475,7 @@ class AppUI:
         self._initialize_session_state()
         self.render_header()
 
-        if not self.all_voices:
+        if not self.catalog:
             st.error("无法加载声音列表，请刷新页面或检查网络连接。")
             st.stop()
 
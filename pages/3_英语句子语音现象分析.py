@@ -9,6 +9,7 @@ from typing import Optional
 # from shared.usage_tracker import track_script_usage
 from shared.sidebar import create_common_sidebar
 from shared.config import GlobalConfig
+from shared.llm_client import get_llm_client, render_llm_cache_controls
 
 
 # --- 1. 页面专属配置 ---
@@ -79,20 +80,18 @@ class PhoneticsAnalyzer:
             st.error(f"语音生成失败: {e}", icon="😢")
             return None
 
-    def analyze_with_gemini(self, text: str, model_name: str) -> str:
-        """使用指定的 Gemini API 模型分析文本的语音现象。"""
+    def analyze_with_gemini(self, text: str, model_name: str, use_cache: bool = True) -> str:
+        """使用指定的 Gemini API 模型分析文本的语音现象（相同句子直接命中共享缓存）。"""
         if not text:
             return ""
         try:
-            model = genai.GenerativeModel(model_name)
             prompt = self.config.PROMPT_TEMPLATE.format(text=text)
-            response = model.generate_content(prompt)
-            return response.text
+            return get_llm_client().generate(model_name, prompt, use_cache=use_cache)
         except Exception as e:
             st.error(f"Gemini API 调用失败: {e}", icon="🔥")
             return "分析时遇到错误，请检查您的 API 密钥是否有效或网络连接是否正常。"
 
-    def process_and_store_results(self, sentence: str, selected_model: str):
+    def process_and_store_results(self, sentence: str, selected_model: str, use_cache: bool = True):
         """协调分析和TTS过程，并将结果存储在 session_state 中。"""
         if not sentence:
             st.warning("请输入一个句子进行分析。", icon="✍️")
@@ -109,7 +108,7 @@ class PhoneticsAnalyzer:
             st.session_state.audio_path = audio_file_path
 
         with st.spinner("🤖 正在分析中，请稍候..."):
-            analysis_result = self.analyze_with_gemini(sentence, selected_model)
+            analysis_result = self.analyze_with_gemini(sentence, selected_model, use_cache)
             st.session_state.analysis_result = analysis_result
 
 
@@ -234,6 +233,7 @@ def main():
     ui.inject_custom_css()
     # track_script_usage("🎵 语音分析")
     create_common_sidebar()
+    use_llm_cache = render_llm_cache_controls()
     ui.display_header()
 
     # 初始化 session_state
@@ -276,7 +276,7 @@ def main():
     if submitted:
         st.session_state.audio_path = None
         st.session_state.analysis_result = ""
-        analyzer.process_and_store_results(sentence, st.session_state.selected_model)
+        analyzer.process_and_store_results(sentence, st.session_state.selected_model, use_llm_cache)
 
     ui.display_results()
 
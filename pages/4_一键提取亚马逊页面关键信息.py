@@ -1,12 +1,12 @@
 import streamlit as st
-from bs4 import BeautifulSoup
-import re
-import pandas as pd
-import requests
+import hashlib
 import io
-import zipfile
+import pandas as pd
 # from shared.usage_tracker import track_script_usage
 from shared.sidebar import create_common_sidebar
+from shared.image_downloader import build_image_zip
+from shared.utils import read_archive
+from shared.amazon_extractor import build_batch_tables, expand_html_sources, extract_all_product_info, extract_many
 
 
 # --- 1. 配置类 ---
@@ -33,170 +33,23 @@ class AppConfig:
     ZIP_FILENAME = "amazon_review_images.zip"
     REVIEW_DF_COLUMNS = ['username', 'rating', 'date', 'title', 'content', 'verified', 'helpful_count', 'images']
 
+    # 批量模式
+    MODE_OPTIONS = ("单个页面", "批量文件")
+    BATCH_UPLOAD_LABEL = "上传已保存的商品页面（.html / .htm，或包含多个页面的 .zip）"
+    BATCH_BUTTON_LABEL = "批量提取"
+    BATCH_MAX_WORKERS = None  # None 表示使用 CPU 核数
+    BATCH_EXCEL_FILENAME = "amazon_batch_extraction.xlsx"
+    BATCH_PRODUCTS_CSV = "amazon_batch_products.csv"
+    BATCH_REVIEWS_CSV = "amazon_batch_reviews.csv"
 
-# --- 2. 数据处理/逻辑函数 (保持不变) ---
-# (为了简洁，这里省略了您提供的所有 extract_* 函数的内部实现)
-# (假设 extract_all_product_info, extract_features, 等函数都存在于此)
 
-def extract_all_product_info(html_content):
-    """
-    从网页源代码中提取商品的所有关键信息
-    """
-    soup = BeautifulSoup(html_content, 'html.parser')
-    results = {}
-    results['features'] = extract_features(soup)
-    results['title'] = extract_title(soup)
-    results['price'] = extract_price(soup)
-    results['rating'] = extract_rating(soup)
-    results['reviews'] = extract_reviews(soup)
-    results['product_details'] = extract_product_details(soup)
-    return results
-
-
-def extract_features(soup):
-    features = []
-    feature_section = soup.find('div', id='feature-bullets')
-    if feature_section:
-        list_items = feature_section.find_all('li', class_='a-spacing-mini')
-        for item in list_items:
-            span = item.find('span', class_='a-list-item')
-            if span:
-                features.append(span.get_text(strip=True))
-    return features
-
-
-def extract_title(soup):
-    title_span = soup.find('span', id='productTitle')
-    return title_span.get_text(strip=True) if title_span else None
-
-
-def extract_price(soup):
-    price_span = soup.find('span', class_='a-price')
-    if price_span:
-        price_text = price_span.find('span', class_='a-offscreen')
-        if price_text:
-            return price_text.get_text(strip=True).replace('$', '').replace('￥', '')
-    price_symbol = soup.find('span', class_='a-price-symbol')
-    if price_symbol:
-        whole_price = soup.find('span', class_='a-price-whole')
-        fraction_price = soup.find('span', class_='a-price-fraction')
-        if whole_price and fraction_price:
-            whole_text = whole_price.get_text(strip=True).replace('.', '').replace(',', '')
-            fraction_text = fraction_price.get_text(strip=True)
-            return f"{whole_text}.{fraction_text}"
-    price_pattern = r'[\$￥]\d+[\.,]\d{2}'
-    text_content = soup.get_text()
-    price_matches = re.findall(price_pattern, text_content)
-    if price_matches:
-        return price_matches[0].replace('$', '').replace('￥', '').replace(',', '.')
-    return None
-
-
-def extract_rating(soup):
-    rating_info = {}
-    rating_alt = soup.find('span', class_='a-icon-alt')
-    if rating_alt:
-        rating_text = rating_alt.get_text(strip=True)
-        rating_info['full_text'] = rating_text
-        score_match = re.search(r'(\d+\.?\d*)\s*out\s*of\s*5', rating_text)
-        if score_match:
-            rating_info['score'] = score_match.group(1)
-    if 'score' not in rating_info:
-        rating_span = soup.find('span', class_='a-size-base', string=re.compile(r'^\d+\.\d$'))
-        if rating_span:
-            rating_info['score'] = rating_span.get_text(strip=True)
-    review_count = soup.find('span', id='acrCustomerReviewText')
-    if review_count:
-        rating_info['review_count'] = review_count.get_text(strip=True)
-    return rating_info
-
-
-def extract_reviews(soup):
-    reviews = []
-    review_containers = soup.find_all('div', id=re.compile(r'(customer_review-|review-)'))
-    if not review_containers:
-        review_containers = soup.find_all('div', attrs={'data-hook': 'review'})
-    for container in review_containers:
-        review = {}
-        profile_name = container.find('span', class_='a-profile-name')
-        if profile_name: review['username'] = profile_name.get_text(strip=True)
-        review_title = container.find('span', class_='review-title-content')
-        if review_title:
-            review['title'] = review_title.get_text(strip=True)
-        else:
-            title_element = container.find('span', attrs={'data-hook': 'review-title'})
-            if title_element:
-                title_text = title_element.get_text(strip=True)
-                if 'out of 5 stars' in title_text:
-                    parts = re.split(r'\d+\.\d out of 5 stars', title_text)
-                    title_text = parts[1].strip() if len(parts) > 1 else title_text.split('out of 5 stars')[-1].strip()
-                review['title'] = title_text
-        star_rating_icon = container.find('i', attrs={'data-hook': 'review-star-rating'})
-        if star_rating_icon:
-            star_text = star_rating_icon.find('span', class_='a-icon-alt')
-            if star_text:
-                match = re.search(r'(\d+\.?\d*) out of 5 stars', star_text.get_text())
-                if match: review['rating'] = match.group(1)
-        if 'rating' not in review:
-            star_rating = container.find('i', class_=re.compile(r'a-star-\d'))
-            if star_rating:
-                for class_name in star_rating.get('class', []):
-                    if class_name.startswith('a-star-'):
-                        review['rating'] = class_name.split('-')[-1].replace('-', '.')
-                        break
-        review_date = container.find('span', attrs={'data-hook': 'review-date'})
-        if review_date: review['date'] = review_date.get_text(strip=True)
-        review_body = container.find('span', attrs={'data-hook': 'review-body'})
-        if review_body: review['content'] = review_body.get_text(strip=True)
-        verified_badge = container.find('span', attrs={'data-hook': 'avp-badge-linkless'})
-        review['verified'] = bool(verified_badge and 'Verified Purchase' in verified_badge.get_text())
-        if not review['verified']:
-            verified_badge_alt = container.find('span', class_='a-size-mini', string=re.compile('Verified Purchase'))
-            if verified_badge_alt: review['verified'] = True
-        helpful_text = container.find('span', attrs={'data-hook': 'helpful-vote-statement'})
-        if helpful_text: review['helpful_count'] = helpful_text.get_text(strip=True)
-        image_urls = []
-        image_tags = container.find_all('img', attrs={'data-hook': 'review-image-tile'})
-        for img in image_tags:
-            url = img.get('data-src') or img.get('src')
-            if url:
-                cleaned_url = re.sub(r'\._[A-Z09_]+_\.jpg$', '.jpg', url)
-                image_urls.append(cleaned_url)
-        review['images'] = image_urls
-        if review: reviews.append(review)
-    return reviews
-
-
-def extract_product_details(soup):
-    details = {}
-    details_div = soup.find('div', id='detailBullets_feature_div')
-    if details_div:
-        list_items = details_div.find_all('li')
-        for item in list_items:
-            key_element = item.find('span', class_='a-text-bold')
-            if key_element:
-                key_text_full = key_element.get_text(strip=True)
-                key_clean = key_text_full.replace(':', '').strip()
-                full_item_text = item.get_text(separator=' ', strip=True)
-                value_text = full_item_text.replace(key_text_full, '', 1).lstrip(' :').strip()
-                value_text = re.sub(r'\s+', ' ', value_text)
-                if value_text and key_clean:
-                    if key_clean == 'Best Sellers Rank': value_text = value_text.split('(See Top 100')[0].strip()
-                    details[key_clean] = value_text
-    else:
-        details_table = soup.find('table', id='productDetails_detailBullets_sections1')
-        if details_table:
-            rows = details_table.find_all('tr')
-            for row in rows:
-                key_element = row.find('th')
-                value_element = row.find('td')
-                if key_element and value_element:
-                    key_clean = key_element.get_text(strip=True)
-                    if key_clean == 'Customer Reviews': continue
-                    value_text = re.sub(r'\s+', ' ', value_element.get_text(separator=' ', strip=True)).strip()
-                    if key_clean == 'Best Sellers Rank': value_text = value_text.split('(See Top 100')[0].strip()
-                    details[key_clean] = value_text
-    return details
+# --- 2. 数据处理/逻辑函数 ---
+# 提取函数位于 shared/amazon_extractor.py，以便多进程批量解析时在子进程中导入
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def extract_all_product_info_cached(content_hash, _html_content):
+    """按页面内容哈希缓存提取结果（_html_content 不参与哈希，避免每次重跑都哈希数MB的字符串）。"""
+    return extract_all_product_info(_html_content)
 
 
 # --- 辅助函数 (缓存结果) ---
@@ -206,27 +59,61 @@ def convert_df_to_csv(df):
 
 
 @st.cache_data
-def download_and_zip_images(_image_urls_tuple):  # _ is a convention for cached func args
-    image_urls = list(_image_urls_tuple)  # Convert back to list
-    zip_buffer = io.BytesIO()
-    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-        progress_bar = st.progress(0, text="开始下载...")
-        total_images = len(image_urls)
-        for i, url in enumerate(image_urls):
-            try:
-                response = requests.get(url, timeout=10)
-                if response.status_code == 200:
-                    filename = url.split('/')[-1].split('?')[0]
-                    if not filename or '.' not in filename[-5:]: filename = f"image_{i + 1}.jpg"
-                    zip_file.writestr(filename, response.content)
-                else:
-                    st.warning(f"无法下载图片 (状态码 {response.status_code}): {url}", icon="⚠️")
-            except requests.RequestException as e:
-                st.error(f"下载图片时出错: {url} (错误: {e})", icon="🔥")
-            progress_bar.progress((i + 1) / total_images, text=f"正在下载第 {i + 1}/{total_images} 张图片...")
-        progress_bar.progress(1.0, text="压缩完成！")
-    zip_buffer.seek(0)
-    return zip_buffer
+def convert_batch_to_excel(products_df, reviews_df, errors_df):
+    """把批量提取的三张表写入同一个 Excel 文件的不同工作表。"""
+    output = io.BytesIO()
+    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+        products_df.to_excel(writer, sheet_name='商品', index=False)
+        reviews_df.to_excel(writer, sheet_name='评论', index=False)
+        errors_df.to_excel(writer, sheet_name='错误', index=False)
+    return output.getvalue()
+
+
+def run_batch_extraction(uploaded_files, max_workers=None):
+    """展开上传文件并用进程池并行解析，返回 (商品表, 评论表, 错误表)。"""
+    sources, read_errors = expand_html_sources((f.name, f.getvalue()) for f in uploaded_files)
+    outcomes = []
+    if sources:
+        progress_bar = st.progress(0, text=f"共 {len(sources)} 个页面，开始解析...")
+
+        def show_progress(done, total):
+            progress_bar.progress(done / total, text=f"正在并行解析 {done}/{total} 个页面...")
+
+        outcomes = extract_many(sources, max_workers=max_workers, on_progress=show_progress)
+        progress_bar.progress(1.0, text="解析完成！")
+    return build_batch_tables(outcomes, extra_errors=read_errors)
+
+
+def download_and_zip_images(image_urls_tuple):
+    """
+    并发下载图片并打包。返回的是写入临时文件的 ZIP（JPEG 直接存储不再压缩），
+    临时文件无法被 st.cache_data 序列化，因此结果改由调用方保存在 session_state 中复用。
+    """
+    image_urls = list(image_urls_tuple)
+    items = []
+    for i, url in enumerate(image_urls):
+        filename = url.split('/')[-1].split('?')[0]
+        if not filename or '.' not in filename[-5:]: filename = f"image_{i + 1}.jpg"
+        items.append((url, filename))
+
+    progress_bar = st.progress(0, text="开始下载...")
+
+    def show_progress(done, total):
+        progress_bar.progress(done / total, text=f"正在并发下载 {done}/{total} 张图片...")
+
+    # 共享下载器：连接池 + 并发 + 失败重试，边下载边写入ZIP
+    zip_archive, failures = build_image_zip(items, on_progress=show_progress)
+    for url, error in failures:
+        st.warning(f"下载图片时出错: {url} (错误: {error})", icon="⚠️")
+    progress_bar.progress(1.0, text="压缩完成！")
+    return zip_archive
+
+
+def release_zip_buffer():
+    """关闭 session_state 中上一次打包的 ZIP 临时文件（超过阈值时已落盘），并清空引用。"""
+    if st.session_state.get('zip_buffer'):
+        st.session_state.zip_buffer.close()
+    st.session_state.zip_buffer = None
 
 
 # --- 3. UI类 ---
@@ -247,6 +134,43 @@ class AppUI:
                                    use_container_width=True)
         return html_content, extract_button
 
+    def render_batch_input_area(self):
+        uploaded_files = st.file_uploader(self.config.BATCH_UPLOAD_LABEL, type=['html', 'htm', 'zip'],
+                                          accept_multiple_files=True, key="batch_files")
+        extract_button = st.button(self.config.BATCH_BUTTON_LABEL, key="batch_extract_button", type="primary",
+                                   use_container_width=True, disabled=not uploaded_files)
+        return uploaded_files, extract_button
+
+    def render_batch_results(self, products_df, reviews_df, errors_df):
+        st.header(self.config.RESULTS_HEADER)
+        col1, col2, col3 = st.columns(3)
+        col1.metric("成功解析的商品", len(products_df))
+        col2.metric("评论总数", len(reviews_df))
+        col3.metric("失败的文件", len(errors_df))
+
+        if not errors_df.empty:
+            with st.expander(f"⚠️ {len(errors_df)} 个文件未能提取", expanded=True):
+                st.dataframe(errors_df, use_container_width=True, hide_index=True)
+
+        tab_products, tab_reviews = st.tabs([self.config.BASIC_INFO_HEADER, self.config.REVIEWS_HEADER])
+        with tab_products:
+            st.dataframe(products_df, use_container_width=True, hide_index=True)
+        with tab_reviews:
+            st.dataframe(reviews_df, use_container_width=True, hide_index=True)
+
+        col1, col2, col3 = st.columns(3)
+        col1.download_button("📥 下载 Excel（商品/评论/错误）",
+                             convert_batch_to_excel(products_df, reviews_df, errors_df),
+                             self.config.BATCH_EXCEL_FILENAME,
+                             "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                             use_container_width=True)
+        col2.download_button("📥 下载商品 CSV", convert_df_to_csv(products_df),
+                             self.config.BATCH_PRODUCTS_CSV, "text/csv", use_container_width=True,
+                             disabled=products_df.empty)
+        col3.download_button("📥 下载评论 CSV", convert_df_to_csv(reviews_df),
+                             self.config.BATCH_REVIEWS_CSV, "text/csv", use_container_width=True,
+                             disabled=reviews_df.empty)
+
     def render_results(self, results):
         st.header(self.config.RESULTS_HEADER)
         st.divider()
@@ -344,13 +268,13 @@ class AppUI:
         st.write(f"在所有评论中总共找到 {len(all_image_urls)} 张独特的图片。")
 
         if st.button("打包下载所有图片 (ZIP)", key="prep_download"):
-            # 使用元组 tuple 是因为 @st.cache_data 的参数必须是可哈希的
+            release_zip_buffer()
             st.session_state.zip_buffer = download_and_zip_images(tuple(all_image_urls))
 
         if 'zip_buffer' in st.session_state and st.session_state.zip_buffer:
             st.download_button(
                 label="✅ 点击下载 ZIP 文件",
-                data=st.session_state.zip_buffer,
+                data=read_archive(st.session_state.zip_buffer),
                 file_name=self.config.ZIP_FILENAME,
                 mime="application/zip",
                 key="download_zip_final"
@@ -390,9 +314,21 @@ def main():
         st.session_state.extraction_results = None
     if 'zip_buffer' not in st.session_state:
         st.session_state.zip_buffer = None
+    if 'batch_results' not in st.session_state:
+        st.session_state.batch_results = None
 
     # 渲染头部和输入区
     ui.render_header()
+    mode = st.radio("提取模式", config.MODE_OPTIONS, horizontal=True, key="extract_mode")
+
+    if mode == config.MODE_OPTIONS[1]:
+        uploaded_files, batch_button_clicked = ui.render_batch_input_area()
+        if batch_button_clicked:
+            st.session_state.batch_results = run_batch_extraction(uploaded_files, config.BATCH_MAX_WORKERS)
+        if st.session_state.batch_results is not None:
+            ui.render_batch_results(*st.session_state.batch_results)
+        return
+
     html_content, extract_button_clicked = ui.render_input_area()
 
     # 处理按钮点击事件
@@ -400,11 +336,12 @@ def main():
         if html_content:
             # 重置状态
             st.session_state.extraction_results = None
-            st.session_state.zip_buffer = None
+            release_zip_buffer()
 
             with st.spinner(config.SPINNER_TEXT):
                 try:
-                    results = extract_all_product_info(html_content)
+                    content_hash = hashlib.md5(html_content.encode('utf-8')).hexdigest()
+                    results = extract_all_product_info_cached(content_hash, html_content)
                     st.session_state.extraction_results = results  # 缓存结果
                     st.success(config.SUCCESS_MESSAGE)
                 except Exception as e:
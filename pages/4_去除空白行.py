@@ -1,35 +1,113 @@
+import io
+import tempfile
+from typing import Dict, Iterable, Iterator, Optional
+
 import streamlit as st
 # from shared.usage_tracker import track_script_usage
 from shared.sidebar import create_common_sidebar
+from shared.utils import read_archive
 # track_script_usage("🧹 去除空行")
 create_common_sidebar()
 
 
 # --- 1. 核心逻辑 (Model) ---
-# 这部分保持不变，它已经是纯函数，非常棒。
 
-def remove_blank_lines(text: str) -> str:
+BLANK_LINE_MODES = ["去除所有空白行", "连续空白行合并为一行"]
+FILE_ENCODINGS = ["utf-8", "gb18030"]
+SPOOL_MAX_MEMORY = 16 * 1024 * 1024  # 结果超过 16MB 后转存到磁盘临时文件
+OUTPUT_FILENAME_SUFFIX = "_cleaned"
+
+
+def clean_lines(lines: Iterable[str], collapse_runs: bool = False, strip_trailing: bool = False,
+                stats: Optional[Dict[str, int]] = None) -> Iterator[str]:
+    """
+    逐行清理文本的生成器，所有规则在同一次遍历中完成，内存占用与文本大小无关。
+
+    Args:
+        lines: 输入的行（可以带换行符，也可以是文件对象）。
+        collapse_runs: 为 True 时连续的空白行只保留一行，否则去除所有空白行。
+        strip_trailing: 是否去除每行行尾的空白字符。
+        stats: 传入字典时，在其中累计 "lines_in" 和 "lines_out"。
+
+    Yields:
+        清理后的行（不带换行符）。
+    """
+    previous_blank = True  # 开头的空白行总是去除
+    lines_in = lines_out = 0
+    for line in lines:
+        lines_in += 1
+        line = line.rstrip("\r\n")
+        if not line.strip():
+            if not collapse_runs or previous_blank:
+                continue
+            previous_blank = True
+            line = ""
+        else:
+            previous_blank = False
+            if strip_trailing:
+                line = line.rstrip()
+        lines_out += 1
+        yield line
+    if stats is not None:
+        stats["lines_in"] = stats.get("lines_in", 0) + lines_in
+        stats["lines_out"] = stats.get("lines_out", 0) + lines_out
+
+
+def remove_blank_lines(text: str, collapse_runs: bool = False, strip_trailing: bool = False) -> str:
     """
     从给定的文本字符串中移除所有空白行。
     空白行是指完全为空或只包含空格、制表符等空白字符的行。
 
     Args:
         text (str): 包含潜在空白行的输入字符串。
+        collapse_runs (bool): 为 True 时连续的空白行合并为一行，而不是全部去除。
+        strip_trailing (bool): 是否同时去除行尾空白。
 
     Returns:
         str: 已移除所有空白行的新字符串。
     """
     if not isinstance(text, str):
         return ""
+    cleaned = list(clean_lines(text.splitlines(), collapse_runs, strip_trailing))
+    # 合并模式下结尾可能残留一个空行
+    if cleaned and not cleaned[-1]:
+        cleaned.pop()
+    return "\n".join(cleaned)
 
-    # 1. 将输入文本按行分割成列表
-    lines = text.splitlines()
 
-    # 2. 过滤掉所有只包含空白字符的行
-    non_empty_lines = [line for line in lines if line.strip()]
+def clean_file(fileobj, encoding: str = "utf-8", collapse_runs: bool = False, strip_trailing: bool = False):
+    """
+    以流的方式清理上传的文件：逐行读取、清理并写入 SpooledTemporaryFile，
+    小结果留在内存中，大结果自动落盘，不会把整个文件读成字符串或行列表。
 
-    # 3. 将处理后的行重新用换行符连接成一个字符串
-    return "\n".join(non_empty_lines)
+    Returns:
+        (output, stats)：output 为已定位到开头的临时文件（UTF-8 编码），
+        stats 包含 "lines_in" 和 "lines_out"。
+    """
+    stats: Dict[str, int] = {}
+    output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY, suffix=".txt")
+    fileobj.seek(0)
+    reader = io.TextIOWrapper(fileobj, encoding=encoding, errors="replace", newline="")
+    pending_blank = False
+    first = True
+    lines_written = 0
+    try:
+        for line in clean_lines(reader, collapse_runs, strip_trailing, stats):
+            # 空行推迟到下一条非空行之前再写，避免结果末尾留下空行
+            if not line:
+                pending_blank = True
+                continue
+            prefix = "" if first else ("\n\n" if pending_blank else "\n")
+            output.write((prefix + line).encode("utf-8"))
+            lines_written += 2 if pending_blank and not first else 1
+            pending_blank = False
+            first = False
+    finally:
+        # 不关闭底层的上传文件
+        reader.detach()
+    stats["lines_out"] = lines_written
+    output.seek(0)
+    return output, stats
 
 
 # --- 2. 界面和状态管理 (View-Model) ---
@@ -42,6 +120,8 @@ def initialize_session_state():
         st.session_state.input_text = ""
     if "processed_text" not in st.session_state:
         st.session_state.processed_text = ""
+    if "cleaned_file" not in st.session_state:
+        st.session_state.cleaned_file = None
 
 def run_processing():
     """
@@ -51,7 +131,11 @@ def run_processing():
     # 检查 session_state 中的 input_text
     if st.session_state.input_text:
         # 当按钮被点击时，调用核心逻辑函数进行处理
-        st.session_state.processed_text = remove_blank_lines(st.session_state.input_text)
+        st.session_state.processed_text = remove_blank_lines(
+            st.session_state.input_text,
+            collapse_runs=st.session_state.blank_line_mode == BLANK_LINE_MODES[1],
+            strip_trailing=st.session_state.strip_trailing,
+        )
         st.success("所有空白行已成功去除！")
         st.balloons()
     else:
@@ -59,6 +143,25 @@ def run_processing():
         st.session_state.processed_text = "" # 清空旧的结果
         st.warning("请输入一些文本再进行处理。")
 
+def run_file_processing():
+    """逐行流式清理上传的文件，结果保存在临时文件中供下载。"""
+    uploaded_file = st.session_state.uploaded_text_file
+    if uploaded_file is None:
+        st.warning("请先上传一个文本文件。")
+        return
+    if st.session_state.cleaned_file:
+        st.session_state.cleaned_file["output"].close()  # 释放上一次的结果临时文件（可能已落盘、体积很大）
+        st.session_state.cleaned_file = None
+    output, stats = clean_file(
+        uploaded_file,
+        encoding=st.session_state.file_encoding,
+        collapse_runs=st.session_state.blank_line_mode == BLANK_LINE_MODES[1],
+        strip_trailing=st.session_state.strip_trailing,
+    )
+    name, dot, extension = uploaded_file.name.rpartition(".")
+    filename = f"{name}{OUTPUT_FILENAME_SUFFIX}.{extension}" if dot else f"{uploaded_file.name}{OUTPUT_FILENAME_SUFFIX}.txt"
+    st.session_state.cleaned_file = {"output": output, "stats": stats, "filename": filename}
+
 def setup_ui():
     """
     设置并显示 Streamlit 用户界面。
@@ -73,38 +176,70 @@ def setup_ui():
     st.title("🧹 文本空白行去除工具")
     st.write("一键去除所有的空白行")
 
-    # --- 输入文本框 ---
-    st.subheader("1. 在下方粘贴您的文本")
-    # 使用 key="input_text" 将 text_area 与 session_state.input_text 双向绑定
-    # 这样用户输入会立即更新 session_state，
-    # 并且从其他页面返回时，session_state 会自动填充 text_area。
-    st.text_area(
-        "输入文本框",
-        height=300,
-        placeholder="请在这里粘贴包含空白行的文本...",
-        label_visibility="collapsed",
-        key="input_text" # 关键改动：使用 key 绑定 session_state
-    )
+    # --- 处理选项（粘贴文本和上传文件共用） ---
+    option_col1, option_col2 = st.columns([2, 1])
+    option_col1.radio("空白行处理方式", BLANK_LINE_MODES, horizontal=True, key="blank_line_mode")
+    option_col2.toggle("去除行尾空白", key="strip_trailing")
 
-    # --- 处理按钮和逻辑调用 ---
-    # 使用 on_click 回调函数来处理逻辑
-    # 这样处理逻辑只在点击时运行一次
-    st.button("去除空白行", type="primary", on_click=run_processing)
+    tab_text, tab_file = st.tabs(["📝 粘贴文本", "📁 上传文件（适合大文件）"])
 
-    # --- 显示结果 ---
-    # 只有当 session_state.processed_text 中有内容时才显示
-    if st.session_state.processed_text:
-        st.subheader("2. 处理完成的文本")
+    with tab_text:
+        # --- 输入文本框 ---
+        st.subheader("1. 在下方粘贴您的文本")
+        # 使用 key="input_text" 将 text_area 与 session_state.input_text 双向绑定
+        # 这样用户输入会立即更新 session_state，
+        # 并且从其他页面返回时，session_state 会自动填充 text_area。
         st.text_area(
-            "结果文本框",
-            value=st.session_state.processed_text, # 关键改动：值来源于 session_state
+            "输入文本框",
             height=300,
+            placeholder="请在这里粘贴包含空白行的文本...",
             label_visibility="collapsed",
-            help="您可以从这里复制处理后的文本"
-            # 注意：这里我们不使用 key，因为这是一个只读的输出。
-            # 它的值在每次重绘时都会被 session_state.processed_text 覆盖。
+            key="input_text" # 关键改动：使用 key 绑定 session_state
         )
 
+        # --- 处理按钮和逻辑调用 ---
+        # 使用 on_click 回调函数来处理逻辑
+        # 这样处理逻辑只在点击时运行一次
+        st.button("去除空白行", type="primary", on_click=run_processing)
+
+        # --- 显示结果 ---
+        # 只有当 session_state.processed_text 中有内容时才显示
+        if st.session_state.processed_text:
+            st.subheader("2. 处理完成的文本")
+            st.text_area(
+                "结果文本框",
+                value=st.session_state.processed_text, # 关键改动：值来源于 session_state
+                height=300,
+                label_visibility="collapsed",
+                help="您可以从这里复制处理后的文本"
+                # 注意：这里我们不使用 key，因为这是一个只读的输出。
+                # 它的值在每次重绘时都会被 session_state.processed_text 覆盖。
+            )
+
+    with tab_file:
+        st.caption("文件逐行流式处理，结果写入临时文件，适合几百 MB 的日志等大文件。")
+        st.file_uploader("上传文本文件", type=["txt", "log", "md", "csv", "tsv", "json", "jsonl"],
+                         key="uploaded_text_file")
+        st.selectbox("文件编码", FILE_ENCODINGS, key="file_encoding",
+                     help="无法按所选编码解码的字符会被替换为 �。")
+        st.button("处理文件", type="primary", on_click=run_file_processing, key="process_file_button")
+
+        cleaned = st.session_state.cleaned_file
+        if cleaned:
+            stats = cleaned["stats"]
+            col1, col2, col3 = st.columns(3)
+            col1.metric("原始行数", f"{stats.get('lines_in', 0):,}")
+            col2.metric("处理后行数", f"{stats.get('lines_out', 0):,}")
+            col3.metric("去除行数", f"{stats.get('lines_in', 0) - stats.get('lines_out', 0):,}")
+            # st.download_button 只接受完整的字节数据，仅在这里一次性读出临时文件
+            st.download_button(
+                "📥 下载处理后的文件",
+                data=read_archive(cleaned["output"]),
+                file_name=cleaned["filename"],
+                mime="text/plain",
+                use_container_width=True,
+            )
+
 
 # --- 3. 主程序入口 ---
 if __name__ == "__main__":
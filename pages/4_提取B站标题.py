@@ -1,5 +1,8 @@
+import html
+import re
+from typing import BinaryIO, Iterator, List
+
 import streamlit as st
-from bs4 import BeautifulSoup  # 导入新库
 # from shared.usage_tracker import track_script_usage
 from shared.sidebar import create_common_sidebar
 
@@ -10,6 +13,20 @@ st.set_page_config(
     layout="wide"
 )
 
+READ_CHUNK_SIZE = 1024 * 1024  # 上传文件每次读取 1MB
+MAX_PENDING_TAG_BYTES = 64 * 1024  # 跨块未闭合的 <div 标签最多保留 64KB，防止异常页面让缓冲区无限增长
+
+# HTML 注释整体匹配后跳过（与 lxml 一致，注释中的 div 不提取；未闭合的注释吞掉其后的全部内容），
+# 否则为 <div ...> 开始标签：属性值中的引号内允许出现 ">"。写成展开循环的形式，匹配失败时不会大量回溯
+DIV_TAG_SOURCE = r"""<!--(?s:.*?)(?:-->|\Z)|<div\b([^>"']*(?:(?:"[^"]*"|'[^']*')[^>"']*)*)>"""
+# 单个属性：name、name=value、name="value"、name='value'
+ATTR_SOURCE = r"""([^\s"'=<>/]+)(?:\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'=<>`]+)))?"""
+DIV_TAG_PATTERN = re.compile(DIV_TAG_SOURCE, re.IGNORECASE)
+ATTR_PATTERN = re.compile(ATTR_SOURCE)
+# 上传文件直接在字节上匹配，只解码命中的标题，省去整份文件的解码
+DIV_TAG_BYTES_PATTERN = re.compile(DIV_TAG_SOURCE.encode(), re.IGNORECASE)
+DIV_OPEN_BYTES_PATTERN = re.compile(rb"<(?:!-?|d(?:i(?:v)?)?)?$|<div\b", re.IGNORECASE)
+
 # --- 2. 初始化 Session State ---
 if 'bili_html_input' not in st.session_state:
     st.session_state.bili_html_input = ""
@@ -17,52 +34,113 @@ if 'bili_extracted_titles' not in st.session_state:
     st.session_state.bili_extracted_titles = None
 
 # --- 3. 核心功能函数 (已优化) ---
-@st.cache_data
-def extract_titles(html_content: str) -> list[str]:
+def title_from_div_attrs(attrs: str):
+    """
+    解析 <div> 开始标签的属性串：class 中包含 title 时返回解码后的 title 属性值，否则返回 None。
+    与 BeautifulSoup 的 class_='title' 一致，class 按空白拆分后逐个比较；重复的属性以第一次出现的为准。
+    """
+    if 'title' not in attrs:  # 绝大多数 div 在这里就被跳过
+        return None
+    values = {}
+    for match in ATTR_PATTERN.finditer(attrs):
+        name = match.group(1).lower()
+        if name not in values:
+            values[name] = match.group(2) or match.group(3) or match.group(4) or ""
+    if 'title' not in html.unescape(values.get('class', "")).split():
+        return None
+    return html.unescape(values.get('title', "")) or None
+
+
+def iter_titles(html_content: str) -> Iterator[str]:
+    """
+    用预编译的正则逐个扫描 <div> 开始标签，按出现顺序产出 class="title" 的 div 的 title 属性值。
+    HTML 注释被整体跳过。不构建 DOM 树，耗时和内存只与源码长度线性相关。
+    """
+    for match in DIV_TAG_PATTERN.finditer(html_content):
+        if match.group(1) is None:  # 注释
+            continue
+        title = title_from_div_attrs(match.group(1))
+        if title:
+            yield title
+
+
+def extract_titles(html_content: str) -> List[str]:
     """
-    使用 BeautifulSoup 解析HTML，精确提取 class="title" 的 div 标签中的 title 属性。
+    从粘贴的 HTML 源码中提取所有 class="title" 的 div 标签的 title 属性。
 
     Args:
         html_content: 包含HTML的字符串。
 
     Returns:
-        一个包含所有匹配到的标题的列表。
+        一个包含所有匹配到的标题的列表（按页面顺序，保留重复项）。
     """
     if not html_content:
         return []
+    return list(iter_titles(html_content))
 
-    # ===================================================================
-    # 使用 BeautifulSoup 进行精确解析
-    # 1. 创建 BeautifulSoup 对象，使用 'lxml' 解析器（速度快）
-    soup = BeautifulSoup(html_content, 'lxml')
-
-    # 2. 查找所有 <div> 标签，这些标签必须同时满足 class="title" 的条件
-    #    注意：class 是Python的关键字，所以 beautifulsoup 用 class_ 来代替
-    title_elements = soup.find_all('div', class_='title')
 
-    # 3. 从找到的元素中提取 'title' 属性的值。
-    #    使用 .get('title') 是一个安全的做法，如果某个标签没有title属性，会返回None。
-    #    最后的 if tag.get('title') 确保我们只添加非空的标题。
-    titles = [
-        tag['title'] for tag in title_elements if tag.get('title')
-    ]
-    # ===================================================================
-
-    return titles
+def iter_titles_from_file(fileobj: BinaryIO, encoding: str = "utf-8") -> Iterator[str]:
+    """
+    以流的方式从保存的 .html 文件中提取标题：按块读取并在字节上匹配，
+    块末尾未闭合的 <div 标签留到下一块继续匹配；跨块的 HTML 注释记为"注释中"状态，
+    后续块直接跳到 "-->" 之后，注释内容不进入缓冲区。内存占用与文件大小无关。
+    """
+    fileobj.seek(0)
+    pending = b""
+    in_comment = False
+    while True:
+        chunk = fileobj.read(READ_CHUNK_SIZE)
+        buffer = pending + chunk
+        if in_comment:
+            comment_end = buffer.find(b"-->")
+            if comment_end < 0:
+                if not chunk:
+                    return
+                pending = buffer[-2:]  # "-->" 可能被拆在两块之间
+                continue
+            buffer = buffer[comment_end + 3:]
+            in_comment = False
+
+        # 最后一个 "-->" 之后出现的 "<!--" 在本块内没有闭合，只匹配它之前的部分
+        comment_start = buffer.find(b"<!--", buffer.rfind(b"-->") + 1)
+        limit = comment_start if comment_start >= 0 else len(buffer)
+        consumed = 0
+        for match in DIV_TAG_BYTES_PATTERN.finditer(buffer, 0, limit):
+            consumed = match.end()
+            if match.group(1) is None:  # 注释
+                continue
+            title = title_from_div_attrs(match.group(1).decode(encoding, errors="replace"))
+            if title:
+                yield title
+        if not chunk:
+            return
+        if comment_start >= 0:
+            in_comment = True
+            pending = buffer[comment_start + 4:]
+            continue
+        # 保留最后一个已匹配标签之后仍可能跨块的 "<div..." 开头（或 "<", "<d", "<di" 残片）
+        tail = DIV_OPEN_BYTES_PATTERN.search(buffer, consumed)
+        pending = buffer[tail.start():] if tail else b""
+        if len(pending) > MAX_PENDING_TAG_BYTES:
+            pending = b""
 
 
 # --- 4. 回调函数 ---
 def run_extraction():
     """
     执行提取逻辑并把结果存入 session_state。
+    上传了 .html 文件时优先以流的方式处理文件，否则处理粘贴的源码。
     """
-    if st.session_state.bili_html_input and st.session_state.bili_html_input.strip():
+    uploaded_file = st.session_state.get('bili_html_file')
+    if uploaded_file is not None:
+        titles = list(iter_titles_from_file(uploaded_file))
+    elif st.session_state.bili_html_input and st.session_state.bili_html_input.strip():
         titles = extract_titles(st.session_state.bili_html_input)
-        st.session_state.bili_extracted_titles = titles
-        if titles:
-            st.balloons()
     else:
-        st.session_state.bili_extracted_titles = []
+        titles = []
+    st.session_state.bili_extracted_titles = titles
+    if titles:
+        st.balloons()
 
 
 # --- 5. 侧边栏 ---
@@ -76,12 +154,14 @@ except Exception as e:
 st.title("📌 B站标题提取工具")
 st.caption("一个简单的小工具，用于从 Bilibili 播放列表等页面的 HTML 源码中批量提取视频标题。")
 
-with st.expander("第一步：粘贴HTML内容", expanded=True):
+with st.expander("第一步：粘贴HTML内容或上传网页文件", expanded=True):
     st.markdown("""
     1. 在B站的播放列表页面（或其他需要提取标题的页面），右键点击页面空白处。
     2. 选择 **“显示网页源代码”** (View Page Source) 或 **“检查”** (Inspect)。
     3. **全选 (Ctrl+A)** 并 **复制 (Ctrl+C)** 源代码。
     4. 将复制的内容粘贴到下方的文本框中。
+
+    页面源码很大时，也可以直接 **另存为 (Ctrl+S)** 网页，再上传保存的 `.html` 文件（上传文件后优先使用文件）。
     """)
     st.text_area(
         "在此处粘贴HTML源代码...",
@@ -89,6 +169,11 @@ with st.expander("第一步：粘贴HTML内容", expanded=True):
         key='bili_html_input',
         label_visibility="collapsed"
     )
+    st.file_uploader(
+        "或上传保存的网页文件",
+        type=["html", "htm"],
+        key='bili_html_file'
+    )
 
 st.button(
     "🚀 开始提取",
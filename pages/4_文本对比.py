@@ -1,9 +1,11 @@
 import streamlit as st
-import difflib
-import re
-from typing import List, Tuple
+import pandas as pd
+import zipfile
 # from shared.usage_tracker import track_script_usage
 from shared.sidebar import create_common_sidebar  # 导入公共侧边栏函数
+from shared.text_diff import (
+    batch_diff, collect_documents, generate_diff_html, get_diff_ops, group_into_hunks, pair_documents,
+)
 
 # 侧边栏和页面配置建议放在代码的开始部分
 st.set_page_config(page_title="文本对比工具", layout="wide")
@@ -50,6 +52,15 @@ def inject_custom_css():
                 background-color: rgba(255, 179, 0, 0.3);
                 border: 1px solid rgba(255, 179, 0, 0.8);
             }
+            .diff-gap {
+                display: block;
+                text-align: center;
+                opacity: 0.6;
+                font-size: 0.85em;
+                margin: 0.4em 0;
+                border-top: 1px dashed rgba(128, 128, 128, 0.5);
+                border-bottom: 1px dashed rgba(128, 128, 128, 0.5);
+            }
 
             /* 暗色主题微调 */
             body[data-theme="dark"] .diff-add,
@@ -70,51 +81,16 @@ def inject_custom_css():
     )
 
 
-# --- 核心逻辑 (无需改动) ---
-
-def tokenize_text(text: str) -> List[str]:
-    """
-    将文本分割成单个字符的序列，以实现字符级的精确对比。
-    """
-    return list(text)
-
+# --- 核心逻辑 ---
+# 两级差异算法（行级 Myers + 变化块内字符级细化）位于 shared/text_diff.py
 
-def get_diff_ops(text1: str, text2: str) -> List[Tuple[str, int, int, int, int]]:
-    """
-    使用difflib和新的分词器计算两段文本的差异操作码。
-    """
-    matcher = difflib.SequenceMatcher(None, tokenize_text(text1), tokenize_text(text2), autojunk=False)
-    return matcher.get_opcodes()
-
-
-def generate_diff_html(text: str, ops: List[Tuple[str, int, int, int, int]], is_original: bool) -> str:
-    """
-    根据差异操作码生成用于展示的HTML字符串。
-    """
-    tokens = tokenize_text(text)
-    html_parts = []
-
-    for tag, i1, i2, j1, j2 in ops:
-        if is_original:
-            segment_tokens = tokens[i1:i2]
-            segment_html = "".join(segment_tokens)
-            if tag == 'equal':
-                html_parts.append(segment_html)
-            elif tag == 'delete':
-                html_parts.append(f'<span class="diff-delete">{segment_html}</span>')
-            elif tag == 'replace':
-                html_parts.append(f'<span class="diff-replace">{segment_html}</span>')
-        else:
-            segment_tokens = tokens[j1:j2]
-            segment_html = "".join(segment_tokens)
-            if tag == 'equal':
-                html_parts.append(segment_html)
-            elif tag == 'insert':
-                html_parts.append(f'<span class="diff-add">{segment_html}</span>')
-            elif tag == 'replace':
-                html_parts.append(f'<span class="diff-replace">{segment_html}</span>')
+VIEW_MODES = ["仅显示变化（折叠相同内容）", "完整文本"]
+HUNKS_PER_PAGE = 20  # 每页显示的变化块数量
+DEFAULT_CONTEXT_LINES = 3  # 每处变化前后保留的相同行数
 
-    return "".join(html_parts)
+COMPARE_MODES = ["两段文本", "批量文件"]
+BATCH_FILE_TYPES = ['zip', 'txt', 'md', 'csv', 'json', 'html', 'xml', 'yaml', 'yml', 'py']
+BATCH_MAX_WORKERS = None  # None 表示使用 CPU 核数
 
 
 # --- UI展示 (已优化) ---
@@ -146,16 +122,20 @@ def main():
 
     display_legend()
 
+    mode = st.radio("对比模式", COMPARE_MODES, horizontal=True, key="compare_mode")
+    if mode == COMPARE_MODES[1]:
+        render_batch_mode()
+        return
+
     # --- 新增：Session State 初始化 ---
     # 使用 session_state 来持久化输入和输出，确保页面切换或刷新后数据不丢失。
+    # 对比结果只保存操作码和对比时的文本快照，HTML 在展示时按页生成，不再整份存入 session。
     if "original_text" not in st.session_state:
         st.session_state.original_text = "这是第一行。\n这是第二行，内容相同。\n这是将被修改的第三行。"
     if "modified_text" not in st.session_state:
         st.session_state.modified_text = "这是第1行。\n这是第二行，内容不相同。\n这是被修改过的第三行。"
-    if "original_diff_html" not in st.session_state:
-        st.session_state.original_diff_html = ""
-    if "modified_diff_html" not in st.session_state:
-        st.session_state.modified_diff_html = ""
+    if "diff_result" not in st.session_state:
+        st.session_state.diff_result = None
 
     col1, col2 = st.columns(2)
     with col1:
@@ -173,32 +153,163 @@ def main():
         modified_text = st.session_state.modified_text
 
         if original_text and modified_text:
-            ops = get_diff_ops(original_text, modified_text)
-            # 将计算出的HTML结果也存入 session_state
-            st.session_state.original_diff_html = generate_diff_html(original_text, ops, is_original=True)
-            st.session_state.modified_diff_html = generate_diff_html(modified_text, ops, is_original=False)
+            st.session_state.diff_result = {
+                "original": original_text,
+                "modified": modified_text,
+                "ops": get_diff_ops(original_text, modified_text),
+            }
+            st.session_state.diff_page = 1
         else:
             # 如果输入为空，则清空之前可能存在的对比结果
-            st.session_state.original_diff_html = ""
-            st.session_state.modified_diff_html = ""
+            st.session_state.diff_result = None
             st.warning("请输入原文和修改后的文本以便进行对比。")
 
     # --- 优化：结果展示逻辑 ---
     # 只要 session_state 中有结果，就总是显示它们。
     # 这使得结果在页面重载后依然可见，直到下一次点击按钮或清空输入。
-    if st.session_state.original_diff_html and st.session_state.modified_diff_html:
+    if st.session_state.diff_result:
         st.divider()
         st.subheader("对比结果")
+        display_diff_result(st.session_state.diff_result)
+
+
+def render_batch_mode():
+    """
+    批量对比：两侧分别上传 ZIP 压缩包或多个文件，按相对路径配对后在多个进程中并行对比，
+    先展示各文件的变化比例汇总，再选择单个文件查看详细差异。
+    """
+    st.caption("每侧可上传一个 ZIP 压缩包（相当于一个文件夹），或直接选中文件夹中的全部文件。"
+               "两侧文件按相对路径配对，压缩包最外层的同名目录会被忽略。")
+    if "batch_diff_results" not in st.session_state:
+        st.session_state.batch_diff_results = None
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.subheader("旧版本")
+        left_files = st.file_uploader("上传旧版本文件", type=BATCH_FILE_TYPES,
+                                      accept_multiple_files=True, key="batch_left_files")
+    with col2:
+        st.subheader("新版本")
+        right_files = st.file_uploader("上传新版本文件", type=BATCH_FILE_TYPES,
+                                       accept_multiple_files=True, key="batch_right_files")
 
-        res_col1, res_col2 = st.columns(2)
-        with res_col1:
-            st.markdown("#### 原文差异")
-            st.markdown(f'<div class="diff-container">{st.session_state.original_diff_html}</div>', unsafe_allow_html=True)
+    if st.button("🔍 批量对比", use_container_width=True, disabled=not (left_files and right_files)):
+        try:
+            left = collect_documents((f.name, f.getvalue()) for f in left_files)
+            right = collect_documents((f.name, f.getvalue()) for f in right_files)
+        except zipfile.BadZipFile as e:
+            st.error(f"无法读取压缩包: {e}")
+            return
+        pairs = pair_documents(left, right)
+        progress_bar = st.progress(0, text=f"共 {len(pairs)} 对文件，开始对比...")
 
-        with res_col2:
-            st.markdown("#### 修改后差异")
-            st.markdown(f'<div class="diff-container">{st.session_state.modified_diff_html}</div>', unsafe_allow_html=True)
+        def show_progress(done, total):
+            progress_bar.progress(done / total, text=f"正在对比 {done}/{total} 对文件...")
+
+        st.session_state.batch_diff_results = batch_diff(pairs, BATCH_MAX_WORKERS, on_progress=show_progress)
+        progress_bar.empty()
+
+    results = st.session_state.batch_diff_results
+    if not results:
+        return
+
+    st.divider()
+    st.subheader("对比汇总")
+    summary_df = pd.DataFrame([{
+        "文件": r["name"], "状态": r["status"], "变化比例": r["change_ratio"],
+        "新增字符": r["added"], "删除字符": r["deleted"],
+    } for r in results])
+    counts = summary_df["状态"].value_counts()
+    metric_cols = st.columns(4)
+    for col, status in zip(metric_cols, ["修改", "新增", "删除", "相同"]):
+        col.metric(status, int(counts.get(status, 0)))
+
+    hide_unchanged = st.toggle("隐藏未变化的文件", value=True, key="batch_hide_unchanged")
+    if hide_unchanged:
+        summary_df = summary_df[summary_df["状态"] != "相同"]
+    st.dataframe(
+        summary_df.sort_values("变化比例", ascending=False),
+        use_container_width=True, hide_index=True,
+        column_config={"变化比例": st.column_config.ProgressColumn("变化比例", format="%.2f",
+                                                                   min_value=0.0, max_value=1.0)},
+    )
+
+    changed = {r["name"]: r for r in results if r["status"] != "相同"}
+    if not changed:
+        st.success("两侧所有文件内容完全相同。")
+        return
+    st.subheader("单个文件差异")
+    selected = st.selectbox("选择要查看的文件", list(changed), key="batch_selected_file")
+    display_diff_result(changed[selected])
+
+
+def render_gap(line_count: int) -> str:
+    return f'<span class="diff-gap">⋯ 省略 {line_count} 行未变化的内容 ⋯</span>'
+
+
+def display_diff_columns(original_html: str, modified_html: str):
+    res_col1, res_col2 = st.columns(2)
+    with res_col1:
+        st.markdown(f'<div class="diff-container">{original_html}</div>', unsafe_allow_html=True)
+    with res_col2:
+        st.markdown(f'<div class="diff-container">{modified_html}</div>', unsafe_allow_html=True)
+
+
+def display_diff_result(result: dict):
+    """
+    展示对比结果。默认只显示变化块并折叠中间相同的内容，变化块分页展示，
+    因此发送到浏览器的 HTML 大小取决于改动量，而不是文档长度。
+    """
+    original, modified, ops = result["original"], result["modified"], result["ops"]
+
+    option_col1, option_col2 = st.columns([2, 1])
+    view_mode = option_col1.radio("显示方式", VIEW_MODES, horizontal=True, key="diff_view_mode")
+    context_lines = option_col2.number_input("上下文行数", min_value=0, max_value=50,
+                                             value=DEFAULT_CONTEXT_LINES, key="diff_context_lines",
+                                             disabled=view_mode != VIEW_MODES[0],
+                                             help="每处变化前后保留的相同行数，调大即可展开更多上下文。")
+
+    if view_mode == VIEW_MODES[1]:
+        col1, col2 = st.columns(2)
+        col1.markdown("#### 原文差异")
+        col2.markdown("#### 修改后差异")
+        display_diff_columns(generate_diff_html(original, ops, is_original=True),
+                             generate_diff_html(modified, ops, is_original=False))
+        return
+
+    hunks, trailing_skipped = group_into_hunks(original, ops, int(context_lines))
+    if not hunks:
+        st.success("两段文本完全相同。")
+        return
+
+    total_pages = (len(hunks) - 1) // HUNKS_PER_PAGE + 1
+    st.caption(f"共 {len(hunks)} 处变化")
+    if total_pages > 1:
+        # 调整上下文行数后变化块可能合并，页码需要落在新的范围内
+        if st.session_state.get("diff_page", 1) > total_pages:
+            st.session_state.diff_page = total_pages
+        page = st.number_input(f"页码（共 {total_pages} 页）", min_value=1, max_value=total_pages,
+                               key="diff_page")
+    else:
+        page = 1
+    page_start = (page - 1) * HUNKS_PER_PAGE
+    page_hunks = hunks[page_start:page_start + HUNKS_PER_PAGE]
+
+    col1, col2 = st.columns(2)
+    col1.markdown("#### 原文差异")
+    col2.markdown("#### 修改后差异")
+    original_parts, modified_parts = [], []
+    for hunk in page_hunks:
+        if hunk["skipped_before"]:
+            original_parts.append(render_gap(hunk["skipped_before"]))
+            modified_parts.append(render_gap(hunk["skipped_before"]))
+        original_parts.append(generate_diff_html(original, hunk["ops"], is_original=True))
+        modified_parts.append(generate_diff_html(modified, hunk["ops"], is_original=False))
+    if page == total_pages and trailing_skipped:
+        original_parts.append(render_gap(trailing_skipped))
+        modified_parts.append(render_gap(trailing_skipped))
+    display_diff_columns("".join(original_parts), "".join(modified_parts))
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
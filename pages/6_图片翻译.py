@@ -4,10 +4,10 @@ import cv2
 from PIL import Image, ImageDraw, ImageFont
 import easyocr
 from deep_translator import GoogleTranslator
-from langdetect import detect, LangDetectException  # <--- 新增: 导入语言检测库
 import io
 # from shared.usage_tracker import track_script_usage
 from shared.sidebar import create_common_sidebar # <-- 1. 导入函数
+from shared.language_id import detect_languages
 # track_script_usage("🌐 图片翻译")
 create_common_sidebar() # <-- 2. 调用函数，确保每个页面都有侧边栏
 
@@ -41,18 +41,20 @@ def ocr_and_translate_text(image_np, ocr_reader, target_language='en'):
     translated_results = []
     translator = GoogleTranslator(source='auto', target=target_language)
 
-    for (bbox, text, prob) in results:
+    # 所有文本框一次性批量检测语言（去重 + 缓存，纯汉字文本无需调用 langdetect）
+    languages = detect_languages(text for (_, text, _) in results)
+
+    for (bbox, text, prob), lang in zip(results, languages):
         translation = text  # <--- 修改: 默认情况下，翻译结果就是原文
 
         # --- 新增: 语言检测逻辑 ---
         try:
-            lang = detect(text)
-            # 检查检测到的语言是否是中文 (zh-cn, zh-tw 等)
-            if lang.startswith('zh'):
+            # 检查检测到的语言是否是中文
+            if lang == 'zh':
                 translation = translator.translate(text)
-        except LangDetectException:
-            # 如果文本太短或无法识别，就不进行翻译，直接使用原文
-            print(f"无法检测语言: '{text}', 将保留原文。")
+            elif lang is None:
+                # 如果文本太短或无法识别，就不进行翻译，直接使用原文
+                print(f"无法检测语言: '{text}', 将保留原文。")
         except Exception as e:
             # 处理其他可能的翻译错误
             print(f"翻译失败: '{text}'. 错误: {e}")
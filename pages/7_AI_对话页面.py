@@ -3,6 +3,7 @@ import google.generativeai as genai
 # from shared.usage_tracker import track_script_usage
 from shared.sidebar import create_common_sidebar
 from shared.config import GlobalConfig
+from shared.llm_client import get_llm_client, render_llm_cache_controls
 
 
 cfg = GlobalConfig()
@@ -97,11 +98,12 @@ def clear_chat_history():
 
 # --- 2. 核心逻辑处理器 ---
 
-def stream_handler(stream):
-    """处理API返回的流式数据，仅提取文本部分"""
-    for chunk in stream:
-        if hasattr(chunk, 'text'):
-            yield chunk.text
+def build_gemini_contents(messages):
+    """把会话记录转换为 Gemini 的多轮对话格式（包含最新一条用户消息）"""
+    return [
+        {"role": "model" if msg["role"] == "assistant" else "user", "parts": [msg["content"]]}
+        for msg in messages
+    ]
 
 
 # --- 3. 主应用界面 ---
@@ -110,6 +112,7 @@ def main():
     """主应用函数"""
     setup_page_and_sidebar()
     initialize_session_state()
+    use_llm_cache = render_llm_cache_controls()
 
     st.title("🤖 AI 对话")
 
@@ -157,14 +160,10 @@ def main():
         try:
             with st.chat_message("assistant"):
                 with st.spinner("AI 正在思考中..."):
-                    model = genai.GenerativeModel(selected_model)
-                    gemini_history = [
-                        {"role": "model" if msg["role"] == "assistant" else "user", "parts": [msg["content"]]}
-                        for msg in st.session_state.messages[:-1]
-                    ]
-                    chat = model.start_chat(history=gemini_history)
-                    response_stream = chat.send_message(prompt, stream=True)
-                    full_response = st.write_stream(stream_handler(response_stream))
+                    # 以完整对话作为缓存键：同一段对话的同一个问题会直接命中缓存
+                    contents = build_gemini_contents(st.session_state.messages)
+                    response_stream = get_llm_client().stream(selected_model, contents, use_cache=use_llm_cache)
+                    full_response = st.write_stream(response_stream)
             st.session_state.messages.append({"role": "assistant", "content": full_response})
         except Exception as e:
             st.error(f"调用 API 时出错: {e}")
@@ -22,6 +22,7 @@ import pandas as pd
 import plotly.express as px
 # from shared.usage_tracker import track_script_usage
 from shared.sidebar import create_common_sidebar
+from shared.llm_client import get_llm_client, render_llm_cache_controls
 
 
 class Config:
@@ -57,26 +58,26 @@ cfg = Config()
 
 
 # --- 核心功能函数 ---
-def get_gemini_response(image: Image.Image, prompt: str, model_name: str):
+def get_gemini_response(image: Image.Image, prompt: str, model_name: str, use_cache: bool = True):
     """
     向 Gemini Pro Vision 模型发送图片和提示，并获取响应。
+    同一张图片（按内容哈希）配合相同提示词和模型时，直接返回共享缓存中的结果。
 
     参数:
     image (PIL.Image.Image): 用户上传的图片。
     prompt (str): 用于指导模型分析图片的提示词。
     model_name (str): 使用的AI模型。
+    use_cache (bool): 为 False 时跳过缓存，强制重新调用 API。
 
     返回:
     tuple: 模型的文本响应和API调用耗时，如果出错则返回 (None, 0)。
     """
     start_time = time.time()  # 记录开始时间
     try:
-        model = genai.GenerativeModel(model_name)
-        response = model.generate_content([prompt, image], stream=True)
-        response.resolve()
+        response_text = get_llm_client().generate(model_name, [prompt, image], use_cache=use_cache)
         end_time = time.time()  # 记录结束时间
         duration = end_time - start_time  # 计算耗时
-        return response.text, duration
+        return response_text, duration
     except Exception as e:
         # 在界面上显示更具体的错误信息
         st.error(f"调用 Gemini API 时发生错误: {e}")
@@ -309,6 +310,7 @@ def main():
         st.session_state.analysis_results = []
 
     api_key, model_name, uploaded_files, analyze_button = setup_ui()
+    use_llm_cache = render_llm_cache_controls()
 
     if analyze_button:
         # 校验输入
@@ -328,7 +330,7 @@ def main():
                     for uploaded_file in uploaded_files:
                         img = Image.open(uploaded_file)
                         response_text, duration = get_gemini_response(img, cfg.ZAZHI_JIANCE_GET_ELEMENTS_DATA_PROMPT,
-                                                                      model_name)
+                                                                      model_name, use_llm_cache)
 
                         result_for_file = {
                             "file_name": uploaded_file.name,
@@ -0,0 +1,335 @@
+# 文件路径: shared/amazon_extractor.py
+"""
+亚马逊商品页面信息提取函数。
+
+不依赖 Streamlit，因此既可以在页面中直接调用，也可以被多进程批量解析和基准测试脚本导入。
+"""
+import io
+import re
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+from bs4 import BeautifulSoup, SoupStrainer
+
+# 解析配置：只构建这些 id 对应的子树，其余（脚本、推荐位、页脚等）在解析时直接丢弃
+TARGET_SECTION_IDS = {
+    'feature-bullets', 'productTitle', 'title_feature_div',
+    'corePrice_feature_div', 'corePriceDisplay_desktop_feature_div', 'corePrice_desktop', 'apex_desktop',
+    'averageCustomerReviews', 'averageCustomerReviews_feature_div', 'acrCustomerReviewText',
+    'reviewsMedley', 'cm-cr-dp-review-list', 'cm_cr-review_list',
+    'detailBullets_feature_div', 'productDetails_detailBullets_sections1',
+}
+REVIEW_ID_PREFIXES = ('customer_review-', 'review-')
+
+
+def _is_target_section(element_id):
+    """SoupStrainer 的 id 过滤条件：命中目标区块或单条评论容器。"""
+    return bool(element_id) and (element_id in TARGET_SECTION_IDS
+                                 or element_id.startswith(REVIEW_ID_PREFIXES))
+
+
+TARGET_SECTIONS_STRAINER = SoupStrainer(id=_is_target_section)
+
+
+def parse_product_page(html_content, restrict=True):
+    """
+    使用 lxml 解析网页源代码。restrict=True 时借助 SoupStrainer 在一次解析中
+    只保留目标区块，生成的树通常只有完整页面的很小一部分。
+    """
+    parse_only = TARGET_SECTIONS_STRAINER if restrict else None
+    return BeautifulSoup(html_content, 'lxml', parse_only=parse_only)
+
+
+def _contains(html_content, marker):
+    """源码（str 或 bytes）中是否包含 marker。"""
+    if isinstance(html_content, bytes):
+        return marker.encode() in html_content
+    return marker in html_content
+
+
+# 精简解析后字段为空时，是否值得再完整解析一次页面。判断只在源码上做子串查找，远快于完整解析：
+# - 标题和价格是核心字段，且价格可能位于旧版 priceblock 等白名单以外的区块，总是回退；
+# - 评分：页面没有 averageCustomerReviews 区块却有星级文本时，说明是旧版布局，评分在白名单以外；
+# - 评论：源码中有 data-hook="review" 的评论容器时才回退；
+# - 未列出的字段（特性、商品详情）所在区块都在白名单内，页面没有该区块时空结果即为正确结果，不回退。
+FULL_PARSE_FALLBACK_CONDITIONS = {
+    'title': lambda html: True,
+    'price': lambda html: True,
+    'rating': lambda html: not _contains(html, 'averageCustomerReviews') and _contains(html, 'a-icon-alt'),
+    'reviews': lambda html: _contains(html, 'data-hook="review"') or _contains(html, "data-hook='review'"),
+}
+
+
+def extract_all_product_info(html_content):
+    """
+    从网页源代码中提取商品的所有关键信息。
+    优先在精简后的目标区块上提取；字段为空且按 FULL_PARSE_FALLBACK_CONDITIONS 判断内容可能位于白名单以外的区块时，
+    再完整解析一次页面，只对这些字段重新提取。没有评论、没有特性列表的页面因此只解析一次。
+    价格的整页文本正则兜底也只在完整解析时使用。
+    """
+    soup = parse_product_page(html_content, restrict=True)
+    results = {}
+    for field, extractor in FIELD_EXTRACTORS.items():
+        # 精简树缺少中间的区块，整页文本正则匹配到的"第一个价格"可能与完整页面不同，因此这里不做兜底
+        results[field] = extract_price(soup, text_fallback=False) if extractor is extract_price else extractor(soup)
+    missing = [field for field, value in results.items()
+               if not value and field in FULL_PARSE_FALLBACK_CONDITIONS
+               and FULL_PARSE_FALLBACK_CONDITIONS[field](html_content)]
+    if missing:
+        full_soup = parse_product_page(html_content, restrict=False)
+        for field in missing:
+            results[field] = FIELD_EXTRACTORS[field](full_soup)
+    return results
+
+
+PRICE_PATTERN = re.compile(r'[\$￥]\d+[\.,]\d{2}')
+
+
+def extract_features(soup):
+    features = []
+    feature_section = soup.find('div', id='feature-bullets')
+    if feature_section:
+        list_items = feature_section.find_all('li', class_='a-spacing-mini')
+        for item in list_items:
+            span = item.find('span', class_='a-list-item')
+            if span:
+                features.append(span.get_text(strip=True))
+    return features
+
+
+def extract_title(soup):
+    title_span = soup.find('span', id='productTitle')
+    return title_span.get_text(strip=True) if title_span else None
+
+
+def extract_price(soup, text_fallback=True):
+    """
+    依次尝试 a-price 的 a-offscreen、拆开的整数/小数部分；
+    text_fallback=True 时最后在整页文本上用正则兜底（可匹配被拆到多个节点中的价格，如 "$" 和 "12.99" 分属两个 span）。
+    """
+    price_span = soup.find('span', class_='a-price')
+    if price_span:
+        price_text = price_span.find('span', class_='a-offscreen')
+        if price_text:
+            return price_text.get_text(strip=True).replace('$', '').replace('￥', '')
+    price_symbol = soup.find('span', class_='a-price-symbol')
+    if price_symbol:
+        whole_price = soup.find('span', class_='a-price-whole')
+        fraction_price = soup.find('span', class_='a-price-fraction')
+        if whole_price and fraction_price:
+            whole_text = whole_price.get_text(strip=True).replace('.', '').replace(',', '')
+            fraction_text = fraction_price.get_text(strip=True)
+            return f"{whole_text}.{fraction_text}"
+    if text_fallback:
+        price_match = PRICE_PATTERN.search(soup.get_text())
+        if price_match:
+            return price_match.group().replace('$', '').replace('￥', '').replace(',', '.')
+    return None
+
+
+def extract_rating(soup):
+    rating_info = {}
+    rating_alt = soup.find('span', class_='a-icon-alt')
+    if rating_alt:
+        rating_text = rating_alt.get_text(strip=True)
+        rating_info['full_text'] = rating_text
+        score_match = re.search(r'(\d+\.?\d*)\s*out\s*of\s*5', rating_text)
+        if score_match:
+            rating_info['score'] = score_match.group(1)
+    if 'score' not in rating_info:
+        rating_span = soup.find('span', class_='a-size-base', string=re.compile(r'^\d+\.\d$'))
+        if rating_span:
+            rating_info['score'] = rating_span.get_text(strip=True)
+    review_count = soup.find('span', id='acrCustomerReviewText')
+    if review_count:
+        rating_info['review_count'] = review_count.get_text(strip=True)
+    return rating_info
+
+
+def extract_reviews(soup):
+    reviews = []
+    review_containers = soup.find_all('div', id=re.compile(r'(customer_review-|review-)'))
+    if not review_containers:
+        review_containers = soup.find_all('div', attrs={'data-hook': 'review'})
+    for container in review_containers:
+        review = {}
+        profile_name = container.find('span', class_='a-profile-name')
+        if profile_name: review['username'] = profile_name.get_text(strip=True)
+        review_title = container.find('span', class_='review-title-content')
+        if review_title:
+            review['title'] = review_title.get_text(strip=True)
+        else:
+            title_element = container.find('span', attrs={'data-hook': 'review-title'})
+            if title_element:
+                title_text = title_element.get_text(strip=True)
+                if 'out of 5 stars' in title_text:
+                    parts = re.split(r'\d+\.\d out of 5 stars', title_text)
+                    title_text = parts[1].strip() if len(parts) > 1 else title_text.split('out of 5 stars')[-1].strip()
+                review['title'] = title_text
+        star_rating_icon = container.find('i', attrs={'data-hook': 'review-star-rating'})
+        if star_rating_icon:
+            star_text = star_rating_icon.find('span', class_='a-icon-alt')
+            if star_text:
+                match = re.search(r'(\d+\.?\d*) out of 5 stars', star_text.get_text())
+                if match: review['rating'] = match.group(1)
+        if 'rating' not in review:
+            star_rating = container.find('i', class_=re.compile(r'a-star-\d'))
+            if star_rating:
+                for class_name in star_rating.get('class', []):
+                    if class_name.startswith('a-star-'):
+                        review['rating'] = class_name.split('-')[-1].replace('-', '.')
+                        break
+        review_date = container.find('span', attrs={'data-hook': 'review-date'})
+        if review_date: review['date'] = review_date.get_text(strip=True)
+        review_body = container.find('span', attrs={'data-hook': 'review-body'})
+        if review_body: review['content'] = review_body.get_text(strip=True)
+        verified_badge = container.find('span', attrs={'data-hook': 'avp-badge-linkless'})
+        review['verified'] = bool(verified_badge and 'Verified Purchase' in verified_badge.get_text())
+        if not review['verified']:
+            verified_badge_alt = container.find('span', class_='a-size-mini', string=re.compile('Verified Purchase'))
+            if verified_badge_alt: review['verified'] = True
+        helpful_text = container.find('span', attrs={'data-hook': 'helpful-vote-statement'})
+        if helpful_text: review['helpful_count'] = helpful_text.get_text(strip=True)
+        image_urls = []
+        image_tags = container.find_all('img', attrs={'data-hook': 'review-image-tile'})
+        for img in image_tags:
+            url = img.get('data-src') or img.get('src')
+            if url:
+                cleaned_url = re.sub(r'\._[A-Z09_]+_\.jpg$', '.jpg', url)
+                image_urls.append(cleaned_url)
+        review['images'] = image_urls
+        if review: reviews.append(review)
+    return reviews
+
+
+def extract_product_details(soup):
+    details = {}
+    details_div = soup.find('div', id='detailBullets_feature_div')
+    if details_div:
+        list_items = details_div.find_all('li')
+        for item in list_items:
+            key_element = item.find('span', class_='a-text-bold')
+            if key_element:
+                key_text_full = key_element.get_text(strip=True)
+                key_clean = key_text_full.replace(':', '').strip()
+                full_item_text = item.get_text(separator=' ', strip=True)
+                value_text = full_item_text.replace(key_text_full, '', 1).lstrip(' :').strip()
+                value_text = re.sub(r'\s+', ' ', value_text)
+                if value_text and key_clean:
+                    if key_clean == 'Best Sellers Rank': value_text = value_text.split('(See Top 100')[0].strip()
+                    details[key_clean] = value_text
+    else:
+        details_table = soup.find('table', id='productDetails_detailBullets_sections1')
+        if details_table:
+            rows = details_table.find_all('tr')
+            for row in rows:
+                key_element = row.find('th')
+                value_element = row.find('td')
+                if key_element and value_element:
+                    key_clean = key_element.get_text(strip=True)
+                    if key_clean == 'Customer Reviews': continue
+                    value_text = re.sub(r'\s+', ' ', value_element.get_text(separator=' ', strip=True)).strip()
+                    if key_clean == 'Best Sellers Rank': value_text = value_text.split('(See Top 100')[0].strip()
+                    details[key_clean] = value_text
+    return details
+
+
+# extract_all_product_info 返回的字段及对应的提取函数（顺序即结果字典的键顺序）
+FIELD_EXTRACTORS = {
+    'features': extract_features,
+    'title': extract_title,
+    'price': extract_price,
+    'rating': extract_rating,
+    'reviews': extract_reviews,
+    'product_details': extract_product_details,
+}
+
+
+# --- 批量提取 ---
+HTML_EXTENSIONS = ('.html', '.htm')
+
+
+def expand_html_sources(named_blobs):
+    """
+    展开上传的文件：HTML 文件原样保留，ZIP 压缩包中的每个 HTML 文件逐个取出。
+
+    Args:
+        named_blobs: [(文件名, 字节内容)]
+
+    Returns:
+        (sources, errors)：sources 为 [(文件名, 字节内容)]，errors 为 [(文件名, 错误信息)]
+    """
+    sources, errors = [], []
+    for name, data in named_blobs:
+        if name.lower().endswith('.zip'):
+            try:
+                with zipfile.ZipFile(io.BytesIO(data)) as zip_file:
+                    for info in zip_file.infolist():
+                        if not info.is_dir() and info.filename.lower().endswith(HTML_EXTENSIONS):
+                            sources.append((f"{name}/{info.filename}", zip_file.read(info)))
+            except zipfile.BadZipFile as e:
+                errors.append((name, f"无法读取压缩包: {e}"))
+        else:
+            sources.append((name, data))
+    return sources, errors
+
+
+def extract_file(source):
+    """
+    提取单个文件（在子进程中运行）。任何异常都被捕获并作为该文件的错误返回，不会中断整个批次。
+    HTML 以字节形式交给解析器，由其自行识别页面编码。
+    """
+    name, data = source
+    try:
+        return {"file": name, "result": extract_all_product_info(data), "error": None}
+    except Exception as e:
+        return {"file": name, "result": None, "error": f"{type(e).__name__}: {e}"}
+
+
+def extract_many(sources, max_workers=None, on_progress=None):
+    """使用进程池并行提取多个页面，返回与 sources 顺序一致的结果列表。"""
+    outcomes = [None] * len(sources)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(extract_file, source): i for i, source in enumerate(sources)}
+        for done, future in enumerate(as_completed(futures), start=1):
+            outcomes[futures[future]] = future.result()
+            if on_progress:
+                on_progress(done, len(sources))
+    return outcomes
+
+
+def build_batch_tables(outcomes, extra_errors=()):
+    """
+    把批量提取结果整理为三张表：商品表（每个文件一行）、评论表（每条评论一行）和错误表。
+    既没有标题也没有价格的页面视为非商品详情页，记入错误表。
+    """
+    products, reviews, errors = [], [], [{"文件": name, "错误": message} for name, message in extra_errors]
+    for outcome in outcomes:
+        if outcome["error"]:
+            errors.append({"文件": outcome["file"], "错误": outcome["error"]})
+            continue
+        result = outcome["result"]
+        if not result.get('title') and not result.get('price'):
+            errors.append({"文件": outcome["file"], "错误": "未提取到标题和价格，可能不是商品详情页"})
+            continue
+
+        rating = result.get('rating') or {}
+        product_row = {
+            "文件": outcome["file"],
+            "标题": result.get('title'),
+            "价格": result.get('price'),
+            "评分": rating.get('score'),
+            "评价总数": rating.get('review_count'),
+            "商品特性": " | ".join(result.get('features') or []),
+        }
+        product_row.update(result.get('product_details') or {})
+        products.append(product_row)
+
+        for review in result.get('reviews') or []:
+            review_row = {"文件": outcome["file"], "商品标题": result.get('title')}
+            review_row.update(review)
+            review_row['images'] = " ".join(review.get('images') or [])
+            reviews.append(review_row)
+
+    return pd.DataFrame(products), pd.DataFrame(reviews), pd.DataFrame(errors, columns=["文件", "错误"])
@@ -9,7 +9,9 @@ import os
 def get_run_mode():
     """
     直接从 secrets 读取运行环境配置。
-    默认为 'cloud'，以保证部署到云端时的安全性（不会尝试写本地文件）。
+    默认为 'cloud'，以保证部署到云端时的安全性（不会把任务数据等业务数据写入本地文件）。
+    注意：.cache/ 下的 LLM 响应、语音分段、读书笔记等缓存在两种模式下都会写入本地磁盘，
+    它们只是可随时丢弃的加速数据，云端容器重启后清空不影响功能；云端模式下这些缓存由所有访客共享。
     """
     return st.secrets.get("RUN_ENVIRONMENT", "cloud")
 
@@ -49,5 +51,27 @@ class GlobalConfig:
             "gemini-robotics-er-1.5-preview",  # 可用，8.73秒
         ]
 
+        # --- LLM 响应缓存配置 (shared/llm_client.py) ---
+        # 云端模式同样写入本地磁盘，且为进程内所有会话共享；统计与清空操作只在 local 模式下开放
+        self.LLM_CACHE_DB_PATH = os.path.abspath(
+            os.path.join(os.path.dirname(__file__), '..', '.cache', 'llm_responses.sqlite3')
+        )
+        self.LLM_CACHE_TTL_SECONDS = 7 * 24 * 3600  # 缓存有效期：7天
+        self.LLM_CACHE_MAX_BYTES = 50 * 1024 * 1024  # 缓存容量上限：50MB，超出后按最近访问时间淘汰
+
+        # --- 语音合成分段缓存配置 (pages/3_文本转语音.py) ---
+        self.TTS_CACHE_DIR = os.path.abspath(
+            os.path.join(os.path.dirname(__file__), '..', '.cache', 'tts')
+        )
+        self.TTS_CACHE_MAX_BYTES = 200 * 1024 * 1024  # 音频缓存上限：200MB，超出后删除最久未使用的分段
+        self.TTS_VOICE_CATALOG_PATH = os.path.join(self.TTS_CACHE_DIR, 'voices.json')
+        self.TTS_VOICE_CATALOG_REFRESH_SECONDS = 7 * 24 * 3600  # 声音目录每7天联网刷新一次
+
+        # --- 读书笔记批量转换缓存 (pages/4_读书笔记转markdown文档.py) ---
+        self.READING_NOTES_CACHE_DIR = os.path.abspath(
+            os.path.join(os.path.dirname(__file__), '..', '.cache', 'reading_notes')
+        )
+        self.READING_NOTES_CACHE_MAX_BYTES = 50 * 1024 * 1024  # 转换缓存上限：50MB，超出后删除最久未使用的结果
+
         # 定义时区
         self.APP_TIMEZONE = timezone(timedelta(hours=8))  # 北京时间 (UTC+8)
\ No newline at end of file
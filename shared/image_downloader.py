@@ -0,0 +1,135 @@
+# 文件路径: shared/image_downloader.py
+"""
+评论图片等批量下载的共享工具。
+
+- 复用一个带连接池的 requests.Session（keep-alive），避免每张图片重新建立连接；
+- 使用线程池并发下载，并发数有上限，同时在途的下载任务不超过并发数的两倍；
+- 对超时、429 和 5xx 按指数退避自动重试；
+- 重复的 URL 只下载一次；
+- 以"完成一张产出一张"的方式返回结果，调用方可以边下载边写入 ZIP；
+- ZIP 写入临时文件（小包在内存中，超过阈值自动落盘），JPEG 等已压缩格式直接存储不再压缩；
+- 每张图片写入 ZIP 后立即释放，内存占用不随图片总大小增长。
+"""
+import os
+import tempfile
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import requests
+import streamlit as st
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+MAX_WORKERS = 16
+IN_FLIGHT_PER_WORKER = 2  # 每个线程最多对应两个在途任务：既不让线程空等，又不会堆积大量已下载的内容
+REQUEST_TIMEOUT = 10
+RETRY_TOTAL = 3
+RETRY_BACKOFF_FACTOR = 0.5
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+# 已压缩的媒体格式使用 ZIP_STORED：DEFLATE 对它们几乎没有收益，却非常耗 CPU
+STORED_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp", ".avif", ".heic", ".mp4", ".webm", ".zip"}
+SPOOL_MAX_MEMORY = 16 * 1024 * 1024  # ZIP 超过 16MB 后转存到磁盘临时文件
+USER_AGENT = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+              "(KHTML, like Gecko) Chrome/124.0 Safari/537.36")
+
+
+@st.cache_resource
+def get_http_session() -> requests.Session:
+    """获取进程内共享的 HTTP 会话：连接池大小与并发数一致，并配置自动重试。"""
+    retry = Retry(
+        total=RETRY_TOTAL,
+        backoff_factor=RETRY_BACKOFF_FACTOR,
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=frozenset(["GET"]),
+        respect_retry_after_header=True,
+    )
+    adapter = HTTPAdapter(pool_connections=MAX_WORKERS, pool_maxsize=MAX_WORKERS, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({"User-Agent": USER_AGENT})
+    return session
+
+
+def _fetch(session: requests.Session, url: str) -> bytes:
+    response = session.get(url, timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    return response.content
+
+
+def dedupe_downloads(items: Iterable[Tuple[str, str]]) -> List[Tuple[str, str]]:
+    """按 URL 去重，保留每个 URL 第一次出现时的文件名。"""
+    seen: Dict[str, str] = {}
+    for url, filename in items:
+        if url and url not in seen:
+            seen[url] = filename
+    return list(seen.items())
+
+
+def iter_downloads(items: Iterable[Tuple[str, str]],
+                   max_workers: int = MAX_WORKERS) -> Iterator[Tuple[str, str, Optional[bytes], Optional[str]]]:
+    """
+    并发下载 (url, filename) 列表，按完成顺序逐个产出 (url, filename, content, error)。
+    下载成功时 error 为 None；失败时 content 为 None。
+
+    任务分批提交，同时在途的任务不超过 max_workers * IN_FLIGHT_PER_WORKER 个；
+    已产出的任务立即丢弃，其下载内容在调用方用完后即可被回收。
+    """
+    unique_items = dedupe_downloads(items)
+    if not unique_items:
+        return
+    session = get_http_session()
+    remaining = iter(unique_items)
+    max_in_flight = max_workers * IN_FLIGHT_PER_WORKER
+    futures = {}
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(unique_items))) as executor:
+        while True:
+            for url, filename in islice(remaining, max_in_flight - len(futures)):
+                futures[executor.submit(_fetch, session, url)] = (url, filename)
+            if not futures:
+                return
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                url, filename = futures.pop(future)
+                try:
+                    yield url, filename, future.result(), None
+                except requests.RequestException as e:
+                    yield url, filename, None, str(e)
+            del done, future  # 等待下一批完成前释放本批任务（及其持有的下载内容）的引用
+
+
+def compression_for(filename: str) -> int:
+    """按扩展名选择压缩方式：已压缩的媒体文件直接存储，其他文件使用 DEFLATE。"""
+    extension = os.path.splitext(filename)[1].lower()
+    return zipfile.ZIP_STORED if extension in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+
+
+def build_image_zip(items: Iterable[Tuple[str, str]],
+                    on_progress: Optional[Callable[[int, int], None]] = None
+                    ) -> Tuple[tempfile.SpooledTemporaryFile, List[Tuple[str, str]]]:
+    """
+    并发下载图片并边下载边写入 ZIP（ZIP 写入只在调用线程中进行）。
+    每张图片写入后即释放，ZIP 本身写入 SpooledTemporaryFile，因此内存占用不随图片数量增长。
+
+    Returns:
+        (archive, failures)：archive 为已定位到开头的临时文件，用完后由调用方关闭；
+        failures 为下载失败的 [(url, 错误信息)]。
+    """
+    unique_items = dedupe_downloads(items)
+    total = len(unique_items)
+    failures = []
+    archive = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY, suffix=".zip")
+    with zipfile.ZipFile(archive, "w") as zip_file:
+        for done, (url, filename, content, error) in enumerate(iter_downloads(unique_items), start=1):
+            if error is None:
+                zip_file.writestr(filename, content, compress_type=compression_for(filename))
+            else:
+                failures.append((url, error))
+            del content
+            if on_progress:
+                on_progress(done, total)
+    archive.seek(0)
+    return archive, failures
+
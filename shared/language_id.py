@@ -0,0 +1,74 @@
+# 文件路径: shared/language_id.py
+"""
+文本转语音、图片翻译等页面共用的语言识别服务。
+
+- 结果按文本缓存（进程内 LRU），页面重跑时相同文本不会重复检测；
+- 长文本只取前 SAMPLE_MAX_CHARS 个字符检测，耗时不随文本长度增长；
+- 固定 langdetect 的随机种子，同一文本每次得到相同结果；
+- 批量接口先去重；纯汉字、含假名或纯谚文的文本直接按字符集判断，不再调用 langdetect。
+"""
+import re
+from functools import lru_cache
+from typing import Iterable, List, Optional
+
+from langdetect import DetectorFactory, LangDetectException, detect
+
+# langdetect 默认每次检测使用随机种子，短文本的结果可能前后不一致
+DetectorFactory.seed = 0
+
+SAMPLE_MAX_CHARS = 1000
+CACHE_MAX_ENTRIES = 4096
+
+_LETTER_PATTERN = re.compile(r'[^\W\d_]')
+_KANA_PATTERN = re.compile(r'[぀-ヿ]')
+_HAN_ONLY_PATTERN = re.compile(r'[㐀-䶿一-鿿]+')
+_HANGUL_ONLY_PATTERN = re.compile(r'[ᄀ-ᇿ가-힯]+')
+
+
+def _script_language(text: str) -> Optional[str]:
+    """只根据字符集就能确定语言时返回语言代码，否则返回 None（交给 langdetect）。"""
+    letters = "".join(_LETTER_PATTERN.findall(text))
+    if not letters:
+        return None
+    if _KANA_PATTERN.search(letters):
+        return "ja"
+    if _HAN_ONLY_PATTERN.fullmatch(letters):
+        return "zh"
+    if _HANGUL_ONLY_PATTERN.fullmatch(letters):
+        return "ko"
+    return None
+
+
+@lru_cache(maxsize=CACHE_MAX_ENTRIES)
+def _detect_sample(sample: str) -> Optional[str]:
+    language = _script_language(sample)
+    if language:
+        return language
+    try:
+        return detect(sample).split('-')[0]
+    except LangDetectException:
+        return None
+
+
+def detect_language(text: str, min_chars: int = 0) -> Optional[str]:
+    """
+    检测文本的语言，返回不带地区的语言代码（例如 "zh"、"en"）。
+
+    Args:
+        text: 待检测文本，超过 SAMPLE_MAX_CHARS 的部分不参与检测。
+        min_chars: 去掉首尾空白后短于该长度的文本直接返回 None。
+
+    Returns:
+        语言代码；文本过短或无法识别时返回 None。
+    """
+    sample = (text or "").strip()[:SAMPLE_MAX_CHARS]
+    if not sample or len(sample) < min_chars:
+        return None
+    return _detect_sample(sample)
+
+
+def detect_languages(texts: Iterable[str], min_chars: int = 0) -> List[Optional[str]]:
+    """批量检测多个（通常很短的）文本，重复的文本只检测一次。返回结果与输入顺序一致。"""
+    texts = list(texts)
+    languages = {text: detect_language(text, min_chars) for text in set(texts)}
+    return [languages[text] for text in texts]
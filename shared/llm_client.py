@@ -0,0 +1,249 @@
+# 文件路径: shared/llm_client.py
+"""
+所有 Gemini 页面共用的 LLM 客户端，带持久化的本地磁盘响应缓存。
+
+缓存键由 (模型, 提示词内容, 图片哈希, 生成参数) 计算得出，
+相同的请求（例如重新分析同一句子、同一张EDS截图）会直接命中缓存，不再消耗 API 配额。
+
+缓存不区分用户和 API 密钥：云端模式下同样写入本地磁盘，并由所有访客共享，
+因此命中统计和"清空缓存"只在 local 模式下显示。
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+import google.generativeai as genai
+import streamlit as st
+from PIL import Image
+
+from shared.config import GlobalConfig
+
+
+def _fingerprint_part(part: Any) -> Any:
+    """把提示词的组成部分转换为可 JSON 序列化、可稳定哈希的结构（图片只保留内容哈希）。"""
+    if isinstance(part, Image.Image):
+        digest = hashlib.sha256()
+        digest.update(f"{part.mode}:{part.size}".encode("utf-8"))
+        digest.update(part.tobytes())
+        return {"image_sha256": digest.hexdigest()}
+    if isinstance(part, (bytes, bytearray)):
+        return {"bytes_sha256": hashlib.sha256(part).hexdigest()}
+    if isinstance(part, dict):
+        return {str(k): _fingerprint_part(v) for k, v in part.items()}
+    if isinstance(part, (list, tuple)):
+        return [_fingerprint_part(p) for p in part]
+    return part if isinstance(part, (str, int, float, bool, type(None))) else str(part)
+
+
+def make_cache_key(model_name: str, contents: Any, params: Optional[Dict[str, Any]] = None) -> str:
+    """根据模型、提示词（含图片哈希）和生成参数计算缓存键。"""
+    payload = {
+        "model": model_name,
+        "contents": _fingerprint_part(contents),
+        "params": _fingerprint_part(params or {}),
+    }
+    raw = json.dumps(payload, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    基于 SQLite 的本地磁盘响应缓存。
+    - 过期时间 (TTL)：超过 ttl_seconds 的条目视为未命中并删除。
+    - 容量上限：总大小超过 max_bytes 时，按最近访问时间淘汰最旧的条目 (LRU)。
+    每次操作都使用独立连接，因此可以在工作线程中安全调用。
+    """
+
+    def __init__(self, db_path: str, ttl_seconds: int, max_bytes: int):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, model TEXT, response TEXT, size INTEGER, "
+                "created_at REAL, last_access REAL)"
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """打开连接，块结束时提交事务并关闭连接。"""
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _record(self, hit: bool):
+        with self._stats_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key: str) -> Optional[str]:
+        """读取缓存，未命中或已过期时返回 None。"""
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                row = conn.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+                if row and now - row[1] <= self.ttl_seconds:
+                    conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+                    self._record(hit=True)
+                    return row[0]
+                if row:
+                    conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+        except sqlite3.Error as e:
+            logging.error(f"读取 LLM 缓存失败: {e}")
+        self._record(hit=False)
+        return None
+
+    def set(self, key: str, model_name: str, response: str):
+        """写入缓存，并在超出容量上限时淘汰最久未访问的条目。"""
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, model, response, size, created_at, last_access) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, model_name, response, size, now, now)
+                )
+                conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+                total_size = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+                if total_size > self.max_bytes:
+                    rows = conn.execute("SELECT key, size FROM responses ORDER BY last_access ASC").fetchall()
+                    evicted = []
+                    for old_key, old_size in rows:
+                        if total_size <= self.max_bytes:
+                            break
+                        evicted.append((old_key,))
+                        total_size -= old_size
+                    conn.executemany("DELETE FROM responses WHERE key = ?", evicted)
+        except sqlite3.Error as e:
+            logging.error(f"写入 LLM 缓存失败: {e}")
+
+    def clear(self):
+        """清空所有缓存条目。"""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM responses")
+
+    def stats(self) -> Dict[str, Any]:
+        """返回命中/未命中次数以及当前缓存条目数和占用空间。"""
+        try:
+            with self._connect() as conn:
+                entries, total_size = conn.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+                ).fetchone()
+        except sqlite3.Error:
+            entries, total_size = 0, 0
+        with self._stats_lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "size_bytes": total_size,
+        }
+
+
+class GeminiClient:
+    """对 google.generativeai 的轻量封装，所有请求先查缓存，未命中再调用 API。"""
+
+    def __init__(self, cache: LLMResponseCache):
+        self.cache = cache
+
+    def generate(self, model_name: str, contents: Any, use_cache: bool = True, **generation_params) -> str:
+        """
+        一次性生成完整文本。
+
+        Args:
+            model_name: Gemini 模型名称。
+            contents: 提示词字符串，或由字符串/PIL 图片/对话消息组成的列表。
+            use_cache: 为 False 时跳过缓存读取（结果仍会写入缓存）。
+            generation_params: 透传给 generation_config 的参数，同时参与缓存键计算。
+        """
+        key = make_cache_key(model_name, contents, generation_params)
+        if use_cache:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        model = genai.GenerativeModel(model_name)
+        response = model.generate_content(contents, generation_config=generation_params or None)
+        text = response.text
+        if text:
+            self.cache.set(key, model_name, text)
+        return text
+
+    def stream(self, model_name: str, contents: Any, use_cache: bool = True,
+               **generation_params) -> Iterator[str]:
+        """
+        以流式方式生成文本，逐块产出。
+        命中缓存时一次性产出完整结果；未命中时边生成边产出，结束后写入缓存。
+        空结果（例如被安全策略拦截、没有任何片段）不写入缓存，下次相同请求会重新调用模型。
+        """
+        key = make_cache_key(model_name, contents, generation_params)
+        if use_cache:
+            cached = self.cache.get(key)
+            if cached is not None:
+                yield cached
+                return
+
+        model = genai.GenerativeModel(model_name)
+        pieces = []
+        for chunk in model.generate_content(contents, stream=True, generation_config=generation_params or None):
+            if chunk.parts:
+                pieces.append(chunk.text)
+                yield chunk.text
+        text = "".join(pieces)
+        if text:
+            self.cache.set(key, model_name, text)
+
+
+@st.cache_resource
+def get_llm_client() -> GeminiClient:
+    """获取进程内共享的 GeminiClient 单例（缓存文件位于本地磁盘，跨进程、跨重启复用）。"""
+    cfg = GlobalConfig()
+    cache = LLMResponseCache(cfg.LLM_CACHE_DB_PATH, cfg.LLM_CACHE_TTL_SECONDS, cfg.LLM_CACHE_MAX_BYTES)
+    return GeminiClient(cache)
+
+
+def render_llm_cache_controls() -> bool:
+    """
+    在侧边栏显示缓存开关；local 模式下另外显示命中统计和清空按钮。
+    云端部署时缓存为所有访客共享，全局统计没有参考意义，清空操作也会影响其他人，因此不显示。
+
+    Returns:
+        本次运行是否使用缓存（用户勾选"跳过缓存"时返回 False）。
+    """
+    client = get_llm_client()
+    with st.sidebar.expander("🧠 AI 响应缓存", expanded=False):
+        bypass = st.toggle("跳过缓存（强制重新生成）", key="llm_cache_bypass",
+                           help="开启后忽略已缓存的结果，新结果仍会写入缓存。")
+        if GlobalConfig().RUN_MODE != "local":
+            st.caption("相同的请求会复用已缓存的结果。")
+            return not bypass
+        stats = client.cache.stats()
+        col1, col2 = st.columns(2)
+        col1.metric("命中", stats["hits"])
+        col2.metric("未命中", stats["misses"])
+        st.caption(f"命中率 {stats['hit_rate']:.0%} · {stats['entries']} 条 · "
+                   f"{stats['size_bytes'] / 1024:.1f} KB")
+        if st.button("🗑️ 清空缓存", use_container_width=True, key="llm_cache_clear"):
+            client.cache.clear()
+            st.toast("AI 响应缓存已清空！", icon="🧹")
+    return not bypass
@@ -0,0 +1,507 @@
+# 文件路径: shared/reading_notes.py
+"""
+微信读书笔记导出文本的解析。
+
+导出格式：书名、作者、笔记数各占一行；章节标题前有两个空行；每条笔记以 ◆ 开头；最后一行是尾缀。
+解析器是逐行的状态机，只扫描一遍文本，依次产出头部字段、章节标题和结构化的笔记；
+Markdown 生成同样是线性的：每条笔记只做一次正则扫描，所有片段最后一次拼接。
+
+本模块不依赖 Streamlit，批量转换时可以在子进程中导入。
+"""
+import hashlib
+import html
+import json
+import logging
+import os
+import re
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+NOTE_SYMBOL = '◆'
+HEADER_FIELDS = ('book_title', 'author_name', 'note_count')
+
+THOUGHT_MARKER = '发表想法'
+ORIGINAL_TEXT_MARKER = '原文：'
+THOUGHT_DATE_PATTERN = re.compile(r'◆ (\d{4}/\d{2}/\d{2})发表想法')
+# 一次扫描识别所有标签；TODO-Q 必须排在 TODO 之前。
+# 整个模式放在零宽前瞻中：\s+ 可以跨过换行，若真正消耗字符，"Q" 行会把下一行的 "C 概念" 一起吞掉，导致漏掉 C 标签
+TAG_PATTERN = re.compile(r'^(?=(TODO-Q|TODO|Q|A|C|G)\s+.)', re.MULTILINE)
+TAG_ORDER = ('Q', 'A', 'C', 'G', 'TODO', 'TODO-Q')
+CONCEPT_PATTERN = re.compile(r'^C\s+(.+?)(?:\n|$)((?:\n(?!\n).*)*)', re.MULTILINE)
+
+
+def iter_wechat_export(lines: Iterable[str]) -> Iterator[Tuple[str, object]]:
+    """
+    逐行解析微信读书导出内容，产出事件：
+        ("header", (字段名, 值))：依次为书名、作者、笔记数
+        ("chapter", 标题)
+        ("note", 笔记字典)：见 parse_single_note，额外带有所属章节 "chapter"
+
+    规则：
+    - 最后一个非空行是导出尾缀，丢弃（借助一行的前瞻缓冲实现，无需回扫）；
+    - 头部之后，前面紧挨着至少两个空行、且不以 ◆ 开头的行是章节标题；
+    - 其余空行忽略，非空行按 ◆ 切分为笔记（◆ 出现在行中间时同样切分）。
+    """
+    header_index = 0
+    blank_run = 2  # 正文开头视为已有两个空行，第一行非 ◆ 的内容即为章节标题
+    chapter = ''
+    note_parts: Optional[List[str]] = None
+    note_chapter = ''
+    pending: Optional[Tuple[str, int]] = None  # 尚未确认不是尾缀的最近一个非空行及其前面的空行数
+    pending_blanks = 0
+
+    def finish_note():
+        text = ''.join(note_parts)
+        if text[len(NOTE_SYMBOL):].strip():
+            note = parse_single_note(text)
+            note['chapter'] = note_chapter
+            return note
+        return None
+
+    def process(line: str, blanks_before: int):
+        nonlocal header_index, blank_run, chapter, note_parts, note_chapter
+        if header_index < len(HEADER_FIELDS):
+            yield 'header', (HEADER_FIELDS[header_index], line.strip())
+            header_index += 1
+            return
+
+        blank_run += blanks_before
+        if blank_run >= 2 and not line.startswith(NOTE_SYMBOL):
+            blank_run = 0
+            chapter = line.strip()
+            yield 'chapter', chapter
+            return
+        blank_run = 0
+
+        pieces = line.split(NOTE_SYMBOL)
+        if note_parts is not None:
+            note_parts.append('\n' + pieces[0])
+        for piece in pieces[1:]:
+            if note_parts is not None:
+                note = finish_note()
+                if note:
+                    yield 'note', note
+            note_parts = [NOTE_SYMBOL + piece]
+            note_chapter = chapter
+
+    for raw_line in lines:
+        line = raw_line.rstrip('\r\n')
+        if not line.strip():
+            pending_blanks += 1
+            continue
+        if pending is not None:
+            yield from process(pending[0], pending[1])
+        pending = (line, pending_blanks)
+        pending_blanks = 0
+
+    # pending 此时是最后一个非空行，即尾缀，不处理
+    if note_parts is not None:
+        note = finish_note()
+        if note:
+            yield 'note', note
+
+
+def parse_wechat_notes(text: str) -> Dict:
+    """
+    解析完整的导出文本。
+
+    返回:
+        dict: {"book_title", "author_name", "note_count", "chapters": [...], "notes": [...]}
+    """
+    result = {field: '' for field in HEADER_FIELDS}
+    result['chapters'] = []
+    result['notes'] = []
+    for kind, value in iter_wechat_export(text.splitlines()):
+        if kind == 'header':
+            field, field_value = value
+            result[field] = field_value
+        elif kind == 'chapter':
+            result['chapters'].append(value)
+        else:
+            result['notes'].append(value)
+    return result
+
+
+def parse_single_note(note: str) -> Dict:
+    """
+    解析单条笔记的内容和类型
+
+    参数:
+        note: 单条笔记字符串
+
+    返回:
+        dict: 包含笔记信息的字典
+    """
+    note_info = {
+        'type': 'unknown',
+        'content': '',
+        'original_text': '',
+        'thought': '',
+        'date': '',
+        'tags': []
+    }
+
+    # 检查笔记类型
+    if note.startswith('◆ '):
+        # 形式1: 只有划线内容
+        if THOUGHT_MARKER not in note:
+            note_info['type'] = 'highlight'
+            note_info['content'] = note.replace('◆ ', '').strip()
+        # 形式2: 有想法和原文
+        else:
+            note_info['type'] = 'thought'
+            # 提取日期
+            date_match = THOUGHT_DATE_PATTERN.search(note)
+            if date_match:
+                note_info['date'] = date_match.group(1)
+
+            # 分离想法和原文
+            thought_parts = note.split(ORIGINAL_TEXT_MARKER)
+            if len(thought_parts) == 2:
+                # 提取想法部分（去掉第一行的日期信息）
+                thought_lines = thought_parts[0].split('\n')[1:]  # 跳过第一行
+                note_info['thought'] = '\n'.join([line.strip() for line in thought_lines if line.strip()])
+                note_info['original_text'] = thought_parts[1].strip()
+
+    # 检测标签：想法和内容各扫描一次
+    found = set(TAG_PATTERN.findall(note_info['thought'])) | set(TAG_PATTERN.findall(note_info['content']))
+    note_info['tags'] = [tag for tag in TAG_ORDER if tag in found]
+
+    return note_info
+
+
+def extract_concepts(notes: List[Dict]) -> Dict[str, str]:
+    """
+    从笔记中提取所有概念及其解释
+
+    参数:
+        notes: 笔记列表
+
+    返回:
+        dict: 概念到解释的映射
+    """
+    concepts = {}
+    for note in notes:
+        # 依次在想法和内容中查找概念
+        for text in (note['thought'], note['content']):
+            if not text:
+                continue
+            for concept, explanation in CONCEPT_PATTERN.findall(text):
+                concept = concept.strip()
+                concepts[concept] = explanation.strip() or concept
+    return concepts
+
+
+# --- Markdown 生成 ---
+TAG_LINE_START = r'(?:TODO-Q|TODO|Q|A|C|G)\s'
+# 每条笔记只用这一个正则扫描一遍，按命中的分组决定如何改写：
+# Q/A 对（答案延续到下一个标签行之前）、概念、TODO-Q、TODO、G
+NOTE_MARKUP_PATTERN = re.compile(
+    r'^Q\s+(?P<question>.+)\nA\s+(?P<answer>.+(?:\n(?!' + TAG_LINE_START + r').+)*)'
+    r'|^C\s+(?P<concept>.+)'
+    r'|^TODO-Q\s+(?P<todo_q>.+)'
+    r'|^TODO\s+(?P<todo>.+)'
+    r'|^G\s+(?P<good>.+)',
+    re.MULTILINE,
+)
+
+
+class _FootnoteRegistry:
+    """按首次出现的顺序为问题和概念分配脚注编号；同一问题或概念重复出现时复用编号。"""
+
+    def __init__(self):
+        self.entries: Dict[Tuple[str, str], Tuple[int, str]] = {}
+
+    def number_for(self, kind: str, key: str, body: str) -> int:
+        if (kind, key) not in self.entries:
+            self.entries[(kind, key)] = (len(self.entries) + 1, body)
+        return self.entries[(kind, key)][0]
+
+    def render(self, parts: List[str]):
+        for (kind, key), (number, body) in self.entries.items():
+            if kind == 'Q':
+                parts.append(f"[^{number}]: **Q**: {key}\n    **A**: {body}\n\n")
+            else:
+                parts.append(f"[^{number}]: **概念**: {key}\n    **解释**: {body}\n\n")
+
+
+def _render_note_text(text: str, concepts: Dict[str, str], footnotes: _FootnoteRegistry,
+                      thought: bool) -> str:
+    """
+    用一次正则扫描改写笔记中的标签。想法中处理全部标签；
+    纯划线内容只处理 TODO 和 G，其余标签保持原样。
+    """
+    def replace(match) -> str:
+        group = match.lastgroup
+        if group == 'todo':
+            return f"- [ ] {match.group('todo')}"
+        if group == 'good':
+            return f"🌟 {match.group('good')}"
+        if not thought:
+            return match.group(0)
+        if group == 'todo_q':
+            return f"- [ ] Q: {match.group('todo_q')}"
+        if group == 'answer':
+            question, answer = match.group('question').strip(), match.group('answer').strip()
+            number = footnotes.number_for('Q', question, answer)
+            return f"<span title='{html.escape(answer)}'>Q: {question}[^{number}]</span>"
+        concept = match.group('concept').strip()
+        if concept not in concepts:
+            return match.group(0)
+        number = footnotes.number_for('C', concept, concepts[concept])
+        return f"<span title='{html.escape(concepts[concept])}'>C: {concept}[^{number}]</span>"
+
+    return NOTE_MARKUP_PATTERN.sub(replace, text)
+
+
+def generate_markdown(book_title: str, author_name: str, notes: List[Dict], concepts: Dict[str, str],
+                      generated_at: Optional[datetime] = None) -> str:
+    """
+    生成完整的Markdown文档。所有片段追加到列表中最后一次拼接，耗时与笔记数量成线性关系。
+
+    参数:
+        book_title: 书名
+        author_name: 作者名
+        notes: 笔记列表
+        concepts: 概念字典
+        generated_at: 文档中显示的生成时间，默认为当前时间
+
+    返回:
+        str: Markdown格式的文档内容
+    """
+    generated_at = generated_at or datetime.now()
+    parts = [
+        f"# {book_title}\n\n",
+        f"**作者**: {author_name}  \n",
+        f"**生成时间**: {generated_at.strftime('%Y-%m-%d %H:%M:%S')}  \n",
+        f"**笔记数量**: {len(notes)}\n\n",
+        "---\n\n",
+        "## 📝 读书笔记\n\n",
+    ]
+    footnotes = _FootnoteRegistry()
+
+    for i, note in enumerate(notes, 1):
+        parts.append(f"### 笔记 {i}\n\n")
+        if note['date']:
+            parts.append(f"**记录时间**: {note['date']}\n\n")
+        if note['original_text']:
+            parts.append(f"**原文**: {note['original_text']}\n\n")
+        if note['thought']:
+            parts.append(f"**想法**:\n{_render_note_text(note['thought'], concepts, footnotes, thought=True)}\n\n")
+        elif note['content']:
+            parts.append(f"{_render_note_text(note['content'], concepts, footnotes, thought=False)}\n\n")
+        parts.append("---\n\n")
+
+    # 添加脚注（编号与正文中的引用一致）
+    if footnotes.entries:
+        parts.append("## 📌 注释\n\n")
+        footnotes.render(parts)
+
+    # 添加术语表
+    if concepts:
+        parts.append("## 📚 术语表\n\n")
+        for concept, explanation in sorted(concepts.items()):
+            parts.append(f"### {concept}\n{explanation}\n\n")
+
+    return "".join(parts)
+
+
+# --- 批量转换为 Markdown 笔记库 ---
+RENDER_VERSION = 2  # 解析或生成规则变化时递增，使旧的转换缓存失效（v2：标签按行独立识别）
+EXPORT_ENCODINGS = ('utf-8-sig', 'gb18030')
+VAULT_SPOOL_MAX_MEMORY = 16 * 1024 * 1024
+VAULT_INDEX_FILENAME = "index.md"
+VAULT_GLOSSARY_FILENAME = "术语表.md"
+
+
+def markdown_filename(book_title: str, author_name: str) -> str:
+    """生成笔记文档的文件名。"""
+    return f"{book_title}_{author_name}_读书笔记.md".replace(' ', '_').replace('/', '_')
+
+
+def export_content_hash(raw: bytes) -> str:
+    """导出文件的内容哈希（包含 RENDER_VERSION），作为转换结果的缓存键。"""
+    return hashlib.sha256(f"v{RENDER_VERSION}:".encode('utf-8') + raw).hexdigest()
+
+
+def _decode_export(raw: bytes) -> str:
+    for encoding in EXPORT_ENCODINGS:
+        try:
+            return raw.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    raise ValueError("无法识别文件编码（已尝试 UTF-8 和 GB18030）")
+
+
+def convert_export(item: Tuple[str, bytes]) -> Dict:
+    """
+    转换单本书的导出文件（在子进程中运行）。异常会被捕获并记录在结果的 "error" 中。
+
+    返回:
+        dict: {"source", "hash", "book_title", "author_name", "note_count", "filename",
+               "markdown", "concepts", "error"}
+    """
+    source, raw = item
+    result = {"source": source, "hash": export_content_hash(raw), "book_title": "", "author_name": "",
+              "note_count": 0, "filename": "", "markdown": "", "concepts": {}, "error": None}
+    try:
+        parsed = parse_wechat_notes(_decode_export(raw))
+        if not parsed['book_title'] or not parsed['notes']:
+            raise ValueError("未识别到书名或笔记，可能不是微信读书导出的笔记")
+        concepts = extract_concepts(parsed['notes'])
+        result.update(
+            book_title=parsed['book_title'],
+            author_name=parsed['author_name'],
+            note_count=len(parsed['notes']),
+            filename=markdown_filename(parsed['book_title'], parsed['author_name']),
+            markdown=generate_markdown(parsed['book_title'], parsed['author_name'], parsed['notes'], concepts),
+            concepts=concepts,
+        )
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    return result
+
+
+def _read_cached_conversion(cache_dir: str, content_hash: str) -> Optional[Dict]:
+    """读取转换缓存，未命中时返回 None。命中时刷新修改时间，供按最近使用淘汰。"""
+    path = os.path.join(cache_dir, f"{content_hash}.json")
+    try:
+        with open(path, encoding='utf-8') as f:
+            cached = json.load(f)
+        os.utime(path)
+        return cached
+    except (OSError, ValueError):
+        return None
+
+
+def _write_cached_conversion(cache_dir: str, result: Dict):
+    """写入转换缓存。缓存只用于加速，写入失败（只读或已满的磁盘等）只记录日志，不影响本次转换结果。"""
+    path = os.path.join(cache_dir, f"{result['hash']}.json")
+    tmp_path = f"{path}.tmp"
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logging.warning(f"写入读书笔记转换缓存失败: {e}")
+
+
+def prune_conversion_cache(cache_dir: str, max_bytes: int):
+    """缓存总大小超过上限时，删除最久未使用的转换结果。"""
+    try:
+        entries = [entry for entry in os.scandir(cache_dir) if entry.is_file() and entry.name.endswith(".json")]
+    except OSError:
+        return
+    stats = []
+    for entry in entries:
+        try:
+            stat = entry.stat()
+        except OSError:
+            continue
+        stats.append((stat.st_mtime, stat.st_size, entry.path))
+    total_size = sum(size for _, size, _ in stats)
+    for _, size, path in sorted(stats):
+        if total_size <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total_size -= size
+        except OSError:
+            pass
+
+
+def convert_exports(items: List[Tuple[str, bytes]], cache_dir: str, max_workers: Optional[int] = None,
+                    on_progress=None, cache_max_bytes: Optional[int] = None) -> Tuple[List[Dict], int]:
+    """
+    批量转换多本书的导出文件。内容哈希未变化的文件直接读取磁盘缓存，其余文件在进程池中并行转换；
+    转换成功的结果写入缓存，失败的不缓存。给出 cache_max_bytes 时，批次结束后按最近使用淘汰超出上限的缓存。
+
+    返回:
+        (results, cached_count)：results 与 items 顺序一致，cached_count 为命中缓存的文件数。
+    """
+    results: List[Optional[Dict]] = [None] * len(items)
+    pending = []
+    for i, (source, raw) in enumerate(items):
+        cached = _read_cached_conversion(cache_dir, export_content_hash(raw))
+        if cached:
+            cached["source"] = source
+            results[i] = cached
+        else:
+            pending.append(i)
+
+    cached_count = done = len(items) - len(pending)
+    if on_progress and done:
+        on_progress(done, len(items))
+    if pending:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(convert_export, items[i]): i for i in pending}
+            for future in as_completed(futures):
+                result = future.result()
+                results[futures[future]] = result
+                if not result["error"]:
+                    _write_cached_conversion(cache_dir, result)
+                done += 1
+                if on_progress:
+                    on_progress(done, len(items))
+        if cache_max_bytes is not None:
+            prune_conversion_cache(cache_dir, cache_max_bytes)
+    return results, cached_count
+
+
+def _wiki_link(filename: str) -> str:
+    return f"[[{filename[:-len('.md')]}]]"
+
+
+def build_index_markdown(books: List[Dict]) -> str:
+    """生成笔记库的索引页：每本书一行，链接到对应的笔记文档。"""
+    parts = [f"# 📚 读书笔记索引\n\n共 {len(books)} 本书，{sum(b['note_count'] for b in books)} 条笔记。\n\n",
+             "| 书名 | 作者 | 笔记数 | 概念数 |\n|---|---|---|---|\n"]
+    for book in sorted(books, key=lambda b: b['book_title']):
+        parts.append(f"| {_wiki_link(book['filename'])} | {book['author_name']} | "
+                     f"{book['note_count']} | {len(book['concepts'])} |\n")
+    parts.append(f"\n另见：{_wiki_link(VAULT_GLOSSARY_FILENAME)}\n")
+    return "".join(parts)
+
+
+def build_glossary_markdown(books: List[Dict]) -> str:
+    """汇总所有书中提取的概念，生成跨书术语表；同一概念在多本书中出现时分别列出解释和出处。"""
+    glossary: Dict[str, List[Tuple[str, str]]] = {}
+    for book in books:
+        for concept, explanation in book['concepts'].items():
+            glossary.setdefault(concept, []).append((book['filename'], explanation))
+
+    parts = [f"# 📚 跨书术语表\n\n共 {len(glossary)} 个概念。\n\n"]
+    for concept in sorted(glossary):
+        parts.append(f"## {concept}\n\n")
+        for filename, explanation in glossary[concept]:
+            parts.append(f"- {explanation}（{_wiki_link(filename)}）\n")
+        parts.append("\n")
+    return "".join(parts)
+
+
+def build_vault_zip(books: List[Dict]) -> tempfile.SpooledTemporaryFile:
+    """
+    把转换成功的书写入 ZIP（每本书一个 Markdown 文件，外加索引页和术语表）。
+    文件名重复时依次追加序号。
+    """
+    books = [dict(book) for book in books]  # 去重后的文件名只写入副本，不修改调用方的结果
+    archive = tempfile.SpooledTemporaryFile(max_size=VAULT_SPOOL_MAX_MEMORY, suffix=".zip")
+    used_names = {VAULT_INDEX_FILENAME, VAULT_GLOSSARY_FILENAME}
+    with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as zip_file:
+        for book in books:
+            stem, filename, counter = book['filename'][:-len('.md')], book['filename'], 2
+            while filename in used_names:
+                filename = f"{stem}({counter}).md"
+                counter += 1
+            used_names.add(filename)
+            book['filename'] = filename
+            zip_file.writestr(filename, book['markdown'])
+        # 索引页和术语表使用去重后的文件名生成链接
+        zip_file.writestr(VAULT_INDEX_FILENAME, build_index_markdown(books))
+        zip_file.writestr(VAULT_GLOSSARY_FILENAME, build_glossary_markdown(books))
+    archive.seek(0)
+    return archive
@@ -0,0 +1,430 @@
+# 文件路径: shared/text_diff.py
+"""
+文本对比页面使用的两级差异算法。
+
+1. 行级：先去掉首尾相同的行，再对剩余行做 Myers 差异（行先映射为整数，比较代价与行长无关）；
+   编辑距离超过上限时回退到 difflib 的行级匹配。
+2. 字符级：只在发生变化的行块内部做字符级细化；块过大时改为逐行配对细化，单行仍过大则整体标记为修改。
+
+输出格式与 difflib.SequenceMatcher.get_opcodes() 相同，坐标为原始字符串中的字符下标。
+
+批量对比时各文件对在子进程中计算，因此本模块不依赖 Streamlit。
+"""
+import difflib
+import html
+import io
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional, Sequence, Tuple
+
+Opcode = Tuple[str, int, int, int, int]
+
+MYERS_MAX_EDIT_LINES = 1000  # 行级编辑距离上限，超过后回退到 difflib（避免 O(D²) 的回溯内存）
+CHAR_REFINE_MAX_CELLS = 2_000_000  # 字符级细化时两段文本长度乘积的上限
+
+
+def _encode_lines(lines1: List[str], lines2: List[str]) -> Tuple[List[int], List[int]]:
+    """把每一行映射为整数 ID，相同内容的行得到相同 ID。"""
+    ids: Dict[str, int] = {}
+    encoded1 = [ids.setdefault(line, len(ids)) for line in lines1]
+    encoded2 = [ids.setdefault(line, len(ids)) for line in lines2]
+    return encoded1, encoded2
+
+
+def _myers_matches(a: Sequence[int], b: Sequence[int],
+                   max_edits: int) -> Optional[List[Tuple[int, int]]]:
+    """
+    Myers O((N+M)·D) 差异算法，返回按顺序排列的匹配下标对 [(i, j)]。
+    编辑距离 D 超过 max_edits 时返回 None。
+    """
+    n, m = len(a), len(b)
+    v = {1: 0}
+    trace = []
+    for d in range(min(n + m, max_edits) + 1):
+        trace.append(v.copy())
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and v[k - 1] < v[k + 1]):
+                x = v[k + 1]
+            else:
+                x = v[k - 1] + 1
+            y = x - k
+            while x < n and y < m and a[x] == b[y]:
+                x += 1
+                y += 1
+            v[k] = x
+            if x >= n and y >= m:
+                return _backtrack(trace, n, m)
+    return None
+
+
+def _backtrack(trace: List[Dict[int, int]], x: int, y: int) -> List[Tuple[int, int]]:
+    matches = []
+    for d in range(len(trace) - 1, -1, -1):
+        v = trace[d]
+        k = x - y
+        prev_k = k + 1 if k == -d or (k != d and v[k - 1] < v[k + 1]) else k - 1
+        prev_x = v[prev_k]
+        prev_y = prev_x - prev_k
+        while x > prev_x and y > prev_y:
+            x -= 1
+            y -= 1
+            matches.append((x, y))
+        x, y = prev_x, prev_y
+    matches.reverse()
+    return matches
+
+
+def _opcodes_from_matches(matches: List[Tuple[int, int]], n: int, m: int,
+                          offset1: int = 0, offset2: int = 0) -> List[Opcode]:
+    """把匹配下标对转换为 difflib 风格的操作码。"""
+    opcodes = []
+    i = j = 0
+    for mi, mj in matches + [(n, m)]:
+        if i < mi or j < mj:
+            tag = 'replace' if i < mi and j < mj else ('delete' if i < mi else 'insert')
+            opcodes.append((tag, offset1 + i, offset1 + mi, offset2 + j, offset2 + mj))
+        if mi < n and mj < m:
+            opcodes.append(('equal', offset1 + mi, offset1 + mi + 1, offset2 + mj, offset2 + mj + 1))
+        i, j = mi + 1, mj + 1
+    return _merge_opcodes(opcodes)
+
+
+def _merge_opcodes(opcodes: List[Opcode]) -> List[Opcode]:
+    """合并相邻且类型相同的操作码。"""
+    merged: List[Opcode] = []
+    for op in opcodes:
+        if merged and merged[-1][0] == op[0] and merged[-1][2] == op[1] and merged[-1][4] == op[3]:
+            tag, i1, _, j1, _ = merged[-1]
+            merged[-1] = (tag, i1, op[2], j1, op[4])
+        else:
+            merged.append(op)
+    return merged
+
+
+def diff_lines(lines1: List[str], lines2: List[str]) -> List[Opcode]:
+    """行级差异，返回以行号为坐标的操作码。"""
+    n, m = len(lines1), len(lines2)
+    prefix = 0
+    while prefix < n and prefix < m and lines1[prefix] == lines2[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < n - prefix and suffix < m - prefix and lines1[n - 1 - suffix] == lines2[m - 1 - suffix]:
+        suffix += 1
+
+    a, b = _encode_lines(lines1[prefix:n - suffix], lines2[prefix:m - suffix])
+    matches = _myers_matches(a, b, MYERS_MAX_EDIT_LINES)
+    if matches is None:
+        matcher = difflib.SequenceMatcher(None, a, b, autojunk=False)
+        matches = [(block.a + t, block.b + t) for block in matcher.get_matching_blocks() for t in range(block.size)]
+    middle = _opcodes_from_matches(matches, len(a), len(b), prefix, prefix)
+
+    opcodes = []
+    if prefix:
+        opcodes.append(('equal', 0, prefix, 0, prefix))
+    opcodes.extend(middle)
+    if suffix:
+        opcodes.append(('equal', n - suffix, n, m - suffix, m))
+    return _merge_opcodes(opcodes)
+
+
+def _common_prefix_length(text1: str, text2: str) -> int:
+    """两段文本公共前缀的长度。二分查找配合切片比较，比较在 C 层完成，长文本也很快。"""
+    low, high = 0, min(len(text1), len(text2))
+    while low < high:
+        mid = (low + high + 1) // 2
+        if text1[low:mid] == text2[low:mid]:
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+
+def _common_suffix_length(text1: str, text2: str) -> int:
+    """两段文本公共后缀的长度。"""
+    low, high = 0, min(len(text1), len(text2))
+    while low < high:
+        mid = (low + high + 1) // 2
+        if text1[len(text1) - mid:len(text1) - low] == text2[len(text2) - mid:len(text2) - low]:
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+
+def _trim_common_affixes(text1: str, text2: str) -> Tuple[int, int]:
+    """返回 (公共前缀长度, 公共后缀长度)，两者不重叠。"""
+    prefix = _common_prefix_length(text1, text2)
+    suffix = _common_suffix_length(text1[prefix:], text2[prefix:])
+    return prefix, suffix
+
+
+def _refine_chars(text1: str, text2: str, offset1: int, offset2: int) -> List[Opcode]:
+    """
+    对一段变化的文本做字符级细化。先去掉公共前缀和后缀，只对中间真正不同的部分做对比；
+    中间部分仍然过长时才整体标记为修改。
+    """
+    prefix, suffix = _trim_common_affixes(text1, text2)
+    end1, end2 = len(text1) - suffix, len(text2) - suffix
+    middle1, middle2 = text1[prefix:end1], text2[prefix:end2]
+    opcodes = [('equal', offset1, offset1 + prefix, offset2, offset2 + prefix)]
+    start1, start2 = offset1 + prefix, offset2 + prefix
+    if not middle1 or not middle2 or len(middle1) * len(middle2) > CHAR_REFINE_MAX_CELLS:
+        tag = 'replace' if middle1 and middle2 else ('delete' if middle1 else 'insert')
+        opcodes.append((tag, start1, start1 + len(middle1), start2, start2 + len(middle2)))
+    else:
+        matcher = difflib.SequenceMatcher(None, middle1, middle2, autojunk=False)
+        opcodes.extend((tag, start1 + i1, start1 + i2, start2 + j1, start2 + j2)
+                       for tag, i1, i2, j1, j2 in matcher.get_opcodes())
+    opcodes.append(('equal', offset1 + end1, offset1 + len(text1), offset2 + end2, offset2 + len(text2)))
+    return [op for op in opcodes if op[1] < op[2] or op[3] < op[4]]
+
+
+def _refine_hunk(lines1: List[str], lines2: List[str], offset1: int, offset2: int) -> List[Opcode]:
+    """
+    细化一个行级 replace 块。去掉公共前后缀后的差异部分不大时整体做字符级对比；
+    否则按行逐一配对细化，多出的行视为整体删除或新增。
+    """
+    text1, text2 = "".join(lines1), "".join(lines2)
+    prefix, suffix = _trim_common_affixes(text1, text2)
+    if (len(text1) - prefix - suffix) * (len(text2) - prefix - suffix) <= CHAR_REFINE_MAX_CELLS:
+        return _refine_chars(text1, text2, offset1, offset2)
+
+    opcodes = []
+    pos1, pos2 = offset1, offset2
+    for k in range(max(len(lines1), len(lines2))):
+        line1 = lines1[k] if k < len(lines1) else ""
+        line2 = lines2[k] if k < len(lines2) else ""
+        opcodes.extend(_refine_chars(line1, line2, pos1, pos2))
+        pos1 += len(line1)
+        pos2 += len(line2)
+    return opcodes
+
+
+def get_diff_ops(text1: str, text2: str) -> List[Opcode]:
+    """
+    计算两段文本的字符级差异操作码（与 difflib.SequenceMatcher.get_opcodes() 格式一致）。
+    先做行级差异，再只对变化的行块做字符级细化。
+    """
+    lines1 = text1.splitlines(keepends=True)
+    lines2 = text2.splitlines(keepends=True)
+    # 每行在原文中的起始字符下标
+    starts1 = [0]
+    for line in lines1:
+        starts1.append(starts1[-1] + len(line))
+    starts2 = [0]
+    for line in lines2:
+        starts2.append(starts2[-1] + len(line))
+
+    opcodes = []
+    for tag, i1, i2, j1, j2 in diff_lines(lines1, lines2):
+        c1, c2 = starts1[i1], starts1[i2]
+        d1, d2 = starts2[j1], starts2[j2]
+        if tag == 'replace':
+            opcodes.extend(_refine_hunk(lines1[i1:i2], lines2[j1:j2], c1, d1))
+        else:
+            opcodes.append((tag, c1, c2, d1, d2))
+    return _merge_opcodes([op for op in opcodes if op[1] < op[2] or op[3] < op[4]])
+
+
+def generate_diff_html(text: str, ops: List[Opcode], is_original: bool) -> str:
+    """
+    根据差异操作码生成用于展示的HTML字符串。
+    直接按字符下标切片原文（不再重新分词），转义后一次 join 拼接。
+    ops 可以是完整的操作码列表，也可以是 group_into_hunks 返回的某个变化块。
+    """
+    html_parts = []
+    for tag, i1, i2, j1, j2 in ops:
+        if is_original:
+            segment_html = html.escape(text[i1:i2])
+            if tag == 'equal':
+                html_parts.append(segment_html)
+            elif tag == 'delete':
+                html_parts.append(f'<span class="diff-delete">{segment_html}</span>')
+            elif tag == 'replace':
+                html_parts.append(f'<span class="diff-replace">{segment_html}</span>')
+        else:
+            segment_html = html.escape(text[j1:j2])
+            if tag == 'equal':
+                html_parts.append(segment_html)
+            elif tag == 'insert':
+                html_parts.append(f'<span class="diff-add">{segment_html}</span>')
+            elif tag == 'replace':
+                html_parts.append(f'<span class="diff-replace">{segment_html}</span>')
+    return "".join(html_parts)
+
+
+def _offset_after_newlines(segment: str, count: int) -> int:
+    """segment 中第 count 个换行符之后的位置；换行符不足时返回 len(segment)。"""
+    pos = 0
+    for _ in range(count):
+        pos = segment.find('\n', pos)
+        if pos == -1:
+            return len(segment)
+        pos += 1
+    return pos
+
+
+def _offset_before_newlines(segment: str, count: int) -> int:
+    """从 segment 末尾往前数第 count 个换行符之后的位置；换行符不足时返回 0。"""
+    pos = len(segment)
+    for _ in range(count):
+        pos = segment.rfind('\n', 0, pos)
+        if pos == -1:
+            return 0
+    return pos + 1 if count else len(segment)
+
+
+def group_into_hunks(text1: str, ops: List[Opcode], context_lines: int = 3) -> Tuple[List[Dict], int]:
+    """
+    把操作码分组为变化块，变化之间较长的相同内容被折叠，只在两侧各保留 context_lines 行上下文。
+
+    Returns:
+        (hunks, trailing_skipped)：hunks 为 [{"ops": 操作码列表, "skipped_before": 块前被折叠的行数}]，
+        trailing_skipped 为最后一个变化块之后被折叠的行数。两段文本完全相同时 hunks 为空。
+    """
+    hunks: List[Dict] = []
+    current: List[Opcode] = []
+    skipped = 0
+    for index, (tag, i1, i2, j1, j2) in enumerate(ops):
+        if tag != 'equal':
+            current.append((tag, i1, i2, j1, j2))
+            continue
+
+        segment = text1[i1:i2]
+        # 前一处变化所在行的剩余部分 + context_lines 行；第一段相同内容之前没有变化，不保留
+        ends_mid_line = i1 > 0 and text1[i1 - 1] != '\n'
+        head_end = _offset_after_newlines(segment, context_lines + ends_mid_line) if index > 0 else 0
+        # 下一处变化所在行的开头 + 前面 context_lines 行；最后一段相同内容之后没有变化，不保留
+        tail_start = _offset_before_newlines(segment, context_lines + 1) if index < len(ops) - 1 else len(segment)
+        if head_end >= tail_start:
+            current.append((tag, i1, i2, j1, j2))
+            continue
+
+        if head_end:
+            current.append((tag, i1, i1 + head_end, j1, j1 + head_end))
+        if current:
+            hunks.append({"ops": current, "skipped_before": skipped})
+        current = []
+        hidden = segment[head_end:tail_start]
+        # 只有折叠到文本末尾时，最后一行才可能没有换行符
+        skipped = hidden.count('\n') + (not hidden.endswith('\n'))
+        if tail_start < len(segment):
+            current.append((tag, i1 + tail_start, i2, j1 + tail_start, j2))
+
+    if any(op[0] != 'equal' for op in current):
+        hunks.append({"ops": current, "skipped_before": skipped})
+        skipped = 0
+    return hunks, skipped
+
+
+# --- 批量文件对比 ---
+TEXT_ENCODINGS = ('utf-8-sig', 'gb18030')  # 依次尝试的文本编码，都失败时按 latin-1 读取
+IGNORED_ARCHIVE_PREFIXES = ('__MACOSX/',)
+
+
+def decode_text(data: bytes) -> str:
+    for encoding in TEXT_ENCODINGS:
+        try:
+            return data.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return data.decode('latin-1')
+
+
+def _strip_common_root(files: Dict[str, bytes]) -> Dict[str, bytes]:
+    """去掉所有路径共同的顶层目录（例如 v1/ 与 v2/），使两侧的文件能按相对路径配对。"""
+    roots = {path.split('/', 1)[0] for path in files}
+    if len(roots) == 1 and all('/' in path for path in files):
+        return {path.split('/', 1)[1]: data for path, data in files.items()}
+    return files
+
+
+def collect_documents(named_blobs) -> Dict[str, bytes]:
+    """
+    把上传的文件整理为 {相对路径: 字节内容}：ZIP 压缩包会被展开，普通文件按文件名保存。
+
+    Args:
+        named_blobs: [(文件名, 字节内容)]
+    """
+    documents: Dict[str, bytes] = {}
+    for name, data in named_blobs:
+        if not name.lower().endswith('.zip'):
+            documents[name] = data
+            continue
+        with zipfile.ZipFile(io.BytesIO(data)) as zip_file:
+            archive_files = {
+                info.filename: zip_file.read(info) for info in zip_file.infolist()
+                if not info.is_dir() and not info.filename.startswith(IGNORED_ARCHIVE_PREFIXES)
+            }
+        documents.update(_strip_common_root(archive_files))
+    return documents
+
+
+def pair_documents(left: Dict[str, bytes], right: Dict[str, bytes]) -> List[Tuple[str, Optional[bytes], Optional[bytes]]]:
+    """按相对路径配对两侧的文件；只存在于一侧的文件另一侧为 None。"""
+    return [(name, left.get(name), right.get(name)) for name in sorted(set(left) | set(right))]
+
+
+def diff_document_pair(pair: Tuple[str, Optional[bytes], Optional[bytes]]) -> Dict:
+    """
+    对比一对文件（在子进程中运行）。
+
+    Returns:
+        {"name", "status", "change_ratio", "added", "deleted", "original", "modified", "ops"}
+    """
+    name, data1, data2 = pair
+    original = decode_text(data1) if data1 is not None else ""
+    modified = decode_text(data2) if data2 is not None else ""
+    ops = get_diff_ops(original, modified)
+    equal_chars = sum(i2 - i1 for tag, i1, i2, _, _ in ops if tag == 'equal')
+    total_chars = len(original) + len(modified)
+    if data1 is None:
+        status = "新增"
+    elif data2 is None:
+        status = "删除"
+    else:
+        status = "修改" if ops != [('equal', 0, len(original), 0, len(modified))] else "相同"
+    return {
+        "name": name,
+        "status": status,
+        "change_ratio": 1 - 2 * equal_chars / total_chars if total_chars else 0.0,
+        "added": sum(j2 - j1 for tag, _, _, j1, j2 in ops if tag in ('insert', 'replace')),
+        "deleted": sum(i2 - i1 for tag, i1, i2, _, _ in ops if tag in ('delete', 'replace')),
+        "original": original,
+        "modified": modified,
+        "ops": ops,
+    }
+
+
+def _is_unchanged(pair: Tuple[str, Optional[bytes], Optional[bytes]]) -> bool:
+    """两个文件都存在且字节完全相同。字节串比较会先比较长度，不同长度的文件立即返回。"""
+    _, data1, data2 = pair
+    return data1 is not None and data2 is not None and data1 == data2
+
+
+def batch_diff(pairs, max_workers: Optional[int] = None, on_progress=None) -> List[Dict]:
+    """
+    使用进程池并行对比多对文件，返回与 pairs 顺序一致的结果列表。
+    内容完全相同的文件对在主进程中直接判定为未变化，不会被发送到子进程。
+    """
+    results: List[Optional[Dict]] = [None] * len(pairs)
+    changed = []
+    for i, pair in enumerate(pairs):
+        if _is_unchanged(pair):
+            results[i] = {"name": pair[0], "status": "相同", "change_ratio": 0.0, "added": 0, "deleted": 0,
+                          "original": None, "modified": None, "ops": None}
+        else:
+            changed.append(i)
+
+    done = len(pairs) - len(changed)
+    if on_progress and done:
+        on_progress(done, len(pairs))
+    if changed:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(diff_document_pair, pairs[i]): i for i in changed}
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+                done += 1
+                if on_progress:
+                    on_progress(done, len(pairs))
+    return results
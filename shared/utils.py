@@ -0,0 +1,8 @@
+# 文件路径: shared/utils.py
+"""各页面共用的小工具函数（不依赖 Streamlit 和网络库）。"""
+
+
+def read_archive(archive) -> bytes:
+    """从头读取临时文件（ZIP 包、处理结果等）的全部内容，供 st.download_button 使用（该组件只接受完整的字节数据）。"""
+    archive.seek(0)
+    return archive.read()